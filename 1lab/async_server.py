@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from commands import execute_request, write_response, response_length, error_response, RequestError
+from protocol import (
+    MAGIC, HANDSHAKE, REQUEST_HEADER, MAX_REQUEST_SIZE, STATUS_OK, STATUS_ERROR,
+    negotiate_version, encode_response_header
+)
+
+# Декодирование и экспорт (pydub/ffmpeg) выполняются в ограниченном пуле потоков,
+# поэтому число одновременных декодирований не растёт вместе с числом подключений
+DEFAULT_WORKERS = min(8, (os.cpu_count() or 1) + 2)
+
+
+async def handle_client_async(reader, writer, audio_list, audio_dir, executor):
+    """
+    Асинхронный аналог handle_client: тот же текстовый протокол LIST/CHUNK/STATS
+    (одна команда на подключение) и бинарный протокол с кадрами (см. protocol.py).
+    """
+    addr = writer.get_extra_info('peername')
+    try:
+        first_byte = await reader.read(1)
+        if first_byte == MAGIC[:1]:
+            await handle_framed_client_async(reader, writer, first_byte, audio_list, audio_dir, executor)
+            return
+
+        request = (first_byte + await reader.read(1023)).decode('utf-8').strip()
+        if not request:
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            response = await loop.run_in_executor(executor, execute_request, request, audio_list, audio_dir)
+        except RequestError as e:
+            response = error_response(e)
+        await write_response(writer, response)
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass  # Клиент ушёл, не дождавшись ответа
+    except Exception as e:
+        print(f"[ERROR] Ошибка при обработке клиента {addr}: {e}")
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def handle_framed_client_async(reader, writer, first_byte, audio_list, audio_dir, executor):
+    handshake = first_byte + await reader.readexactly(HANDSHAKE.size - 1)
+    magic, client_version = HANDSHAKE.unpack(handshake)
+    version = negotiate_version(client_version) if magic == MAGIC else 0
+    writer.write(HANDSHAKE.pack(MAGIC, version))
+    await writer.drain()
+    if not version:
+        return
+
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            header = await reader.readexactly(REQUEST_HEADER.size)
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                raise
+            return  # Клиент закрыл соединение между запросами
+        length, request_id = REQUEST_HEADER.unpack(header)
+        if length > MAX_REQUEST_SIZE:
+            message = f"Запрос слишком большой: {length} байт".encode('utf-8')
+            writer.write(encode_response_header(request_id, STATUS_ERROR, len(message)) + message)
+            await writer.drain()
+            return
+        payload = await reader.readexactly(length)
+
+        try:
+            request = payload.decode('utf-8').strip()
+            response = await loop.run_in_executor(executor, execute_request, request, audio_list, audio_dir)
+            status = STATUS_OK
+        except (RequestError, UnicodeDecodeError) as e:
+            response = str(e).encode('utf-8')
+            status = STATUS_ERROR
+        except Exception as e:
+            # Сбой одного запроса (например, ошибка ffmpeg) не разрывает постоянное соединение
+            print(f"[ERROR] Ошибка при выполнении запроса {request_id}: {e}")
+            response = f"Ошибка сервера: {e}".encode('utf-8')
+            status = STATUS_ERROR
+        await write_response(writer, response, encode_response_header(request_id, status, response_length(response)))
+
+
+async def serve(audio_list, audio_dir, host, port, backlog, workers):
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='decode') as executor:
+        server = await asyncio.start_server(
+            lambda r, w: handle_client_async(r, w, audio_list, audio_dir, executor),
+            host, port, backlog=backlog
+        )
+        print(f"[INFO] asyncio-сервер запущен и слушает {host}:{port} "
+              f"(backlog={backlog}, потоков декодирования: {workers})")
+        async with server:
+            await server.serve_forever()
+
+
+def start_async_server(audio_list, audio_dir, host, port, backlog, workers=DEFAULT_WORKERS):
+    """
+    Запускает asyncio-сервер. Подключения обслуживаются в одном цикле событий,
+    так что тысячи простаивающих или медленных клиентов не требуют отдельных потоков.
+    """
+    try:
+        asyncio.run(serve(audio_list, audio_dir, host, port, backlog, workers))
+    except KeyboardInterrupt:
+        print("[INFO] Сервер остановлен.")
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from pydub import AudioSegment
+
+# Бюджет памяти кэша декодированного аудио по умолчанию (в мегабайтах)
+DEFAULT_CACHE_MB = 256
+# Бюджет дискового кэша готовых фрагментов по умолчанию (в мегабайтах)
+DEFAULT_CHUNK_CACHE_MB = 512
+
+
+class DecodedAudioCache:
+    """
+    Кэш декодированных аудиофайлов (AudioSegment) с ограничением по памяти.
+
+    Ключ — (путь, mtime), поэтому изменённый на диске файл будет декодирован заново.
+    При превышении бюджета вытесняются давно не использовавшиеся записи (LRU).
+    Счётчики hits/misses/evictions помогают подобрать размер кэша.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # (path, mtime_ns) -> (AudioSegment, size)
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Возвращает декодированный AudioSegment для файла, при необходимости декодируя его.
+        """
+        key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Декодируем вне блокировки, чтобы не задерживать остальные потоки
+        audio = AudioSegment.from_file(path)
+        self._put(key, audio)
+        return audio
+
+    def _put(self, key, audio):
+        size = len(audio.raw_data)
+        with self._lock:
+            # Устаревшие версии того же файла (с другим mtime) больше не нужны
+            for old_key in [k for k in self._entries if k[0] == key[0] and k != key]:
+                self._remove(old_key)
+            if key in self._entries or size > self.max_bytes:
+                return
+            self._entries[key] = (audio, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """
+        Возвращает счётчики кэша в виде словаря (для команды STATS и логов).
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+class ChunkDiskCache:
+    """
+    Дисковый кэш готовых (вырезанных и перекодированных) фрагментов.
+
+    Имя файла — SHA-256 от (путь, размер, mtime исходного файла, границы, параметры),
+    поэтому повторный запрос с теми же параметрами — это чтение одного файла.
+    Суммарный размер ограничен max_bytes; при превышении удаляются давно
+    не использовавшиеся файлы (LRU). Содержимое каталога подхватывается при запуске.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CHUNK_CACHE_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = None  # имя файла -> размер, в порядке последнего использования
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(path, start_ms, end_ms, params):
+        stat = os.stat(path)
+        key_data = [os.path.abspath(path), stat.st_size, stat.st_mtime_ns, start_ms, end_ms, sorted(params.items())]
+        return hashlib.sha256(json.dumps(key_data).encode('utf-8')).hexdigest()
+
+    def _load(self):
+        # Вызывается под блокировкой при первом обращении
+        os.makedirs(self.cache_dir, exist_ok=True)
+        files = []
+        for name in os.listdir(self.cache_dir):
+            filepath = os.path.join(self.cache_dir, name)
+            if name.startswith('.tmp-'):
+                os.remove(filepath)  # Недописанный фрагмент от прошлого запуска
+                continue
+            if name.startswith('.') or not os.path.isfile(filepath):
+                continue
+            stat = os.stat(filepath)
+            files.append((stat.st_mtime_ns, name, stat.st_size))
+        self._entries = OrderedDict((name, size) for _, name, size in sorted(files))
+        self.current_bytes = sum(self._entries.values())
+        self._evict()
+
+    def get(self, key, ext):
+        """
+        Возвращает открытый на чтение закэшированный фрагмент или None.
+        Файл открывается под блокировкой: put() и вытеснение из других потоков
+        могут удалить его сразу после этого, но открытый файл останется читаемым.
+        """
+        name = f"{key}.{ext}"
+        filepath = os.path.join(self.cache_dir, name)
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            if name not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                f = open(filepath, 'rb')
+            except FileNotFoundError:  # Файл удалили в обход кэша
+                self.current_bytes -= self._entries.pop(name)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+        try:
+            os.utime(filepath)  # mtime хранит порядок LRU между перезапусками
+        except OSError:
+            pass
+        return f
+
+    def new_temp_path(self, ext):
+        """
+        Путь для записи нового фрагмента: в том же каталоге, чтобы put() переносил его атомарно.
+        """
+        with self._lock:
+            if self._entries is None:
+                self._load()
+        return os.path.join(self.cache_dir, f".tmp-{threading.get_ident()}-{os.urandom(4).hex()}.{ext}")
+
+    def put(self, temp_path, key, ext):
+        """
+        Переносит готовый файл в кэш и возвращает его, открытым на чтение (как get()).
+        """
+        name = f"{key}.{ext}"
+        filepath = os.path.join(self.cache_dir, name)
+        size = os.path.getsize(temp_path)
+        with self._lock:
+            os.replace(temp_path, filepath)
+            f = open(filepath, 'rb')
+            old_size = self._entries.pop(name, None)
+            if old_size is not None:
+                self.current_bytes -= old_size
+            self._entries[name] = size
+            self.current_bytes += size
+            self._evict(keep=name)
+        return f
+
+    def _evict(self, keep=None):
+        for name in list(self._entries):
+            if self.current_bytes <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue  # Файл ещё отправляется (Windows не даёт удалить открытый файл)
+            self.current_bytes -= self._entries.pop(name)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries or ()),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Нагрузочный бенчмарк аудиосервера.
+
+Создаёт во временном каталоге тестовые WAV/OGG-файлы, запускает main.py в нужном
+режиме сервера и гоняет против него параллельных клиентов LIST/CHUNK. Печатает
+(и при --output сохраняет) JSON с пропускной способностью, задержками p50/p95/p99
+и пиковым RSS процесса сервера — по одному результату на каждый режим.
+
+Пример:
+    python3 bench.py --modes server,server-async --concurrency 32 --duration 20 \\
+        --slice-ms uniform:500:5000 --files wav:4,ogg:2 --output bench.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import wave
+import random
+import socket
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from protocol import FramedClient
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+SERVER_START_TIMEOUT = 120
+
+
+def generate_fixtures(audio_dir, file_mix, seconds, seed):
+    """
+    Создаёт тестовые файлы: file_mix — словарь {формат: количество}.
+    WAV пишется модулем wave; для остальных форматов нужен ffmpeg (через pydub).
+    Возвращает список (имя файла, длительность в мс).
+    """
+    os.makedirs(audio_dir, exist_ok=True)
+    rng = random.Random(seed)
+    sample_rate, channels, width = 44100, 2, 2
+    fixtures = []
+    for fmt, count in file_mix.items():
+        for index in range(count):
+            name = f"bench_{index}.{fmt}"
+            wav_path = os.path.join(audio_dir, name if fmt == 'wav' else f".bench_{index}.wav")
+            with wave.open(wav_path, 'wb') as w:
+                w.setnchannels(channels)
+                w.setsampwidth(width)
+                w.setframerate(sample_rate)
+                frames = sample_rate * seconds
+                block = sample_rate  # Пишем по секунде случайного шума
+                for _ in range(0, frames, block):
+                    w.writeframes(rng.randbytes(block * channels * width))
+            if fmt != 'wav':
+                from pydub import AudioSegment
+                try:
+                    AudioSegment.from_wav(wav_path).export(os.path.join(audio_dir, name), format=fmt)
+                except Exception as e:
+                    print(f"[WARNING] Не удалось создать {name} (нужен ffmpeg): {e}", file=sys.stderr)
+                    continue
+                finally:
+                    os.remove(wav_path)
+            fixtures.append((name, seconds * 1000))
+    return fixtures
+
+
+def parse_mix(text):
+    """
+    'wav:4,ogg:2' -> {'wav': 4, 'ogg': 2}; 'list:1,chunk:9' -> {'list': 1.0, 'chunk': 9.0}
+    """
+    mix = {}
+    for item in text.split(','):
+        key, _, value = item.partition(':')
+        mix[key.strip().lower()] = float(value) if value else 1.0
+    return mix
+
+
+def make_slice_sampler(spec, rng):
+    """
+    Распределение длины фрагмента, мс: fixed:<ms>, uniform:<min>:<max>, lognormal:<median>:<sigma>.
+    """
+    kind, *values = spec.split(':')
+    values = [float(v) for v in values]
+    if kind == 'fixed':
+        return lambda: int(values[0])
+    if kind == 'uniform':
+        return lambda: int(rng.uniform(values[0], values[1]))
+    if kind == 'lognormal':
+        return lambda: max(1, int(rng.lognormvariate(math.log(values[0]), values[1])))
+    raise ValueError(f"Неизвестное распределение длины фрагмента: {spec}")
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Сервер завершился с кодом {process.returncode}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Сервер не запустился вовремя")
+
+
+class RssMonitor(threading.Thread):
+    """
+    Следит за пиковым RSS процесса: VmHWM из /proc на Linux, иначе psutil (если установлен).
+    """
+
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self._stop_event = threading.Event()
+        try:
+            import psutil
+            self._process = psutil.Process(pid)
+        except Exception:
+            self._process = None
+
+    def sample(self):
+        status_path = f"/proc/{self.pid}/status"
+        if os.path.exists(status_path):
+            with open(status_path) as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1]) * 1024
+        if self._process is not None:
+            return self._process.memory_info().rss
+        return None
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                value = self.sample()
+            except Exception:
+                value = None
+            if value is not None:
+                self.peak = max(self.peak or 0, value)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def read_legacy_response(command, port):
+    with socket.create_connection(('127.0.0.1', port)) as s:
+        s.sendall(command.encode('utf-8'))
+        received = 0
+        buffer = bytearray(64 * 1024)
+        first = b''
+        while True:
+            n = s.recv_into(buffer)
+            if not n:
+                break
+            if not received:
+                first = bytes(buffer[:7])
+            received += n
+    return first != b'[ERROR]', received
+
+
+def client_worker(port, protocol, deadline, ops, fixtures, slice_sampler, rng, results):
+    client = FramedClient(('127.0.0.1', port)) if protocol == 'framed' else None
+    sink = _NullWriter()
+    op_names, op_weights = zip(*ops.items())
+    try:
+        while time.monotonic() < deadline:
+            op = rng.choices(op_names, op_weights)[0]
+            if op == 'list':
+                command = 'LIST'
+            else:
+                name, duration_ms = rng.choice(fixtures)
+                length = min(slice_sampler(), duration_ms)
+                start = rng.randint(0, max(0, duration_ms - length))
+                command = f"CHUNK {name} {start} {start + length}"
+            started = time.perf_counter()
+            try:
+                if client is not None:
+                    client.send(command)
+                    _, status, size = client.read_response_header()
+                    client.read_payload_into(sink, size)
+                    ok = status == 0
+                else:
+                    ok, size = read_legacy_response(command, port)
+            except OSError:
+                ok, size = False, 0
+                if client is not None:
+                    client.close()
+                    client = FramedClient(('127.0.0.1', port))
+            results.append((op, time.perf_counter() - started, ok, size))
+    finally:
+        if client is not None:
+            client.close()
+
+
+class _NullWriter:
+    def write(self, data):
+        return len(data)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(results, elapsed):
+    def stats(items):
+        latencies = sorted(latency for _, latency, ok, _ in items if ok)
+        return {
+            "requests": len(items),
+            "errors": sum(1 for _, _, ok, _ in items if not ok),
+            "throughput_rps": len(items) / elapsed if elapsed else 0.0,
+            "bytes_per_s": sum(size for *_, size in items) / elapsed if elapsed else 0.0,
+            "latency_ms": {
+                name: (value * 1000 if value is not None else None)
+                for name, value in (
+                    ("p50", percentile(latencies, 0.50)),
+                    ("p95", percentile(latencies, 0.95)),
+                    ("p99", percentile(latencies, 0.99)),
+                    ("max", latencies[-1] if latencies else None),
+                )
+            },
+        }
+
+    summary = stats(results)
+    summary["by_op"] = {op: stats([r for r in results if r[0] == op]) for op in sorted({r[0] for r in results})}
+    return summary
+
+
+def run_mode(mode, args, workdir, fixtures):
+    port = free_port()
+    command = [sys.executable, MAIN_SCRIPT, '--mode', mode, '--port', str(port)] + args.server_args
+    log_path = os.path.join(workdir, f"server-{mode}.log")
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen(command, cwd=workdir, stdout=log, stderr=subprocess.STDOUT)
+    monitor = RssMonitor(process.pid)
+    try:
+        wait_for_port(port, process, SERVER_START_TIMEOUT)
+        monitor.start()
+        ops = {k: v for k, v in parse_mix(args.ops).items() if v > 0}
+        results = []
+        deadline = time.monotonic() + args.duration
+        threads = []
+        for index in range(args.concurrency):
+            rng = random.Random(args.seed + index)
+            thread = threading.Thread(
+                target=client_worker,
+                args=(port, args.protocol, deadline, ops, fixtures,
+                      make_slice_sampler(args.slice_ms, rng), rng, results)
+            )
+            threads.append(thread)
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        monitor.stop()
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    summary = summarize(results, elapsed)
+    summary.update({
+        "mode": mode,
+        "protocol": args.protocol,
+        "concurrency": args.concurrency,
+        "duration_s": elapsed,
+        "slice_ms": args.slice_ms,
+        "ops": args.ops,
+        "files": args.files,
+        "server_peak_rss_bytes": monitor.peak,
+    })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк аудиосервера")
+    parser.add_argument('--modes', default='server,server-async', help="Режимы сервера через запятую")
+    parser.add_argument('--protocol', choices=['legacy', 'framed'], default='legacy',
+                        help="Протокол клиентов: текстовый (подключение на запрос) или бинарный")
+    parser.add_argument('--concurrency', type=int, default=16, help="Число параллельных клиентов")
+    parser.add_argument('--duration', type=float, default=10.0, help="Длительность прогона каждого режима, с")
+    parser.add_argument('--ops', default='list:1,chunk:9', help="Доли команд, например list:1,chunk:9")
+    parser.add_argument('--slice-ms', default='uniform:500:5000',
+                        help="Длина фрагмента: fixed:<ms>, uniform:<min>:<max> или lognormal:<median>:<sigma>")
+    parser.add_argument('--files', default='wav:4,ogg:2', help="Состав тестовых файлов, например wav:4,ogg:2")
+    parser.add_argument('--fixture-seconds', type=int, default=60, help="Длительность каждого тестового файла, с")
+    parser.add_argument('--seed', type=int, default=1, help="Зерно генератора случайных чисел")
+    parser.add_argument('--output', help="Куда сохранить результаты в формате JSON")
+    parser.add_argument('--keep', action='store_true', help="Не удалять временный каталог с файлами и логами")
+    parser.add_argument('server_args', nargs=argparse.REMAINDER,
+                        help="Дополнительные аргументы main.py после '--', например -- --cache-mb 0")
+    args = parser.parse_args()
+    if args.server_args[:1] == ['--']:
+        args.server_args = args.server_args[1:]
+
+    workdir = tempfile.mkdtemp(prefix='audio-bench-')
+    try:
+        file_mix = {fmt: int(count) for fmt, count in parse_mix(args.files).items()}
+        fixtures = generate_fixtures(os.path.join(workdir, 'audio_files'), file_mix, args.fixture_seconds, args.seed)
+        if not fixtures:
+            raise SystemExit("[ERROR] Не удалось создать ни одного тестового файла")
+        reports = []
+        for mode in args.modes.split(','):
+            print(f"[INFO] Режим {mode}...", file=sys.stderr)
+            reports.append(run_mode(mode.strip(), args, workdir, fixtures))
+    finally:
+        if args.keep:
+            print(f"[INFO] Файлы и логи сохранены в {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps({"created": time.time(), "results": reports}, indent=4)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import json
+import io
+import asyncio
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from audio_cache import DecodedAudioCache, ChunkDiskCache
+from wav_utils import read_wav_info, wav_duration_ms, wav_slice, build_wav_header
+from protocol import encode_multipart
+from peaks import np, PEAKS_DIR, peaks_path, query_peaks
+
+CHUNK_CACHE_DIR = 'chunk_cache'
+
+# Кэш декодированных файлов для команды CHUNK (бюджет задаётся через --cache-mb)
+audio_cache = DecodedAudioCache()
+# Дисковый кэш готовых фрагментов (бюджет задаётся через --chunk-cache-mb)
+chunk_cache = ChunkDiskCache(CHUNK_CACHE_DIR)
+
+# Параметры перекодирования: CHUNK <filename> <start_ms> <end_ms> [format=mp3] [rate=22050] [channels=1] [bitrate=64k]
+EXPORT_FORMATS = ('wav', 'mp3', 'ogg', 'flac')
+MIN_FRAME_RATE, MAX_FRAME_RATE = 8000, 192000
+MAX_CHANNELS = 2
+BITRATE_RE = re.compile(r'^[1-9][0-9]{0,3}k$')
+
+# PEAKS <filename> <start_ms> <end_ms> <resolution>
+MAX_PEAKS_RESOLUTION = 65536
+
+# CHUNKS <filename> <s1>-<e1>,<s2>-<e2>,... [параметры]
+MAX_RANGES = 256
+# Предел суммарного размера фрагментов одного запроса CHUNKS: ответ собирается в памяти,
+# а длины частей и кадра передаются 32-битными полями (см. protocol.py)
+MAX_CHUNKS_BYTES = 256 * 1024 * 1024
+RANGE_RE = re.compile(r'^(\d+)-(\d+)$')
+# Экспорт через ffmpeg идёт во внешнем процессе, поэтому фрагменты CHUNKS
+# экспортируются параллельно в пуле потоков
+export_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='export')
+
+# Ответ, который отправляется прямо из файла (через sendfile, без чтения в память):
+# header + count байт файла начиная с offset + trailer.
+# Если delete=True, файл временный и удаляется после отправки.
+# file — уже открытый файл (фрагмент из дискового кэша: открыт до того, как его
+# могло вытеснить другим потоком); закрывается после отправки.
+FileRegion = namedtuple(
+    'FileRegion', ['path', 'offset', 'count', 'header', 'trailer', 'delete', 'file'],
+    defaults=(b'', b'', False, None)
+)
+
+
+class RequestError(Exception):
+    """
+    Ошибка в запросе клиента. Текст ошибки отправляется клиенту с префиксом [ERROR].
+    """
+
+
+def execute_request(request, audio_list, audio_dir):
+    """
+    Выполняет текстовую команду клиента и возвращает ответ: bytes или FileRegion.
+      - 'LIST': JSON со списком аудиофайлов.
+      - 'CHUNK <filename> <start_ms> <end_ms> [параметры]': фрагмент аудиофайла,
+        при необходимости перекодированный (см. parse_export_params).
+      - 'CHUNKS <filename> <s1>-<e1>,<s2>-<e2>,... [параметры]': несколько фрагментов
+        одного файла одним ответом (см. protocol.encode_multipart).
+      - 'PEAKS <filename> <start_ms> <end_ms> <resolution>': пики и RMS для отрисовки
+        формы волны (см. peaks.query_peaks).
+      - 'STATS': JSON со счётчиками кэшей.
+    При ошибке в запросе бросает RequestError.
+    """
+    parts = request.split()
+    if not parts:
+        raise RequestError("Пустой запрос")
+    command = parts[0].upper()  # Сравнение без учета регистра
+
+    if command == 'LIST':
+        return json.dumps(audio_list).encode('utf-8')
+    if command == 'STATS':
+        stats = {"decoded_cache": audio_cache.stats(), "chunk_cache": chunk_cache.stats()}
+        return json.dumps(stats).encode('utf-8')
+    if command == 'CHUNK':
+        return prepare_chunk(parts, audio_dir, audio_list)
+    if command == 'CHUNKS':
+        return prepare_chunks(parts, audio_dir)
+    if command == 'PEAKS':
+        return prepare_peaks(parts, audio_dir)
+    raise RequestError(f"Неизвестная команда: {request}")
+
+
+def parse_export_params(options):
+    """
+    Разбирает необязательные параметры CHUNK вида key=value:
+      format   — формат результата (wav, mp3, ogg, flac), по умолчанию формат исходного файла;
+      rate     — частота дискретизации, Гц;
+      channels — число каналов;
+      bitrate  — битрейт для форматов со сжатием, например 64k.
+    """
+    params = {}
+    for option in options:
+        key, sep, value = option.partition('=')
+        key = key.lower()
+        if not sep or not value:
+            raise RequestError(f"Некорректный параметр '{option}'. Ожидается key=value")
+        if key == 'format':
+            value = value.lower()
+            if value not in EXPORT_FORMATS:
+                raise RequestError(f"Неподдерживаемый формат {value}. Доступны: {', '.join(EXPORT_FORMATS)}")
+            params[key] = value
+        elif key in ('rate', 'channels'):
+            try:
+                number = int(value)
+            except ValueError:
+                raise RequestError(f"Параметр {key} должен быть целым числом")
+            low, high = (MIN_FRAME_RATE, MAX_FRAME_RATE) if key == 'rate' else (1, MAX_CHANNELS)
+            if not low <= number <= high:
+                raise RequestError(f"Параметр {key} должен быть в диапазоне {low}..{high}")
+            params[key] = number
+        elif key == 'bitrate':
+            if not BITRATE_RE.match(value.lower()):
+                raise RequestError("Параметр bitrate задаётся в виде <число>k, например 64k")
+            params[key] = value.lower()
+        else:
+            raise RequestError(f"Неизвестный параметр {key}")
+    return params
+
+
+def indexed_duration_ms(audio_list, filename, path):
+    """
+    Длительность файла из индекса (LIST) или None, если её ещё нет
+    или запись относится к другой версии файла.
+    """
+    stat = os.stat(path)
+    for info in audio_list:
+        if info.get("name") == filename:
+            if (info.get("duration_sec") is not None and info.get("size") == stat.st_size
+                    and info.get("mtime_ns") == stat.st_mtime_ns):
+                return round(info["duration_sec"] * 1000)
+            return None
+    return None
+
+
+def cached_region(f):
+    return FileRegion(f.name, 0, os.fstat(f.fileno()).st_size, file=f)
+
+
+def prepare_chunk(parts, audio_dir, audio_list):
+    if len(parts) < 4:
+        raise RequestError(
+            "Некорректный формат команды CHUNK. Ожидается: "
+            "CHUNK <filename> <start_ms> <end_ms> [format=..] [rate=..] [channels=..] [bitrate=..]"
+        )
+
+    filename = parts[1]
+    try:
+        start_ms = int(parts[2])
+        end_ms = int(parts[3])
+    except ValueError:
+        raise RequestError("start_ms и end_ms должны быть целыми числами")
+    params = parse_export_params(parts[4:])
+
+    original_path = os.path.join(audio_dir, filename)
+    if not os.path.exists(original_path):
+        raise RequestError(f"Файл {filename} не найден на сервере.")
+
+    source_format = filename.split('.')[-1].lower()
+    export_format = params.get('format', source_format)
+
+    # Быстрый путь для WAV: читаем только нужные кадры, без декодирования и временного файла
+    wav_info = None
+    if source_format == 'wav' and not params.keys() - {'format'} and export_format == 'wav':
+        wav_info = read_wav_info(original_path)
+    if wav_info is not None:
+        start_ms = max(0, start_ms)
+        end_ms = min(wav_duration_ms(wav_info), end_ms)
+        if start_ms >= end_ms:
+            raise RequestError("Некорректные границы: start_ms >= end_ms")
+        offset, count = wav_slice(wav_info, start_ms, end_ms)
+        # RIFF-чанки выравниваются по чётной границе
+        trailer = b'\x00' if count % 2 else b''
+        return FileRegion(original_path, offset, count, build_wav_header(wav_info, count), trailer)
+
+    if chunk_cache.enabled:
+        # Границы обрезаются до ключа, чтобы 0-999999 и 0-1000000 у 10-секундного файла
+        # попадали в одну запись кэша
+        start_ms = max(0, start_ms)
+        duration_ms = indexed_duration_ms(audio_list, filename, original_path)
+        if duration_ms is None and source_format == 'wav':
+            wav_info = read_wav_info(original_path)
+            if wav_info is not None:
+                duration_ms = wav_duration_ms(wav_info)
+        if duration_ms is not None:
+            end_ms = min(duration_ms, end_ms)
+        if start_ms >= end_ms:
+            raise RequestError("Некорректные границы: start_ms >= end_ms")
+        cache_key = ChunkDiskCache.make_key(original_path, start_ms, end_ms, params)
+        cached = chunk_cache.get(cache_key, export_format)
+        if cached is not None:
+            return cached_region(cached)
+
+    audio = audio_cache.get(original_path)
+    start_ms = max(0, start_ms)
+    end_ms = min(len(audio), end_ms)
+    if start_ms >= end_ms:
+        raise RequestError("Некорректные границы: start_ms >= end_ms")
+
+    # Вырезаем аудиофрагмент и при необходимости перекодируем
+    chunk = transform_chunk(audio[start_ms:end_ms], params)
+
+    if not chunk_cache.enabled:
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.' + export_format) as tmp:
+            temp_path = tmp.name
+        export_chunk(chunk, temp_path, export_format, params)
+        return FileRegion(temp_path, 0, os.path.getsize(temp_path), delete=True)
+
+    temp_path = chunk_cache.new_temp_path(export_format)
+    export_chunk(chunk, temp_path, export_format, params)
+    return cached_region(chunk_cache.put(temp_path, cache_key, export_format))
+
+
+def prepare_chunks(parts, audio_dir):
+    """
+    CHUNKS: файл декодируется (или, для WAV, разбирается его заголовок) один раз,
+    после чего все фрагменты вырезаются из него и возвращаются одним ответом.
+    """
+    if len(parts) < 3:
+        raise RequestError(
+            "Некорректный формат команды CHUNKS. Ожидается: CHUNKS <filename> <s1>-<e1>,<s2>-<e2>,... [параметры]"
+        )
+    filename = parts[1]
+    ranges = []
+    for item in parts[2].split(','):
+        match = RANGE_RE.match(item)
+        if not match:
+            raise RequestError(f"Некорректный диапазон '{item}'. Ожидается <start_ms>-<end_ms>")
+        ranges.append((int(match.group(1)), int(match.group(2))))
+    if len(ranges) > MAX_RANGES:
+        raise RequestError(f"Слишком много диапазонов: {len(ranges)} (максимум {MAX_RANGES})")
+    params = parse_export_params(parts[3:])
+
+    original_path = os.path.join(audio_dir, filename)
+    if not os.path.exists(original_path):
+        raise RequestError(f"Файл {filename} не найден на сервере.")
+    source_format = filename.split('.')[-1].lower()
+    export_format = params.get('format', source_format)
+
+    wav_info = None
+    if source_format == 'wav' and not params.keys() - {'format'} and export_format == 'wav':
+        wav_info = read_wav_info(original_path)
+    if wav_info is not None:
+        duration_ms = wav_duration_ms(wav_info)
+        regions = [wav_slice(wav_info, start_ms, end_ms) for start_ms, end_ms in clamp_ranges(ranges, duration_ms)]
+        check_chunks_size(sum(count for _, count in regions))
+        slices = []
+        with open(original_path, 'rb') as f:
+            for offset, count in regions:
+                f.seek(offset)
+                trailer = b'\x00' if count % 2 else b''
+                slices.append(build_wav_header(wav_info, count) + f.read(count) + trailer)
+        return encode_multipart(slices)
+
+    audio = audio_cache.get(original_path)
+    clamped = clamp_ranges(ranges, len(audio))
+    # Оценка сверху — размер несжатых фрагментов после перекодирования; проверяется
+    # до того, как фрагменты вырезаются и экспортируются
+    frame_rate = params.get('rate', audio.frame_rate)
+    channels = params.get('channels', audio.channels)
+    total_ms = sum(end_ms - start_ms for start_ms, end_ms in clamped)
+    check_chunks_size(total_ms * frame_rate * channels * audio.sample_width // 1000)
+    chunks = [transform_chunk(audio[start_ms:end_ms], params) for start_ms, end_ms in clamped]
+    if export_format == 'wav' or len(chunks) == 1:
+        # WAV пишется средствами Python (под GIL) — параллельный экспорт не ускорит его
+        slices = [export_to_bytes(chunk, export_format, params) for chunk in chunks]
+    else:
+        slices = list(export_pool.map(lambda chunk: export_to_bytes(chunk, export_format, params), chunks))
+    return encode_multipart(slices)
+
+
+def prepare_peaks(parts, audio_dir):
+    if len(parts) < 5:
+        raise RequestError(
+            "Некорректный формат команды PEAKS. Ожидается: PEAKS <filename> <start_ms> <end_ms> <resolution>"
+        )
+    if np is None:
+        raise RequestError("Команда PEAKS недоступна: на сервере не установлен NumPy")
+    filename = parts[1]
+    try:
+        start_ms, end_ms, resolution = int(parts[2]), int(parts[3]), int(parts[4])
+    except ValueError:
+        raise RequestError("start_ms, end_ms и resolution должны быть целыми числами")
+    if not 1 <= resolution <= MAX_PEAKS_RESOLUTION:
+        raise RequestError(f"resolution должно быть в диапазоне 1..{MAX_PEAKS_RESOLUTION}")
+    start_ms = max(0, start_ms)
+    if start_ms >= end_ms:
+        raise RequestError("Некорректные границы: start_ms >= end_ms")
+
+    original_path = os.path.join(audio_dir, filename)
+    if not os.path.exists(original_path):
+        raise RequestError(f"Файл {filename} не найден на сервере.")
+    response = query_peaks(original_path, peaks_path(filename, PEAKS_DIR), start_ms, end_ms, resolution)
+    if response is None:
+        raise RequestError(f"Пики для файла {filename} ещё не построены (перезапустите индексацию).")
+    return response
+
+
+def check_chunks_size(size):
+    if size > MAX_CHUNKS_BYTES:
+        raise RequestError(
+            f"Слишком большой объём фрагментов: {size // (1024 * 1024)} МиБ "
+            f"(максимум {MAX_CHUNKS_BYTES // (1024 * 1024)} МиБ за запрос)"
+        )
+
+
+def clamp_ranges(ranges, duration_ms):
+    clamped = []
+    for start_ms, end_ms in ranges:
+        if min(end_ms, duration_ms) <= start_ms:
+            raise RequestError(f"Некорректные границы {start_ms}-{end_ms}: start_ms >= end_ms")
+        clamped.append((start_ms, min(end_ms, duration_ms)))
+    return clamped
+
+
+def transform_chunk(chunk, params):
+    """
+    Применяет к фрагменту параметры rate и channels.
+    """
+    if 'rate' in params:
+        chunk = chunk.set_frame_rate(params['rate'])
+    if 'channels' in params:
+        try:
+            chunk = chunk.set_channels(params['channels'])
+        except ValueError:
+            raise RequestError(f"Нельзя преобразовать {chunk.channels} каналов в {params['channels']}")
+    return chunk
+
+
+def export_to_bytes(chunk, export_format, params):
+    buffer = io.BytesIO()
+    chunk.export(buffer, format=export_format, bitrate=params.get('bitrate'))
+    return buffer.getvalue()
+
+
+def export_chunk(chunk, path, export_format, params):
+    try:
+        chunk.export(path, format=export_format, bitrate=params.get('bitrate'))
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+
+def error_response(error):
+    return f"[ERROR] {error}".encode('utf-8')
+
+
+def response_length(response):
+    """
+    Полный размер ответа в байтах (нужен для заголовка кадра бинарного протокола).
+    """
+    if isinstance(response, FileRegion):
+        return len(response.header) + response.count + len(response.trailer)
+    return len(response)
+
+
+def discard_response(response):
+    """
+    Освобождает ресурсы ответа, который не будет отправлен.
+    """
+    if not isinstance(response, FileRegion):
+        return
+    if response.file is not None:
+        response.file.close()
+    if response.delete:
+        os.remove(response.path)
+
+
+def send_response(conn, response, prefix=b''):
+    """
+    Отправляет ответ (prefix — например, заголовок кадра — уходит перед ним).
+    Данные FileRegion передаются через socket.sendfile (zero-copy там,
+    где ОС это поддерживает), без загрузки файла в память.
+    """
+    if not isinstance(response, FileRegion):
+        conn.sendall(prefix + response)
+        return
+    try:
+        if prefix or response.header:
+            conn.sendall(prefix + response.header)
+        if response.count:
+            with response.file or open(response.path, 'rb') as f:
+                conn.sendfile(f, response.offset, response.count)
+        if response.trailer:
+            conn.sendall(response.trailer)
+    finally:
+        discard_response(response)
+
+
+async def write_response(writer, response, prefix=b''):
+    """
+    Асинхронная отправка ответа. drain() и loop.sendfile() ждут, пока данные уйдут
+    в сокет, что даёт обратное давление на медленных клиентов.
+    """
+    if not isinstance(response, FileRegion):
+        writer.write(prefix + response)
+        await writer.drain()
+        return
+    try:
+        if prefix or response.header:
+            writer.write(prefix + response.header)
+        if response.count:
+            loop = asyncio.get_running_loop()
+            with response.file or open(response.path, 'rb') as f:
+                await loop.sendfile(writer.transport, f, response.offset, response.count)
+        if response.trailer:
+            writer.write(response.trailer)
+        await writer.drain()
+    finally:
+        discard_response(response)
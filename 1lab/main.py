@@ -5,44 +5,121 @@ import os
 import json
 import socket
 import threading
-import tempfile
 import argparse
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pydub import AudioSegment
+from audio_cache import DEFAULT_CACHE_MB, DEFAULT_CHUNK_CACHE_MB
+from commands import audio_cache, chunk_cache, execute_request, send_response, response_length, error_response, RequestError
+from protocol import (
+    MAGIC, HANDSHAKE, REQUEST_HEADER, MAX_REQUEST_SIZE, STATUS_OK, STATUS_ERROR,
+    SocketReader, FramedClient, negotiate_version, encode_response_header, decode_multipart
+)
+from async_server import start_async_server, DEFAULT_WORKERS
+from wav_utils import read_wav_info, wav_duration_ms
+from peaks import np, PEAKS_DIR, peaks_path, build_peaks_file
 
 # Настройки сервера
 HOST = '0.0.0.0'       # Сервер будет слушать на всех интерфейсах
 PORT = 5001            # Порт сервера; убедитесь, что он свободен
 AUDIO_DIR = 'audio_files'
 JSON_METADATA_FILE = 'audio_files.json'
+BACKLOG = 128          # Длина очереди входящих подключений (задаётся через --backlog)
 
-def generate_audio_metadata(audio_dir, json_file):
+def probe_audio_file(filepath, peaks_file=None):
+    """
+    Возвращает длительность аудиофайла в секундах. Для WAV длительность берётся
+    из RIFF-заголовка, остальные форматы декодируются целиком.
+    Если задан peaks_file, заодно строит для файла пирамиду пиков (см. peaks.py).
+    Выполняется в отдельном процессе, поэтому функция находится на уровне модуля.
+    """
+    wav_info = read_wav_info(filepath) if filepath.lower().endswith('.wav') else None
+    audio = None
+    if wav_info is not None:
+        duration_ms = wav_duration_ms(wav_info)
+    else:
+        audio = AudioSegment.from_file(filepath)
+        duration_ms = len(audio)
+    if peaks_file is not None:
+        try:
+            build_peaks_file(filepath, peaks_file, wav_info=wav_info, audio=audio)
+        except Exception as e:
+            print(f"[WARNING] Не удалось построить пики для {os.path.basename(filepath)}: {e}")
+    return duration_ms / 1000.0
+
+def generate_audio_metadata(audio_dir, json_file, workers=None):
     """
     Сканирует папку с аудиофайлами, извлекает метаданные (имя, длительность, формат)
     и сохраняет результат в JSON-файл.
+
+    Индексация инкрементальная: размер и mtime каждого файла сохраняются в JSON,
+    и заново обрабатываются только новые или изменённые файлы (а также файлы без
+    построенных пиков, если установлен NumPy). Если таких файлов
+    несколько, они обрабатываются параллельно в пуле процессов (workers процессов,
+    по умолчанию — по числу ядер; workers=1 — последовательно).
     """
+    previous = {entry["name"]: entry for entry in load_audio_metadata(json_file) if "name" in entry}
     audio_list = []
+    changed = []  # (индекс в audio_list, путь к файлу)
     for filename in os.listdir(audio_dir):
         # Пропускаем скрытые файлы (например, .DS_Store)
         if filename.startswith('.'):
             continue
         filepath = os.path.join(audio_dir, filename)
         if os.path.isfile(filepath):
+            stat = os.stat(filepath)
+            old_info = previous.get(filename)
+            peaks_missing = np is not None and not os.path.exists(peaks_path(filename, PEAKS_DIR))
+            if (old_info and not peaks_missing and old_info.get("size") == stat.st_size
+                    and old_info.get("mtime_ns") == stat.st_mtime_ns):
+                audio_list.append(old_info)
+                continue
             file_ext = os.path.splitext(filename)[1].lower().replace('.', '')
+            audio_list.append({
+                "name": filename,
+                "duration_sec": None,
+                "format": file_ext,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns
+            })
+            changed.append((len(audio_list) - 1, filepath))
+
+    if changed:
+        print(f"[INFO] Новых или изменённых файлов: {len(changed)}")
+    paths = [filepath for _, filepath in changed]
+    peaks_files = [
+        peaks_path(os.path.basename(filepath), PEAKS_DIR) if np is not None else None
+        for filepath in paths
+    ]
+    if len(changed) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(probe_audio_file, *args) for args in zip(paths, peaks_files)]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(e)
+    else:
+        results = []
+        for filepath, peaks_file in zip(paths, peaks_files):
             try:
-                audio = AudioSegment.from_file(filepath)
-                duration_ms = len(audio)
-                duration_sec = duration_ms / 1000.0
-                audio_info = {
-                    "name": filename,
-                    "duration_sec": duration_sec,
-                    "format": file_ext
-                }
-                audio_list.append(audio_info)
+                results.append(probe_audio_file(filepath, peaks_file))
             except Exception as e:
-                print(f"[WARNING] Файл {filename} не удалось прочитать: {e}")
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(audio_list, f, ensure_ascii=False, indent=4)
+                results.append(e)
+
+    failed = set()
+    for (index, filepath), result in zip(changed, results):
+        if isinstance(result, Exception):
+            print(f"[WARNING] Файл {os.path.basename(filepath)} не удалось прочитать: {result}")
+            failed.add(index)
+        else:
+            audio_list[index]["duration_sec"] = result
+    audio_list = [info for index, info in enumerate(audio_list) if index not in failed]
+
+    if changed or len(audio_list) != len(previous):
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(audio_list, f, ensure_ascii=False, indent=4)
     return audio_list
 
 def load_audio_metadata(json_file):
@@ -53,74 +130,75 @@ def load_audio_metadata(json_file):
 
 def handle_client(conn, addr, audio_list):
     """
-    Обрабатывает запросы клиента:
-      - 'LIST': отправляет JSON со списком аудиофайлов.
-      - 'CHUNK <filename> <start_ms> <end_ms>': вырезает заданный фрагмент аудиофайла и отправляет его клиенту.
+    Обрабатывает запросы клиента (LIST, CHUNK, STATS — см. commands.execute_request).
+    Клиент старого текстового протокола отправляет одну команду на подключение;
+    клиент бинарного протокола (начинается с protocol.MAGIC) — сколько угодно.
     """
     print(f"[INFO] Новое подключение: {addr}")
     try:
+        first_byte = conn.recv(1, socket.MSG_PEEK)
+        if first_byte == MAGIC[:1]:
+            handle_framed_client(conn, audio_list)
+            return
+
         request = conn.recv(1024).decode('utf-8').strip()
         if not request:
             print(f"[INFO] Пустой запрос от {addr}, закрываем соединение.")
             return
 
-        parts = request.split()
-        command = parts[0].upper()  # Сравнение без учета регистра
-
-        if command == 'LIST':
-            response_data = json.dumps(audio_list)
-            conn.sendall(response_data.encode('utf-8'))
-
-        elif command == 'CHUNK':
-            if len(parts) < 4:
-                conn.sendall(
-                    "[ERROR] Некорректный формат команды CHUNK. Ожидается: CHUNK <filename> <start_ms> <end_ms>"
-                    .encode("utf-8")
-                )
-                return
-
-            filename = parts[1]
-            try:
-                start_ms = int(parts[2])
-                end_ms = int(parts[3])
-            except ValueError:
-                conn.sendall("[ERROR] start_ms и end_ms должны быть целыми числами".encode("utf-8"))
-                return
-
-            original_path = os.path.join(AUDIO_DIR, filename)
-            if not os.path.exists(original_path):
-                conn.sendall(f"[ERROR] Файл {filename} не найден на сервере.".encode("utf-8"))
-                return
-
-            audio = AudioSegment.from_file(original_path)
-            start_ms = max(0, start_ms)
-            end_ms = min(len(audio), end_ms)
-            if start_ms >= end_ms:
-                conn.sendall("[ERROR] Некорректные границы: start_ms >= end_ms".encode("utf-8"))
-                return
-
-            # Вырезаем аудиофрагмент
-            chunk = audio[start_ms:end_ms]
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.' + filename.split('.')[-1]) as tmp:
-                chunk.export(tmp.name, format=filename.split('.')[-1])
-                temp_path = tmp.name
-
-            try:
-                with open(temp_path, 'rb') as f_chunk:
-                    chunk_data = f_chunk.read()
-                    conn.sendall(chunk_data)
-            finally:
-                os.remove(temp_path)
-
-        else:
-            conn.sendall(f"[ERROR] Неизвестная команда: {request}".encode('utf-8'))
+        try:
+            response = execute_request(request, audio_list, AUDIO_DIR)
+        except RequestError as e:
+            response = error_response(e)
+        send_response(conn, response)
     except Exception as e:
         print(f"[ERROR] Ошибка при обработке клиента {addr}: {e}")
     finally:
         print(f"[INFO] Закрываем соединение с {addr}")
         conn.close()
 
-def start_server():
+def handle_framed_client(conn, audio_list):
+    """
+    Обслуживает подключение по бинарному протоколу: рукопожатие с выбором версии,
+    затем запросы по порядку, пока клиент не закроет соединение.
+    """
+    reader = SocketReader(conn)
+    handshake = reader.read_exact(HANDSHAKE.size)
+    if handshake is None:
+        return
+    magic, client_version = HANDSHAKE.unpack(handshake)
+    version = negotiate_version(client_version) if magic == MAGIC else 0
+    conn.sendall(HANDSHAKE.pack(MAGIC, version))
+    if not version:
+        return
+
+    while True:
+        header = reader.read_exact(REQUEST_HEADER.size)
+        if header is None:
+            return
+        length, request_id = REQUEST_HEADER.unpack(header)
+        if length > MAX_REQUEST_SIZE:
+            message = f"Запрос слишком большой: {length} байт".encode('utf-8')
+            conn.sendall(encode_response_header(request_id, STATUS_ERROR, len(message)) + message)
+            return
+        payload = reader.read_exact(length) if length else b''
+        if payload is None:
+            return
+
+        try:
+            response = execute_request(payload.decode('utf-8').strip(), audio_list, AUDIO_DIR)
+            status = STATUS_OK
+        except (RequestError, UnicodeDecodeError) as e:
+            response = str(e).encode('utf-8')
+            status = STATUS_ERROR
+        except Exception as e:
+            # Сбой одного запроса (например, ошибка ffmpeg) не разрывает постоянное соединение
+            print(f"[ERROR] Ошибка при выполнении запроса {request_id}: {e}")
+            response = f"Ошибка сервера: {e}".encode('utf-8')
+            status = STATUS_ERROR
+        send_response(conn, response, encode_response_header(request_id, status, response_length(response)))
+
+def start_server(backlog=BACKLOG):
     """
     Запускает сервер: привязывает сокет к порту и принимает подключения.
     Каждое новое подключение обрабатывается в отдельном потоке.
@@ -132,7 +210,7 @@ def start_server():
     except AttributeError:
         pass
     server_socket.bind((HOST, PORT))
-    server_socket.listen(5)
+    server_socket.listen(backlog)
     print(f"[INFO] Сервер запущен и слушает {HOST}:{PORT}")
 
     # Загружаем метаданные (если JSON уже существует)
@@ -151,14 +229,15 @@ def client_mode():
     и получает ответ. Если сервер не запущен, предлагает запустить его в фоновом режиме.
     """
     SERVER_ADDRESS = ('127.0.0.1', PORT)
-    user_command = input("Введите 'Список' или 'Отрезок аудиодорожки': ").strip().lower()
+    user_command = input("Введите 'Список', 'Отрезок аудиодорожки' или 'Несколько отрезков': ").strip().lower()
 
     if user_command == 'список':
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect(SERVER_ADDRESS)
-                s.sendall(b'LIST')
-                data = s.recv(8192)
+            with FramedClient(SERVER_ADDRESS) as client:
+                status, data = client.request('LIST')
+                if status != STATUS_OK:
+                    print(f"[ERROR] {data.decode('utf-8')}")
+                    return
                 try:
                     files = json.loads(data.decode('utf-8'))
                     formatted = json.dumps(files, indent=4, ensure_ascii=False)
@@ -188,21 +267,24 @@ def client_mode():
         except ValueError:
             print("[ERROR] Ошибка ввода: время должно быть целым числом.")
             return
+        options = input("Параметры перекодирования (например, format=mp3 rate=22050 channels=1 bitrate=64k), "
+                        "Enter — без изменений: ").strip()
 
-        command_str = f"CHUNK {filename} {start_ms} {end_ms}"
+        command_str = f"CHUNK {filename} {start_ms} {end_ms} {options}".strip()
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect(SERVER_ADDRESS)
-                s.sendall(command_str.encode('utf-8'))
-                chunk_data = b""
-                while True:
-                    packet = s.recv(4096)
-                    if not packet:
-                        break
-                    chunk_data += packet
+            with FramedClient(SERVER_ADDRESS) as client:
+                client.send(command_str)
+                _, status, length = client.read_response_header()
+                if status != STATUS_OK:
+                    print(f"[ERROR] {client.reader.read_exact(length).decode('utf-8')}")
+                    return
+                # Данные пишутся в файл по мере получения, не накапливаясь в памяти
                 out_filename = f"out_{filename}"
+                export_format = dict(o.partition('=')[::2] for o in options.split()).get('format')
+                if export_format:
+                    out_filename = f"{os.path.splitext(out_filename)[0]}.{export_format.lower()}"
                 with open(out_filename, "wb") as f_out:
-                    f_out.write(chunk_data)
+                    client.read_payload_into(f_out, length)
                 print(f"Аудиофрагмент сохранён в файл: {out_filename}")
         except ConnectionRefusedError as e:
             print("[ERROR] Соединение не установлено. Сервер, возможно, не запущен.")
@@ -215,13 +297,49 @@ def client_mode():
                 print("Не удалось подключиться к серверу. Завершение клиента.")
         except Exception as e:
             print(f"[ERROR] Не удалось получить фрагмент с сервера: {e}")
+    elif user_command == 'несколько отрезков':
+        filename = input("Введите имя аудиофайла (например, Get Lit.mp3): ").strip()
+        ranges = input("Введите отрезки в мс через запятую (например, 0-2000,5000-7000): ").replace(' ', '')
+        command_str = f"CHUNKS {filename} {ranges}"
+        try:
+            with FramedClient(SERVER_ADDRESS) as client:
+                status, data = client.request(command_str)
+                if status != STATUS_OK:
+                    print(f"[ERROR] {data.decode('utf-8')}")
+                    return
+                name, ext = os.path.splitext(filename)
+                for index, part in enumerate(decode_multipart(data), start=1):
+                    out_filename = f"out_{name}_{index}{ext}"
+                    with open(out_filename, "wb") as f_out:
+                        f_out.write(part)
+                    print(f"Аудиофрагмент сохранён в файл: {out_filename}")
+        except ConnectionRefusedError:
+            print("[ERROR] Соединение не установлено. Сервер, возможно, не запущен.")
+        except Exception as e:
+            print(f"[ERROR] Не удалось получить фрагменты с сервера: {e}")
     else:
-        print("[ERROR] Неверная команда. Введите 'Список' или 'Отрезок аудиодорожки'.")
+        print("[ERROR] Неверная команда. Введите 'Список', 'Отрезок аудиодорожки' или 'Несколько отрезков'.")
 
 def main():
+    global PORT
     parser = argparse.ArgumentParser(description="Аудио сервер / клиент")
-    parser.add_argument('--mode', choices=['server', 'client'], help="Запускать сервер или клиент")
+    parser.add_argument('--mode', choices=['server', 'server-async', 'client'],
+                        help="Запускать сервер (потоки или asyncio) или клиент")
+    parser.add_argument('--backlog', type=int, default=BACKLOG,
+                        help="Длина очереди входящих подключений сервера")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="Число потоков декодирования для режима server-async")
+    parser.add_argument('--index-workers', type=int, default=None,
+                        help="Число процессов для индексации изменённых файлов (по умолчанию — по числу ядер)")
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_CACHE_MB,
+                        help="Бюджет памяти кэша декодированного аудио, МБ (0 — отключить)")
+    parser.add_argument('--chunk-cache-mb', type=int, default=DEFAULT_CHUNK_CACHE_MB,
+                        help="Бюджет дискового кэша готовых фрагментов, МБ (0 — отключить)")
+    parser.add_argument('--port', type=int, default=PORT, help="Порт сервера")
     args = parser.parse_args()
+    PORT = args.port
+    audio_cache.max_bytes = max(0, args.cache_mb) * 1024 * 1024
+    chunk_cache.max_bytes = max(0, args.chunk_cache_mb) * 1024 * 1024
     
     if not args.mode:
         mode = input("Введите 'server' для запуска сервера или 'client' для запуска клиента: ").strip().lower()
@@ -230,14 +348,20 @@ def main():
     
     if mode == 'server':
         print("[INFO] Генерация (или обновление) списка аудиофайлов...")
-        generate_audio_metadata(AUDIO_DIR, JSON_METADATA_FILE)
+        generate_audio_metadata(AUDIO_DIR, JSON_METADATA_FILE, args.index_workers)
         print("[INFO] Запуск сервера...")
-        start_server()
+        start_server(args.backlog)
+    elif mode == 'server-async':
+        print("[INFO] Генерация (или обновление) списка аудиофайлов...")
+        generate_audio_metadata(AUDIO_DIR, JSON_METADATA_FILE, args.index_workers)
+        print("[INFO] Запуск asyncio-сервера...")
+        start_async_server(load_audio_metadata(JSON_METADATA_FILE), AUDIO_DIR, HOST, PORT,
+                           backlog=args.backlog, workers=args.workers)
     elif mode == 'client':
         print("Запуск клиента...")
         client_mode()
     else:
-        print("[ERROR] Неверный режим. Используйте 'server' или 'client'.")
+        print("[ERROR] Неверный режим. Используйте 'server', 'server-async' или 'client'.")
 
 if __name__ == "__main__":
     main()
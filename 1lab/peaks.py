@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+import os
+import mmap
+import struct
+
+try:
+    import numpy as np
+except ImportError:  # Без NumPy сервер работает, но пики не строятся и команда PEAKS недоступна
+    np = None
+
+# Пики хранятся рядом с индексом в бинарных файлах <имя аудиофайла>.peaks:
+#
+#   заголовок PEAKS_HEADER: b'PEAK', версия, число уровней, частота дискретизации,
+#                           число кадров, размер и mtime исходного файла;
+#   таблица уровней: для каждого уровня — кадров на отсчёт и число отсчётов;
+#   данные уровней подряд: min (int16), max (int16), rms (uint16) — по массиву на уровень.
+#
+# Уровень 0 — по BASE_BLOCK кадров на отсчёт, каждый следующий уровень вдвое грубее.
+# Файл читается через mmap, и в ответ копируются только нужные отсчёты одного уровня.
+
+PEAKS_DIR = 'peaks'
+PEAKS_MAGIC = b'PEAK'
+PEAKS_VERSION = 1
+PEAKS_HEADER = struct.Struct('<4sHHIQQQ')
+LEVEL_ENTRY = struct.Struct('<II')
+BASE_BLOCK = 256
+MAX_LEVELS = 24
+# Кадров за один проход при построении уровня 0 (кратно BASE_BLOCK)
+READ_BLOCK_FRAMES = BASE_BLOCK * 4096
+# Ответ PEAKS: кадров на отсчёт, первый кадр, число отсчётов, частота; затем min, max, rms
+PEAKS_RESPONSE_HEADER = struct.Struct('<IQII')
+
+
+def peaks_path(filename, peaks_dir=PEAKS_DIR):
+    return os.path.join(peaks_dir, filename + '.peaks')
+
+
+def _wav_sample_arrays(path, wav_info):
+    """
+    Отдаёт сэмплы WAV-файла блоками по READ_BLOCK_FRAMES кадров в виде
+    float32-массивов формы (кадры, каналы), нормированных к [-1, 1].
+    """
+    audio_format = struct.unpack('<H', wav_info.fmt_chunk[:2])[0]
+    if audio_format == 0xFFFE and len(wav_info.fmt_chunk) >= 26:
+        audio_format = struct.unpack('<H', wav_info.fmt_chunk[24:26])[0]  # Подформат EXTENSIBLE
+    width = wav_info.block_align // wav_info.channels
+    is_float = audio_format == 0x0003
+
+    with open(path, 'rb') as f:
+        f.seek(wav_info.data_offset)
+        remaining = wav_info.data_size
+        while remaining:
+            raw = np.frombuffer(f.read(min(remaining, READ_BLOCK_FRAMES * wav_info.block_align)), dtype=np.uint8)
+            if not len(raw):
+                break
+            remaining -= len(raw)
+            if is_float:
+                samples = raw.view('<f4' if width == 4 else '<f8').astype(np.float32)
+            elif width == 1:
+                samples = (raw.astype(np.float32) - 128.0) / 128.0
+            elif width == 3:
+                # 24 бита: дописываем младший нулевой байт и читаем как int32
+                triples = raw.reshape(-1, 3)
+                padded = np.zeros((len(triples), 4), dtype=np.uint8)
+                padded[:, 1:] = triples
+                samples = padded.view('<i4').ravel().astype(np.float32) / 2147483648.0
+            else:
+                dtype = {2: '<i2', 4: '<i4'}[width]
+                samples = raw.view(dtype).astype(np.float32) / float(1 << (8 * width - 1))
+            yield samples.reshape(-1, wav_info.channels)
+
+
+def _segment_sample_arrays(audio):
+    samples = np.frombuffer(audio.raw_data, dtype={1: np.int8, 2: '<i2', 4: '<i4'}[audio.sample_width])
+    samples = samples.reshape(-1, audio.channels)
+    scale = float(1 << (8 * audio.sample_width - 1))
+    step = READ_BLOCK_FRAMES
+    for pos in range(0, len(samples), step):
+        yield samples[pos:pos + step].astype(np.float32) / scale
+
+
+def _base_level(blocks):
+    """
+    Строит уровень 0: min, max, сумма квадратов и число кадров на каждый отсчёт.
+    Каналы сводятся в один: min/max — по всем каналам, сумма квадратов — средняя по каналам.
+    """
+    mins, maxs, sums, counts = [], [], [], []
+    total_frames = 0
+    for block in blocks:
+        frames = len(block)
+        total_frames += frames
+        full = frames // BASE_BLOCK * BASE_BLOCK
+        parts = [block[:full].reshape(-1, BASE_BLOCK, block.shape[1])]
+        if full < frames:
+            parts.append(block[full:][np.newaxis])
+        for part in parts:
+            mins.append(part.min(axis=(1, 2)))
+            maxs.append(part.max(axis=(1, 2)))
+            sums.append((part.astype(np.float64) ** 2).mean(axis=2).sum(axis=1))
+            counts.append(np.full(len(part), part.shape[1], dtype=np.int64))
+    if not mins:
+        empty = np.zeros(0)
+        return empty, empty, empty, empty.astype(np.int64), 0
+    return np.concatenate(mins), np.concatenate(maxs), np.concatenate(sums), np.concatenate(counts), total_frames
+
+
+def _next_level(mins, maxs, sums, counts):
+    if len(mins) % 2:
+        # Последний отсчёт без пары объединяется сам с собой как с пустым
+        mins = np.append(mins, mins[-1])
+        maxs = np.append(maxs, maxs[-1])
+        sums = np.append(sums, 0.0)
+        counts = np.append(counts, 0)
+    return (
+        np.minimum(mins[0::2], mins[1::2]),
+        np.maximum(maxs[0::2], maxs[1::2]),
+        sums[0::2] + sums[1::2],
+        counts[0::2] + counts[1::2],
+    )
+
+
+def build_peaks_file(filepath, out_path, wav_info=None, audio=None):
+    """
+    Строит пирамиду пиков и RMS для аудиофайла и записывает её в out_path.
+    Для WAV (wav_info) сэмплы читаются прямо из файла, иначе используется
+    декодированный AudioSegment (audio).
+    """
+    if np is None:
+        raise RuntimeError("Для построения пиков нужен NumPy")
+    if wav_info is not None:
+        blocks = _wav_sample_arrays(filepath, wav_info)
+        sample_rate = wav_info.sample_rate
+    else:
+        blocks = _segment_sample_arrays(audio)
+        sample_rate = audio.frame_rate
+    mins, maxs, sums, counts, total_frames = _base_level(blocks)
+
+    levels = []
+    block = BASE_BLOCK
+    while True:
+        rms = np.sqrt(sums / np.maximum(counts, 1))
+        levels.append((
+            block,
+            np.clip(np.round(mins * 32767), -32768, 32767).astype('<i2'),
+            np.clip(np.round(maxs * 32767), -32768, 32767).astype('<i2'),
+            np.clip(np.round(rms * 65535), 0, 65535).astype('<u2'),
+        ))
+        if len(mins) <= 1 or len(levels) == MAX_LEVELS:
+            break
+        mins, maxs, sums, counts = _next_level(mins, maxs, sums, counts)
+        block *= 2
+
+    stat = os.stat(filepath)
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    temp_path = out_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(PEAKS_HEADER.pack(PEAKS_MAGIC, PEAKS_VERSION, len(levels), sample_rate,
+                                  total_frames, stat.st_size, stat.st_mtime_ns))
+        for frames_per_bin, level_mins, _, _ in levels:
+            f.write(LEVEL_ENTRY.pack(frames_per_bin, len(level_mins)))
+        for _, level_mins, level_maxs, level_rms in levels:
+            f.write(level_mins.tobytes())
+            f.write(level_maxs.tobytes())
+            f.write(level_rms.tobytes())
+    os.replace(temp_path, out_path)
+
+
+def query_peaks(filepath, sidecar_path, start_ms, end_ms, resolution):
+    """
+    Возвращает пики для диапазона [start_ms, end_ms) с самого грубого уровня,
+    на котором в диапазоне не меньше resolution отсчётов (или с уровня 0).
+    Результат — PEAKS_RESPONSE_HEADER и массивы min, max, rms.
+    Возвращает None, если файла пиков нет или он устарел.
+    """
+    if not os.path.exists(sidecar_path):
+        return None
+    stat = os.stat(filepath)
+    with open(sidecar_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, version, level_count, sample_rate, total_frames, size, mtime_ns = PEAKS_HEADER.unpack_from(mm, 0)
+        if magic != PEAKS_MAGIC or version != PEAKS_VERSION or (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            return None
+
+        levels = []
+        data_offset = PEAKS_HEADER.size + LEVEL_ENTRY.size * level_count
+        for index in range(level_count):
+            frames_per_bin, bins = LEVEL_ENTRY.unpack_from(mm, PEAKS_HEADER.size + LEVEL_ENTRY.size * index)
+            levels.append((frames_per_bin, bins, data_offset))
+            data_offset += bins * 6  # min, max, rms по 2 байта
+
+        start_frame = min(total_frames, start_ms * sample_rate // 1000)
+        end_frame = min(total_frames, end_ms * sample_rate // 1000)
+        span = max(0, end_frame - start_frame)
+        frames_per_bin, bins, offset = levels[0]
+        for level in reversed(levels):
+            if span // level[0] >= resolution:
+                frames_per_bin, bins, offset = level
+                break
+
+        first = min(bins, start_frame // frames_per_bin)
+        last = min(bins, -(-end_frame // frames_per_bin))
+        count = max(0, last - first)
+        header = PEAKS_RESPONSE_HEADER.pack(frames_per_bin, first * frames_per_bin, count, sample_rate)
+        arrays = []
+        for array_index in range(3):
+            begin = offset + (array_index * bins + first) * 2
+            arrays.append(mm[begin:begin + count * 2])
+        return header + b''.join(arrays)
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+import socket
+import struct
+
+# Бинарный протокол с кадрами (framing) поверх одного постоянного TCP-подключения.
+#
+# Рукопожатие: клиент отправляет MAGIC + максимальную поддерживаемую версию (1 байт),
+# сервер отвечает MAGIC + выбранной версией (0 — версии несовместимы, подключение закрывается).
+# Старый текстовый протокол никогда не начинается с нулевого байта, поэтому сервер
+# различает клиентов по первому байту подключения.
+#
+# Запрос:  длина полезной нагрузки (4 байта) + id запроса (4 байта) + команда в UTF-8
+#          (те же команды, что и в текстовом протоколе: LIST, CHUNK ..., STATS).
+# Ответ:   длина (4 байта) + id запроса (4 байта) + статус (1 байт) + данные.
+#          При статусе STATUS_ERROR данные — текст ошибки в UTF-8.
+# Клиент может отправить сразу несколько запросов, не дожидаясь ответов;
+# ответы приходят в порядке запросов.
+#
+# Ответ на CHUNKS (в обоих протоколах) состоит из нескольких частей:
+# число частей (4 байта), затем для каждой части её длина (4 байта) и данные.
+
+MAGIC = b'\x00AUD'
+PROTOCOL_VERSION = 1
+MAX_REQUEST_SIZE = 64 * 1024
+RECV_BUFFER_SIZE = 64 * 1024
+
+HANDSHAKE = struct.Struct('>4sB')
+REQUEST_HEADER = struct.Struct('>II')
+RESPONSE_HEADER = struct.Struct('>IIB')
+PART_HEADER = struct.Struct('>I')
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+
+def negotiate_version(client_version):
+    """
+    Выбирает версию протокола для подключения (0 — общей версии нет).
+    """
+    if client_version < 1:
+        return 0
+    return min(client_version, PROTOCOL_VERSION)
+
+
+def encode_request(request_id, command):
+    payload = command.encode('utf-8')
+    return REQUEST_HEADER.pack(len(payload), request_id) + payload
+
+
+def encode_response_header(request_id, status, length):
+    return RESPONSE_HEADER.pack(length, request_id, status)
+
+
+def encode_multipart(parts):
+    chunks = [PART_HEADER.pack(len(parts))]
+    for part in parts:
+        chunks.append(PART_HEADER.pack(len(part)))
+        chunks.append(part)
+    return b''.join(chunks)
+
+
+def decode_multipart(payload):
+    """
+    Разбирает ответ CHUNKS на список частей (memoryview без копирования данных).
+    """
+    view = memoryview(payload)
+    (count,) = PART_HEADER.unpack_from(view, 0)
+    pos = PART_HEADER.size
+    parts = []
+    for _ in range(count):
+        (length,) = PART_HEADER.unpack_from(view, pos)
+        pos += PART_HEADER.size
+        if pos + length > len(view):
+            raise ValueError("Ответ CHUNKS обрезан")
+        parts.append(view[pos:pos + length])
+        pos += length
+    return parts
+
+
+class SocketReader:
+    """
+    Буферизованное чтение точного числа байт из блокирующего сокета.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._buffer = bytearray()
+
+    def read_exact(self, size):
+        """
+        Возвращает ровно size байт или None, если соединение закрыто до начала сообщения.
+        """
+        while len(self._buffer) < size:
+            packet = self.sock.recv(max(65536, size - len(self._buffer)))
+            if not packet:
+                if self._buffer:
+                    raise ConnectionError("Соединение закрыто посреди сообщения")
+                return None
+            self._buffer += packet
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def copy_to(self, out_file, size):
+        """
+        Записывает ровно size байт из сокета в файл. Данные принимаются через
+        recv_into в один заранее выделенный буфер, поэтому расход памяти
+        не зависит от размера ответа.
+        """
+        if self._buffer:
+            taken = min(size, len(self._buffer))
+            out_file.write(self._buffer[:taken])
+            del self._buffer[:taken]
+            size -= taken
+        buffer = memoryview(bytearray(min(size, RECV_BUFFER_SIZE)))
+        while size:
+            received = self.sock.recv_into(buffer, min(size, len(buffer)))
+            if not received:
+                raise ConnectionError("Соединение закрыто посреди сообщения")
+            out_file.write(buffer[:received])
+            size -= received
+
+
+class FramedClient:
+    """
+    Клиент бинарного протокола: одно подключение, много запросов (в том числе конвейером).
+    """
+
+    def __init__(self, address, timeout=None):
+        self.sock = socket.create_connection(address, timeout=timeout)
+        self.reader = SocketReader(self.sock)
+        self._next_id = 1
+        self.sock.sendall(HANDSHAKE.pack(MAGIC, PROTOCOL_VERSION))
+        reply = self.reader.read_exact(HANDSHAKE.size)
+        if reply is None:
+            raise ConnectionError("Сервер закрыл соединение во время рукопожатия")
+        magic, version = HANDSHAKE.unpack(reply)
+        if magic != MAGIC or version == 0:
+            self.close()
+            raise ConnectionError("Сервер не поддерживает бинарный протокол")
+        self.version = version
+
+    def send(self, command):
+        """
+        Отправляет запрос, не дожидаясь ответа. Возвращает id запроса.
+        """
+        request_id = self._next_id
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        self.sock.sendall(encode_request(request_id, command))
+        return request_id
+
+    def read_response_header(self):
+        """
+        Читает заголовок очередного ответа: (id запроса, статус, длина данных).
+        """
+        header = self.reader.read_exact(RESPONSE_HEADER.size)
+        if header is None:
+            raise ConnectionError("Сервер закрыл соединение")
+        length, request_id, status = RESPONSE_HEADER.unpack(header)
+        return request_id, status, length
+
+    def read_response(self):
+        """
+        Читает очередной ответ целиком: (id запроса, статус, данные).
+        """
+        request_id, status, length = self.read_response_header()
+        payload = self.reader.read_exact(length) if length else b''
+        if payload is None:
+            raise ConnectionError("Сервер закрыл соединение")
+        return request_id, status, payload
+
+    def read_payload_into(self, out_file, length):
+        """
+        Записывает данные ответа (длина из read_response_header) прямо в файл.
+        """
+        self.reader.copy_to(out_file, length)
+
+    def request(self, command):
+        """
+        Отправляет запрос и ждёт ответ: (статус, данные).
+        """
+        request_id = self.send(command)
+        response_id, status, payload = self.read_response()
+        if response_id != request_id:
+            raise ConnectionError(f"Ожидался ответ на запрос {request_id}, получен {response_id}")
+        return status, payload
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+import os
+import wave
+
+import pytest
+
+import commands
+from audio_cache import ChunkDiskCache
+from commands import execute_request, discard_response
+
+
+@pytest.fixture
+def audio_dir(tmp_path):
+    # 10 секунд тишины: 8 кГц, моно, 16 бит
+    with wave.open(str(tmp_path / 'silence.wav'), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(8000)
+        f.writeframes(b'\x00\x00' * 8000 * 10)
+    return str(tmp_path)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ChunkDiskCache(str(tmp_path / 'chunk_cache'))
+    monkeypatch.setattr(commands, 'chunk_cache', cache)
+    return cache
+
+
+def read_region(response):
+    try:
+        response.file.seek(response.offset)
+        return response.file.read(response.count)
+    finally:
+        discard_response(response)
+
+
+def test_clamped_ranges_share_cache_entry(audio_dir, cache):
+    # rate=... отключает быстрый путь WAV, фрагмент идёт через дисковый кэш
+    first = read_region(execute_request('CHUNK silence.wav 0 999999 rate=8000', [], audio_dir))
+    second = read_region(execute_request('CHUNK silence.wav -5 1000000 rate=8000', [], audio_dir))
+    assert first == second
+    assert (cache.stats()['misses'], cache.stats()['hits']) == (1, 1)
+
+
+def test_duration_from_index(audio_dir, cache):
+    path = os.path.join(audio_dir, 'silence.wav')
+    stat = os.stat(path)
+    audio_list = [{"name": "silence.wav", "duration_sec": 10.0, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}]
+    for end_ms in (10000, 20000):
+        discard_response(execute_request(f'CHUNK silence.wav 0 {end_ms} rate=8000', audio_list, audio_dir))
+    assert cache.stats()['hits'] == 1
+
+
+def test_removed_file_is_a_miss(audio_dir, cache):
+    discard_response(execute_request('CHUNK silence.wav 0 1000 rate=8000', [], audio_dir))
+    for name in os.listdir(cache.cache_dir):
+        os.remove(os.path.join(cache.cache_dir, name))
+    response = execute_request('CHUNK silence.wav 0 1000 rate=8000', [], audio_dir)
+    assert len(read_region(response)) == response.count
+    assert (cache.stats()['misses'], cache.stats()['hits']) == (2, 0)
+
+
+def test_hit_survives_eviction(audio_dir, cache):
+    discard_response(execute_request('CHUNK silence.wav 0 1000 rate=8000', [], audio_dir))
+    response = execute_request('CHUNK silence.wav 0 1000 rate=8000', [], audio_dir)
+    # Другой поток вытеснил фрагмент, пока этот ответ ждал отправки
+    os.remove(response.path)
+    assert len(read_region(response)) == response.count > 0
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+import wave
+
+import pytest
+
+import commands
+from commands import execute_request, RequestError
+from protocol import decode_multipart
+
+
+@pytest.fixture
+def audio_dir(tmp_path):
+    # 10 секунд тишины: 8 кГц, моно, 16 бит — 16000 байт в секунду
+    with wave.open(str(tmp_path / 'silence.wav'), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(8000)
+        f.writeframes(b'\x00\x00' * 8000 * 10)
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize('options', ['', ' rate=8000'])
+def test_chunks_within_limit(audio_dir, options):
+    response = execute_request('CHUNKS silence.wav 0-1000,5000-99999999' + options, [], audio_dir)
+    # 1 с и 5 с (конец обрезан по длительности) плюс 44 байта заголовка WAV
+    assert [len(part) for part in decode_multipart(response)] == [16000 + 44, 80000 + 44]
+
+
+@pytest.mark.parametrize('options', ['', ' rate=8000'])
+def test_chunks_total_size_is_capped(audio_dir, monkeypatch, options):
+    # Каждый диапазон укладывается в длительность, но вместе их слишком много
+    monkeypatch.setattr(commands, 'MAX_CHUNKS_BYTES', 16000 * 20)
+    ranges = ','.join(['0-99999999'] * 3)
+    with pytest.raises(RequestError, match='Слишком большой объём'):
+        execute_request(f'CHUNKS silence.wav {ranges}{options}', [], audio_dir)
+    execute_request(f'CHUNKS silence.wav 0-99999999,0-99999999{options}', [], audio_dir)
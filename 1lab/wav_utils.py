@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import os
+import struct
+from collections import namedtuple
+
+# Форматы без сжатия, у которых каждый кадр занимает block_align байт:
+# PCM, IEEE float и WAVE_FORMAT_EXTENSIBLE
+SLICEABLE_FORMATS = (0x0001, 0x0003, 0xFFFE)
+
+WavInfo = namedtuple(
+    'WavInfo',
+    ['channels', 'sample_rate', 'sample_width', 'block_align', 'data_offset', 'data_size', 'fmt_chunk']
+)
+
+
+def read_wav_info(path):
+    """
+    Разбирает RIFF-заголовок WAV-файла без чтения аудиоданных.
+    Возвращает WavInfo или None, если файл нельзя нарезать по байтам
+    (не RIFF/WAVE, сжатый формат, повреждённый заголовок).
+    """
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+            return None
+        fmt_chunk = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                return None
+            chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+            if chunk_id == b'fmt ':
+                if chunk_size < 16:
+                    return None
+                fmt_chunk = f.read(chunk_size)
+                if chunk_size % 2:
+                    f.seek(1, os.SEEK_CUR)
+            elif chunk_id == b'data':
+                if fmt_chunk is None:
+                    return None
+                data_offset = f.tell()
+                # Размер может быть завышен (обрезанный файл или потоковая запись)
+                data_size = min(chunk_size, file_size - data_offset)
+                break
+            else:
+                f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+    audio_format, channels, sample_rate, _, block_align, bits_per_sample = \
+        struct.unpack('<HHIIHH', fmt_chunk[:16])
+    if audio_format not in SLICEABLE_FORMATS or not channels or not sample_rate or not block_align:
+        return None
+    data_size -= data_size % block_align
+    return WavInfo(channels, sample_rate, bits_per_sample // 8, block_align, data_offset, data_size, fmt_chunk)
+
+
+def wav_duration_ms(info):
+    """
+    Длительность в миллисекундах (округление как у len(AudioSegment)).
+    """
+    return round(1000 * (info.data_size // info.block_align) / info.sample_rate)
+
+
+def wav_slice(info, start_ms, end_ms):
+    """
+    Переводит границы фрагмента в миллисекундах в смещение и длину внутри файла.
+    Границы уже должны быть ограничены длительностью файла.
+    Кадры выбираются так же, как при срезе AudioSegment[start_ms:end_ms].
+    """
+    start_frame = int(start_ms * info.sample_rate / 1000.0)
+    end_frame = int(end_ms * info.sample_rate / 1000.0)
+    total_frames = info.data_size // info.block_align
+    end_frame = min(end_frame, total_frames)
+    offset = info.data_offset + start_frame * info.block_align
+    return offset, max(0, end_frame - start_frame) * info.block_align
+
+
+def build_wav_header(info, data_size):
+    """
+    Собирает заголовок нового WAV-файла с исходным fmt-чанком и data-чанком заданного размера.
+    """
+    fmt_chunk = info.fmt_chunk + (b'\x00' if len(info.fmt_chunk) % 2 else b'')
+    riff_size = 4 + 8 + len(fmt_chunk) + 8 + data_size + data_size % 2
+    return (
+        struct.pack('<4sI4s', b'RIFF', riff_size, b'WAVE')
+        + struct.pack('<4sI', b'fmt ', len(info.fmt_chunk)) + fmt_chunk
+        + struct.pack('<4sI', b'data', data_size)
+    )
@@ -14,7 +14,7 @@ load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app.db.session import Base
-from app.models import user  # Импорт модели, чтобы Alembic видел её
+from app.models import user, codebook  # Импорт моделей, чтобы Alembic видел их
 
 # Получаем конфигурацию Alembic
 config = context.config
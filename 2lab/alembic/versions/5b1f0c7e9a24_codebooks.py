@@ -0,0 +1,39 @@
+"""codebooks
+
+Revision ID: 5b1f0c7e9a24
+Revises: d72bd6dea1ed
+Create Date: 2026-10-18 12:10:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1f0c7e9a24'
+down_revision: Union[str, None] = 'd72bd6dea1ed'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('codebooks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('codes', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name', 'version', name='uq_codebooks_name_version')
+    )
+    op.create_index(op.f('ix_codebooks_id'), 'codebooks', ['id'], unique=False)
+    op.create_index(op.f('ix_codebooks_name'), 'codebooks', ['name'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_codebooks_name'), table_name='codebooks')
+    op.drop_index(op.f('ix_codebooks_id'), table_name='codebooks')
+    op.drop_table('codebooks')
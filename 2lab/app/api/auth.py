@@ -1,49 +1,147 @@
 from app.schemas.user import UserCreate, UserRead, Token
 
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_async_db, open_async_session
 from app.schemas.user import UserRead, Token
-from app.cruds.user import get_user_by_email, create_user, verify_password
-from app.services.auth import create_access_token, decode_access_token
+from app.cruds.user import (
+    get_user_by_email_async, get_user_by_email_cached_async, create_user_with_hash_async,
+    update_password_hash_async, hash_password, verify_and_update_password, user_cache
+)
+from app.services.auth import create_access_token, decode_access_token_cached, token_cache, get_token_signer
+from app.services.workers import password_pool, PoolSaturated
+from app.services.user_import import IMPORT_FORMATS, csv_rows, ndjson_rows, import_users
+from app.core.config import PASSWORD_HASH_RETRY_AFTER, USER_IMPORT_MAX_BYTES
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/sign-up/", response_model=UserRead)
-def sign_up(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = get_user_by_email(db, user.email)
+async def sign_up(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await get_user_by_email_async(db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    created_user = create_user(db, user.email, user.password)
+    hashed_password = await run_password_job(hash_password, user.password)
+    created_user = await create_user_with_hash_async(db, user.email, hashed_password)
     return created_user
 
 @router.post("/login/", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     email = form_data.username
     password = form_data.password
-    user = get_user_by_email(db, email)
-    if not user or not verify_password(password, user.hashed_password):
+    user = await get_user_by_email_async(db, email)
+    if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
+    valid, new_hash = await run_password_job(verify_and_update_password, password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=400, detail="Incorrect email or password")
+    if new_hash:
+        # The configured bcrypt cost changed since this hash was made
+        await update_password_hash_async(db, user, new_hash)
     access_token = create_access_token({"sub": user.email})
     return {"access_token": access_token, "token_type": "bearer"}
 
+async def run_password_job(fn, *args):
+    # bcrypt runs in its own process pool; when too many hashes are queued, ask the client to retry
+    try:
+        return await password_pool.run(fn, *args)
+    except PoolSaturated:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, try again later",
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)}
+        )
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
 @router.get("/users/me/", response_model=UserRead)
-def get_me(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    payload = decode_access_token(token)
+async def get_me(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    # Both lookups are cached, so a repeated token costs neither a signature check nor a query
+    payload = decode_access_token_cached(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
     email = payload.get("sub")
-    db_user = get_user_by_email(db, email)
+    db_user = await get_user_by_email_cached_async(db, email)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
+
+@router.post("/users/import", response_class=StreamingResponse)
+async def import_users_endpoint(request: Request, token: str = Depends(oauth2_scheme)):
+    # Body: NDJSON or CSV (by Content-Type); response: NDJSON with one result per row
+    if not decode_access_token_cached(token):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = IMPORT_FORMATS.get(content_type)
+    if fmt is None:
+        raise HTTPException(
+            status_code=415, detail="Content-Type must be one of: " + ", ".join(IMPORT_FORMATS)
+        )
+    # The body is read before the response starts: once it does, Starlette listens for
+    # a disconnect on the same channel and the rest of the body would be lost
+    data = await read_limited_body(request, USER_IMPORT_MAX_BYTES)
+    try:
+        rows = csv_rows(data) if fmt == "csv" else ndjson_rows(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # The session lives as long as the response stream, not the request handler. The
+    # first result is awaited here, so an import that cannot get the password pool at
+    # all is refused with a 503 instead of a stream of "busy" rows.
+    db = open_async_session()
+    results = import_users(db, rows)
+    try:
+        first = [await results.__anext__()]
+    except StopAsyncIteration:
+        first = []
+    except PoolSaturated:
+        await db.close()
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, try again later",
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)}
+        )
+    except BaseException:
+        await db.close()
+        raise
+
+    async def body():
+        try:
+            for result in first:
+                yield json.dumps(result) + "\n"
+            async for result in results:
+                yield json.dumps(result) + "\n"
+        finally:
+            await results.aclose()
+            await db.close()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+async def read_limited_body(request: Request, limit: int) -> bytes:
+    # 413 as soon as the body is known to be too large: from Content-Length, or while
+    # reading it, without buffering the rest
+    too_large = HTTPException(status_code=413, detail=f"Body must not exceed {limit} bytes")
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise too_large
+    return bytes(body)
+
+@router.get("/.well-known/jwks.json")
+def jwks():
+    # Public keys for verifying our EdDSA/ES256 tokens elsewhere (empty with HS* secrets)
+    return get_token_signer().jwks()
+
+@router.get("/auth/cache-stats")
+def cache_stats():
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
+
+@router.get("/auth/password-pool")
+def password_pool_stats():
+    return password_pool.stats()
@@ -0,0 +1,33 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.db.session import get_db
+from app.schemas.codebook import CodebookCreate, CodebookRead, CodebookDetail
+from app.cruds.codebook import get_codebook, get_codebooks, create_codebook
+from app.services.encryption import build_huffman_tree, get_codes
+
+router = APIRouter()
+
+@router.post("/codebooks", response_model=CodebookDetail)
+def train_codebook(req: CodebookCreate, db: Session = Depends(get_db)):
+    # Train Huffman codes on a sample corpus; texts encoded with the codebook
+    # may only use characters that occur in it
+    if not req.corpus:
+        raise HTTPException(status_code=400, detail="Corpus must not be empty")
+    codes = get_codes(build_huffman_tree(req.corpus))
+    try:
+        return create_codebook(db, req.name, codes)
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="Codebook is being saved concurrently, try again")
+
+@router.get("/codebooks", response_model=List[CodebookRead])
+def list_codebooks(db: Session = Depends(get_db)):
+    return get_codebooks(db)
+
+@router.get("/codebooks/{codebook_id}", response_model=CodebookDetail)
+def read_codebook(codebook_id: int, db: Session = Depends(get_db)):
+    db_codebook = get_codebook(db, codebook_id)
+    if not db_codebook:
+        raise HTTPException(status_code=404, detail="Codebook not found")
+    return db_codebook
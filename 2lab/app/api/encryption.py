@@ -1,38 +1,260 @@
-from fastapi import APIRouter, Depends
-from app.schemas.encryption import EncodeRequest, EncodeResponse, DecodeRequest, DecodeResponse
+import base64
+import threading
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.orm import Session
+from app.db.session import get_db
+from app.schemas.encryption import EncodeRequest, EncodeResponse, DecodeRequest, DecodeResponse, BlockInfo
 from app.services.encryption import (
-    build_huffman_tree, get_codes, huffman_encode, huffman_decode,
-    xor_encrypt, xor_decrypt
+    build_decode_table, encode_blocks, decode_blocks, decode_block,
+    encode_payload, decode_payload, encode_with_table, decode_with_table,
+    encode_bytes_payload, decode_bytes_payload,
+    pack_binary_message, unpack_binary_message, StreamingEncoder, StreamingDecoder
 )
+from app.services.codebooks import codebook_cache
+from app.services.workers import encryption_pool, PoolSaturated
+from app.core.config import ENCRYPTION_INLINE_LIMIT, ENCRYPTION_RETRY_AFTER
 
 router = APIRouter()
 
 @router.post("/encode", response_model=EncodeResponse)
-def encode(req: EncodeRequest):
-    # Step 1: build Huffman tree and codes
-    tree = build_huffman_tree(req.text)
-    codes = get_codes(tree)
-    # Step 2: encode text by Huffman
-    encoded_huff, padding = huffman_encode(req.text, codes)
-    # Step 3: XOR encrypt the bytes of base64-decoded data
-    huff_bytes = base64.b64decode(encoded_huff)
-    xored = xor_encrypt(huff_bytes, req.key)
-    # Step 4: base64 encode final data
-    final_encoded = base64.b64encode(xored).decode()
-    return EncodeResponse(
-        encoded_data=final_encoded,
+async def encode(req: EncodeRequest, db: Session = Depends(get_db)):
+    if not req.key:
+        raise HTTPException(status_code=400, detail="Key must not be empty")
+    if req.mode == "bytes":
+        if req.codebook_id is not None or req.block_size is not None:
+            raise HTTPException(status_code=400, detail="Byte mode supports neither codebooks nor blocks")
+        data, lengths, padding = await run_job(len(req.text), encode_bytes_payload, req.text, req.key)
+        return await off_loop(
+            len(req.text), encode_response, data,
+            key=req.key, padding=padding, mode="bytes", code_lengths=base64.b64encode(lengths).decode()
+        )
+    codebook = await get_compiled_codebook(db, req.codebook_id) if req.codebook_id is not None else None
+    blocks = None
+    try:
+        if req.block_size is not None:
+            # Block-parallel mode: one shared codebook, blocks encoded in worker processes
+            data, codes, blocks = await run_job(
+                len(req.text), encode_blocks, req.text, req.key,
+                codebook.codes if codebook else None, req.block_size, fanout=True
+            )
+            padding = blocks[-1][2] if blocks else 0
+        elif codebook is not None:
+            # Stored codebook: no tree building, and the codes are not sent back
+            data, padding = await run_job(len(req.text), encode_with_table, req.text, req.key, codebook.encode_table)
+        else:
+            # Huffman-encode and XOR-encrypt as raw bytes, base64 only for the JSON response
+            data, codes, padding = await run_job(len(req.text), encode_payload, req.text, req.key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await off_loop(
+        len(req.text), encode_response, data,
         key=req.key,
-        huffman_codes=codes,
-        padding=padding
+        huffman_codes=None if codebook else codes,
+        codebook_id=codebook.id if codebook else None,
+        padding=padding,
+        blocks=[BlockInfo(offset=o, length=n, padding=p) for o, n, p in blocks] if blocks is not None else None
     )
 
 @router.post("/decode", response_model=DecodeResponse)
-def decode(req: DecodeRequest):
-    # Step 1: base64 decode, then XOR-decrypt
-    xored_bytes = base64.b64decode(req.encoded_data)
-    huff_bytes = xor_decrypt(xored_bytes, req.key)
-    # Step 2: base64 encode back to string for huffman_decode
-    huff_encoded = base64.b64encode(huff_bytes).decode()
-    # Step 3: Huffman decode
-    decoded_text = huffman_decode(huff_encoded, req.huffman_codes, req.padding)
-    return DecodeResponse(decoded_text=decoded_text)
+async def decode(req: DecodeRequest, db: Session = Depends(get_db)):
+    if not req.key:
+        raise HTTPException(status_code=400, detail="Key must not be empty")
+    if req.mode == "bytes":
+        if req.code_lengths is None:
+            raise HTTPException(status_code=400, detail="Byte mode requires code_lengths")
+        try:
+            data = await off_loop(len(req.encoded_data), decode_base64, req.encoded_data, "encoded_data")
+            lengths = decode_base64(req.code_lengths, "code_lengths")
+            size = decoded_size(len(data), [length for length in lengths if length])
+            decoded_text = await run_job(size, decode_bytes_payload, data, req.key, lengths, req.padding)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return await off_loop(len(decoded_text), render, DecodeResponse, decoded_text=decoded_text)
+    if req.codebook_id is None and req.huffman_codes is None:
+        raise HTTPException(status_code=400, detail="Either huffman_codes or codebook_id is required")
+    if req.block is not None and req.blocks is None:
+        raise HTTPException(status_code=400, detail="Decoding a single block requires the blocks index")
+    codebook = await get_compiled_codebook(db, req.codebook_id) if req.codebook_id is not None else None
+    codes = codebook.codes if codebook else req.huffman_codes
+    blocks = [(b.offset, b.length, b.padding) for b in req.blocks] if req.blocks is not None else None
+    code_lengths = [len(code) for code in codes.values()]
+    try:
+        data = await off_loop(len(req.encoded_data), decode_base64, req.encoded_data, "encoded_data")
+        size = decoded_size(len(data), code_lengths)
+        if req.block is not None:
+            decode_table = codebook.decode_table if codebook else build_decode_table(codes)
+            size = decoded_size(blocks[req.block][1] if 0 <= req.block < len(blocks) else 0, code_lengths)
+            decoded_text = await run_job(size, decode_block, data, req.key, decode_table, blocks, req.block)
+        elif blocks is not None:
+            decoded_text = await run_job(size, decode_blocks, data, req.key, codes, blocks, fanout=True)
+        elif codebook is not None:
+            decoded_text = await run_job(size, decode_with_table, data, req.key, codebook.decode_table, req.padding)
+        else:
+            decoded_text = await run_job(size, decode_payload, data, req.key, codes, req.padding)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await off_loop(len(decoded_text), render, DecodeResponse, decoded_text=decoded_text)
+
+async def off_loop(size: int, fn, *args, **kwargs):
+    # Base64 and JSON rendering of multi-MB strings take milliseconds of CPU; past the
+    # inline limit they run in the threadpool instead of blocking the event loop
+    if size <= ENCRYPTION_INLINE_LIMIT:
+        return fn(*args, **kwargs)
+    return await run_in_threadpool(fn, *args, **kwargs)
+
+def render(model, **fields) -> JSONResponse:
+    # A finished response: FastAPI passes it through instead of validating and
+    # serialising the endpoint's result on the event loop
+    return JSONResponse(jsonable_encoder(model(**fields)))
+
+def encode_response(data: bytes, **fields) -> JSONResponse:
+    return render(EncodeResponse, encoded_data=base64.b64encode(data).decode(), **fields)
+
+def decode_base64(value: str, field: str) -> bytes:
+    try:
+        return base64.b64decode(value, validate=True)
+    except ValueError:  # binascii.Error, or non-ASCII characters
+        raise ValueError(f"{field} is not valid base64")
+
+async def get_compiled_codebook(db: Session, codebook_id: int):
+    codebook = await run_in_threadpool(codebook_cache.get, db, codebook_id)
+    if codebook is None:
+        raise HTTPException(status_code=404, detail="Codebook not found")
+    return codebook
+
+def decoded_size(data_length: int, code_lengths) -> int:
+    # Decoding costs per output symbol, and with 1-bit codes a ciphertext byte expands
+    # to 8 of them, so decode jobs are sized by the longest output the data allows
+    return data_length * 8 // max(1, min(code_lengths, default=1))
+
+async def run_job(size: int, fn, *args, fanout: bool = False):
+    # Small payloads skip the process pool and its admission count, but still run in the
+    # threadpool, off the event loop; larger ones go to the bounded process pool, and
+    # when it is full the client is asked to retry later
+    if size <= ENCRYPTION_INLINE_LIMIT:
+        encryption_pool.record_inline()
+        return await run_in_threadpool(fn, *args)
+    try:
+        if fanout:
+            return await encryption_pool.run_fanout(fn, *args)
+        return await encryption_pool.run(fn, *args)
+    except PoolSaturated:
+        raise pool_busy()
+
+def pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, try again later",
+        headers={"Retry-After": str(ENCRYPTION_RETRY_AFTER)}
+    )
+
+@router.get("/encryption/workers")
+def workers_stats():
+    return encryption_pool.stats()
+
+# Binary variants: no base64 and no JSON string escaping. The key is passed in the
+# X-Key header; /encode/binary takes UTF-8 text and returns a packed message
+# (see pack_binary_message), /decode/binary takes that message and returns the text.
+
+@router.post("/encode/binary", response_class=Response)
+async def encode_binary(request: Request, x_key: str = Header(...)):
+    body = await request.body()
+    try:
+        text = await off_loop(len(body), body.decode, "utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be UTF-8 text")
+    if not x_key:
+        raise HTTPException(status_code=400, detail="Key must not be empty")
+    data, codes, padding = await run_job(len(text), encode_payload, text, x_key)
+    return Response(content=pack_binary_message(codes, padding, data), media_type="application/octet-stream")
+
+@router.post("/decode/binary", response_class=Response)
+async def decode_binary(request: Request, x_key: str = Header(...)):
+    if not x_key:
+        raise HTTPException(status_code=400, detail="Key must not be empty")
+    try:
+        codes, padding, data = unpack_binary_message(await request.body())
+        size = decoded_size(len(data), [len(code) for code in codes.values()])
+        text = await run_job(size, decode_payload, bytes(data), x_key, codes, padding)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    content = await off_loop(len(text), text.encode, "utf-8")
+    return Response(content=content, media_type="text/plain; charset=utf-8")
+
+# Streaming variants for large texts: same formats as the binary endpoints, but the
+# body is consumed chunk by chunk and the result is sent as a chunked response.
+# All Huffman work runs in the threadpool: feed/finish here, and the response
+# generators are plain iterators, which Starlette also iterates in the threadpool.
+# The size is not known upfront, so every stream holds an encryption pool slot
+# until its response has been sent.
+
+@router.post("/encode/stream", response_class=StreamingResponse)
+async def encode_stream(request: Request, x_key: str = Header(...)):
+    if not x_key:
+        raise HTTPException(status_code=400, detail="Key must not be empty")
+    acquire_stream_slot()
+    encoder = StreamingEncoder(x_key)
+    try:
+        async for chunk in request.stream():
+            await run_in_threadpool(encoder.write, chunk)
+        await run_in_threadpool(encoder.finish_input)
+    except UnicodeDecodeError:
+        encoder.close()
+        encryption_pool.release(failed=True)
+        raise HTTPException(status_code=400, detail="Body must be UTF-8 text")
+    except BaseException:
+        encoder.close()
+        encryption_pool.release(failed=True)
+        raise
+    return stream_response(encoder.iter_message(), encoder.close, "application/octet-stream")
+
+@router.post("/decode/stream", response_class=StreamingResponse)
+async def decode_stream(request: Request, x_key: str = Header(...)):
+    if not x_key:
+        raise HTTPException(status_code=400, detail="Key must not be empty")
+    acquire_stream_slot()
+    decoder = StreamingDecoder(x_key)
+    # The whole body is read before the response starts: once a StreamingResponse is
+    # running, Starlette listens for a disconnect on the same channel and would swallow
+    # the rest of the body. A malformed message therefore still gets a 400.
+    try:
+        async for chunk in request.stream():
+            await run_in_threadpool(decoder.write, chunk)
+        await run_in_threadpool(decoder.finish_input)
+    except ValueError as e:
+        decoder.close()
+        encryption_pool.release(failed=True)
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        decoder.close()
+        encryption_pool.release(failed=True)
+        raise
+    return stream_response(decoder.iter_text(), decoder.close, "text/plain; charset=utf-8")
+
+def acquire_stream_slot() -> None:
+    try:
+        encryption_pool.acquire()
+    except PoolSaturated:
+        raise pool_busy()
+
+def stream_response(chunks, close, media_type: str) -> StreamingResponse:
+    # The slot is released when the body ends, or by the background task when the client
+    # left before it started (an unstarted generator never reaches its finally)
+    once = threading.Lock()
+
+    def release():
+        if once.acquire(blocking=False):
+            close()
+            encryption_pool.release()
+
+    def body():
+        try:
+            yield from chunks
+        finally:
+            release()
+
+    return StreamingResponse(body(), media_type=media_type, background=BackgroundTask(release))
@@ -5,5 +5,50 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+# Token keys (see app/services/tokens.py). HS* tokens are signed with SECRET_KEY,
+# EdDSA/ES256 ones with the PEM private key in JWT_PRIVATE_KEY_FILE. JWT_KEY_ID is put
+# into new tokens as "kid"; JWT_VERIFY_KEYS lists older keys still accepted:
+# "kid=ALG:secret-or-pem-path,...". An empty kid ("=HS256:old-secret") is the key for
+# tokens without a kid, i.e. those issued before JWT_KEY_ID was first set; without it
+# they are checked against the active key.
+JWT_KEY_ID = os.getenv("JWT_KEY_ID") or None
+JWT_PRIVATE_KEY_FILE = os.getenv("JWT_PRIVATE_KEY_FILE")
+JWT_VERIFY_KEYS = os.getenv("JWT_VERIFY_KEYS", "")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+CODEBOOK_CACHE_SIZE = int(os.getenv("CODEBOOK_CACHE_SIZE", 128))
+ENCRYPTION_WORKERS = int(os.getenv("ENCRYPTION_WORKERS", os.cpu_count() or 1))
+ENCRYPTION_QUEUE_LIMIT = int(os.getenv("ENCRYPTION_QUEUE_LIMIT", 16))
+# Payloads up to this many characters/bytes are processed inline, larger ones in the worker pool
+ENCRYPTION_INLINE_LIMIT = int(os.getenv("ENCRYPTION_INLINE_LIMIT", 64 * 1024))
+ENCRYPTION_RETRY_AFTER = int(os.getenv("ENCRYPTION_RETRY_AFTER", 1))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", 300))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 60))
+# bcrypt cost; hashes made with a different cost are re-hashed on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 64))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", 1))
+# Rows per transaction in the bulk user import
+USER_IMPORT_BATCH_SIZE = int(os.getenv("USER_IMPORT_BATCH_SIZE", 500))
+# Passwords per hashing job in the import (every job is admitted to the password pool on
+# its own), and how long, in seconds, an import batch may wait for pool capacity
+USER_IMPORT_HASH_CHUNK = int(os.getenv("USER_IMPORT_HASH_CHUNK", 8))
+USER_IMPORT_HASH_TIMEOUT = float(os.getenv("USER_IMPORT_HASH_TIMEOUT", 30))
+# The import body is read into memory before the results stream starts; larger bodies get a 413
+USER_IMPORT_MAX_BYTES = int(os.getenv("USER_IMPORT_MAX_BYTES", 16 * 1024 * 1024))
+# Async engine URL; by default derived from DATABASE_URL (sqlite -> aiosqlite, postgresql -> asyncpg)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# SQLite connection tuning (see app/db/sqlite.py). The sync and async engines cannot share
+# a pool, so a SQLite file gets one writer connection per engine kind (two in all) and
+# a reader pool of SQLITE_READER_POOL_SIZE per engine kind; the two writers wait for
+# each other on busy_timeout (bench_sqlite.py --async-writers measures this)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -64 * 1024))  # negative: in KiB
+SQLITE_READER_POOL_SIZE = int(os.getenv("SQLITE_READER_POOL_SIZE", 8))
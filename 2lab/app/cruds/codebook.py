@@ -0,0 +1,35 @@
+from typing import Dict
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.codebook import Codebook
+
+def get_codebook(db: Session, codebook_id: int):
+    return db.get(Codebook, codebook_id)
+
+def get_codebooks(db: Session):
+    return db.query(Codebook).order_by(Codebook.name, Codebook.version).all()
+
+# Concurrent saves under one name can still pick the same version on databases that
+# run the INSERT's subquery on a snapshot; the unique (name, version) index catches
+# that, and the save is retried with a fresh version
+CREATE_CODEBOOK_ATTEMPTS = 5
+
+def create_codebook(db: Session, name: str, codes: Dict[str, str]):
+    # Codebooks are immutable: saving under an existing name adds the next version.
+    # The version is computed inside the INSERT, so it is read by the same statement
+    # (and on the same writer connection) that takes it.
+    next_version = select(func.coalesce(func.max(Codebook.version), 0) + 1) \
+        .where(Codebook.name == name).scalar_subquery()
+    for attempt in range(CREATE_CODEBOOK_ATTEMPTS):
+        db_codebook = Codebook(name=name, version=next_version, codes=codes)
+        db.add(db_codebook)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            if attempt == CREATE_CODEBOOK_ATTEMPTS - 1:
+                raise
+            continue
+        db.refresh(db_codebook)
+        return db_codebook
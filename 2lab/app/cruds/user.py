@@ -1,19 +1,95 @@
-from sqlalchemy.orm import Session
+from typing import Dict, List, Set, Tuple
+from sqlalchemy import select, insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
+from app.schemas.user import UserRead
+from app.core.config import USER_CACHE_SIZE, USER_CACHE_TTL, BCRYPT_ROUNDS
+from app.services.cache import TTLCache
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
+# email -> UserRead snapshot (not the ORM object, which is bound to its session).
+# Every function that writes users must invalidate the affected emails.
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
 
-def create_user(db: Session, email: str, password: str):
-    hashed_password = pwd_context.hash(password)
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+async def get_user_by_email_cached_async(db: AsyncSession, email: str):
+    cached = user_cache.get(email)
+    if cached is not None:
+        return cached
+    db_user = await get_user_by_email_async(db, email)
+    if db_user is None:
+        return None
+    user = UserRead(id=db_user.id, email=db_user.email)
+    user_cache.set(email, user)
+    return user
+
+async def create_user_with_hash_async(db: AsyncSession, email: str, hashed_password: str):
     db_user = User(email=email, hashed_password=hashed_password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    user_cache.invalidate(email)
+    return db_user
+
+async def get_existing_emails_async(db: AsyncSession, emails: List[str]) -> Set[str]:
+    # One query for the whole batch instead of a lookup per email
+    if not emails:
+        return set()
+    result = await db.execute(select(User.email).where(User.email.in_(emails)))
+    return set(result.scalars())
+
+# Dialects whose INSERT can skip rows that hit the unique email index
+UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+async def insert_users_async(db: AsyncSession, users: List[Tuple[str, str]]) -> Dict[str, int]:
+    # Inserts (email, hashed_password) pairs in one transaction and returns email -> id
+    # for the rows actually inserted; emails taken meanwhile by another request are skipped
+    if not users:
+        return {}
+    upsert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if upsert is not None:
+        stmt = upsert(User).on_conflict_do_nothing(index_elements=[User.email])
+    else:
+        stmt = insert(User)
+    result = await db.execute(
+        stmt.returning(User.id, User.email),
+        [{"email": email, "hashed_password": hashed_password} for email, hashed_password in users]
+    )
+    created = {email: user_id for user_id, email in result}
+    await db.commit()
+    for email in created:
+        user_cache.invalidate(email)
+    return created
+
+async def update_password_hash_async(db: AsyncSession, db_user: User, hashed_password: str):
+    db_user.hashed_password = hashed_password
+    await db.commit()
+    user_cache.invalidate(db_user.email)
     return db_user
 
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    # One pool job for a few passwords: fewer round-trips than a job per hash
+    return [hash_password(password) for password in passwords]
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
+
+def verify_and_update_password(plain_password, hashed_password):
+    # (valid, new hash or None): a new hash is returned when the stored one uses another cost
+    return pwd_context.verify_and_update(plain_password, hashed_password)
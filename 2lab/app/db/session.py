@@ -1,11 +1,91 @@
+from functools import lru_cache
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from dotenv import load_dotenv
-import os
+from app.core.config import (
+    DATABASE_URL, ASYNC_DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_PRE_PING,
+    SQLITE_READER_POOL_SIZE
+)
+from app.db.sqlite import is_sqlite_file, configure_sqlite, routing_session_class
 
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Async drivers for the URL schemes we use: aiosqlite locally, asyncpg for PostgreSQL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def to_async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    if "+" in scheme or scheme not in ASYNC_DRIVERS:
+        return url
+    return ASYNC_DRIVERS[scheme] + sep + rest
+
+def engine_options(url: str, pool_size: int = DB_POOL_SIZE) -> dict:
+    # For SQLite files pool_size is the reader pool (the writer gets one connection),
+    # for in-memory SQLite the default pool is kept
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+        if not is_sqlite_file(url):
+            return options
+        options["max_overflow"] = 0
+    else:
+        options["max_overflow"] = DB_MAX_OVERFLOW
+    options["pool_size"] = pool_size
+    return options
+
+def make_engines(url: str, create):
+    # Returns (engine, reader engine or None, session class). Called once for the sync
+    # and once for the async engines: one writer connection per engine kind
+    if not is_sqlite_file(url):
+        return create(url, **engine_options(url)), None, None
+    writer = create(url, **engine_options(url, pool_size=1))
+    reader = create(url, **engine_options(url, pool_size=SQLITE_READER_POOL_SIZE))
+    configure_sqlite(writer)
+    configure_sqlite(reader)
+    return writer, reader, routing_session_class(writer, reader)
+
+engine, read_engine, routing_session = make_engines(DATABASE_URL, create_engine)
+if routing_session is not None:
+    SessionLocal = sessionmaker(class_=routing_session, autocommit=False, autoflush=False)
+else:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+@lru_cache(maxsize=None)
+def get_async_engines():
+    # (engine, reader engine or None, session factory), created on first use: alembic
+    # and the sync endpoints work without the async driver and greenlet installed
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    url = ASYNC_DATABASE_URL or to_async_url(DATABASE_URL)
+    async_engine, async_read_engine, async_routing_session = make_engines(url, create_async_engine)
+    if async_routing_session is not None:
+        factory = sessionmaker(
+            class_=AsyncSession, sync_session_class=async_routing_session, autoflush=False, expire_on_commit=False
+        )
+    else:
+        factory = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    return async_engine, async_read_engine, factory
+
+def open_async_session():
+    return get_async_engines()[2]()
+
+async def dispose_async_engines():
+    # Nothing to do if no request has used the async engines
+    if get_async_engines.cache_info().currsize == 0:
+        return
+    async_engine, async_read_engine, _ = get_async_engines()
+    await async_engine.dispose()
+    if async_read_engine is not None:
+        await async_read_engine.dispose()
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with open_async_session() as db:
+        yield db
@@ -0,0 +1,58 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from app.core.config import (
+    SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE
+)
+
+# Applied to every new SQLite connection. WAL lets readers work while a write is in
+# progress, synchronous=NORMAL is safe with WAL and skips an fsync per commit,
+# busy_timeout makes a locked database wait instead of failing at once.
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", SQLITE_BUSY_TIMEOUT_MS),
+    ("mmap_size", SQLITE_MMAP_SIZE),
+    ("cache_size", SQLITE_CACHE_SIZE),
+)
+
+def is_sqlite_file(url: str) -> bool:
+    # In-memory databases are private to a connection, so they cannot be split into pools
+    url = make_url(url)
+    database = url.database or ""
+    return url.get_backend_name() == "sqlite" and database not in ("", ":memory:") \
+        and "mode=memory" not in database and url.query.get("mode") != "memory"
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def configure_sqlite(engine) -> None:
+    # Works for async engines too: their pool events live on the sync engine
+    event.listen(getattr(engine, "sync_engine", engine), "connect", set_sqlite_pragmas)
+
+def routing_session_class(writer, reader):
+    # SQLite allows one writer at a time: flushes (and every statement after them, until
+    # the transaction ends) go to the single-connection writer engine, plain reads go to
+    # the reader pool. Async engines are passed as their sync_engine.
+    writer = getattr(writer, "sync_engine", writer)
+    reader = getattr(reader, "sync_engine", reader)
+
+    class RoutingSession(Session):
+        def get_bind(self, mapper=None, clause=None, **kw):
+            if self._flushing or self.info.get("wrote") or getattr(clause, "is_dml", False):
+                return writer
+            return reader
+
+    @event.listens_for(RoutingSession, "after_flush")
+    def mark_written(session, flush_context):
+        session.info["wrote"] = True
+
+    @event.listens_for(RoutingSession, "after_commit")
+    @event.listens_for(RoutingSession, "after_rollback")
+    def reset_written(session):
+        session.info.pop("wrote", None)
+
+    return RoutingSession
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String, JSON, UniqueConstraint
+from app.db.session import Base
+
+class Codebook(Base):
+    __tablename__ = "codebooks"
+    __table_args__ = (UniqueConstraint("name", "version", name="uq_codebooks_name_version"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, index=True, nullable=False)
+    version = Column(Integer, nullable=False)
+    codes = Column(JSON, nullable=False)
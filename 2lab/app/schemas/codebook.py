@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Dict
+
+class CodebookCreate(BaseModel):
+    name: str
+    corpus: str
+
+class CodebookRead(BaseModel):
+    id: int
+    name: str
+    version: int
+
+    class Config:
+        orm_mode = True
+
+class CodebookDetail(CodebookRead):
+    codes: Dict[str, str]
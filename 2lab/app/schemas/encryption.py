@@ -1,21 +1,39 @@
-from pydantic import BaseModel
-from typing import Dict
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
+from app.services.encryption import MIN_BLOCK_SIZE
+
+class BlockInfo(BaseModel):
+    offset: int
+    length: int
+    padding: int
 
 class EncodeRequest(BaseModel):
     text: str
     key: str
+    codebook_id: Optional[int] = None
+    block_size: Optional[int] = Field(None, ge=MIN_BLOCK_SIZE)  # characters per block, enables block-parallel encoding
+    mode: Literal["text", "bytes"] = "text"  # "bytes": Huffman over UTF-8 bytes with canonical codes
 
 class EncodeResponse(BaseModel):
     encoded_data: str
     key: str
-    huffman_codes: Dict[str, str]
+    huffman_codes: Optional[Dict[str, str]] = None
+    codebook_id: Optional[int] = None
     padding: int
+    blocks: Optional[List[BlockInfo]] = None
+    mode: Literal["text", "bytes"] = "text"
+    code_lengths: Optional[str] = None  # byte mode codebook: base64 of one code length per byte value
 
 class DecodeRequest(BaseModel):
     encoded_data: str
     key: str
-    huffman_codes: Dict[str, str]
+    huffman_codes: Optional[Dict[str, str]] = None
+    codebook_id: Optional[int] = None
     padding: int
+    blocks: Optional[List[BlockInfo]] = None
+    block: Optional[int] = None  # decode only this block of `blocks`
+    mode: Literal["text", "bytes"] = "text"
+    code_lengths: Optional[str] = None
 
 class DecodeResponse(BaseModel):
     decoded_text: str
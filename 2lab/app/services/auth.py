@@ -1,17 +1,42 @@
-from datetime import datetime, timedelta
-from jose import jwt, JWTError
-from app.core.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+import time
+from functools import lru_cache
+from app.core.config import (
+    SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL,
+    JWT_KEY_ID, JWT_PRIVATE_KEY_FILE, JWT_VERIFY_KEYS
+)
+from app.services.cache import TTLCache
+from app.services.tokens import TokenSigner, HMAC_DIGESTS, load_key, load_key_file, parse_key_specs
+
+# Verified token -> claims; an entry never outlives the token's own "exp"
+token_cache = TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+
+@lru_cache(maxsize=None)
+def get_token_signer() -> TokenSigner:
+    # Built once (main.py does it at startup, so a bad key setup fails there)
+    if ALGORITHM in HMAC_DIGESTS:
+        if not SECRET_KEY:
+            raise RuntimeError("SECRET_KEY is not set")
+        active_key = load_key(ALGORITHM, SECRET_KEY)
+    else:
+        if not JWT_PRIVATE_KEY_FILE:
+            raise RuntimeError(f"{ALGORITHM} tokens need JWT_PRIVATE_KEY_FILE")
+        active_key = load_key_file(ALGORITHM, JWT_PRIVATE_KEY_FILE)
+    keys = parse_key_specs(JWT_VERIFY_KEYS)
+    keys[JWT_KEY_ID] = active_key
+    return TokenSigner(keys, JWT_KEY_ID, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
 
 def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return get_token_signer().issue(data)
 
 def decode_access_token(token: str):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    return get_token_signer().verify(token)
+
+def decode_access_token_cached(token: str):
+    payload = token_cache.get(token)
+    if payload is not None:
         return payload
-    except JWTError:
-        return None
+    payload = decode_access_token(token)
+    if payload is not None:
+        exp = payload.get("exp")
+        token_cache.set(token, payload, exp - time.time() if exp is not None else None)
+    return payload
@@ -0,0 +1,40 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+from app.core.config import CODEBOOK_CACHE_SIZE
+from app.cruds.codebook import get_codebook
+from app.services.encryption import build_encode_table, build_decode_table
+
+class CompiledCodebook:
+    def __init__(self, codebook_id: int, codes: Dict[str, str]):
+        self.id = codebook_id
+        self.codes = codes
+        self.encode_table = build_encode_table(codes)
+        self.decode_table = build_decode_table(codes)
+
+class CodebookCache:
+    # LRU of codebooks with precompiled tables. Codebooks never change once
+    # stored (a retrained one gets a new id), so entries need no invalidation.
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, codebook_id: int) -> Optional[CompiledCodebook]:
+        with self._lock:
+            compiled = self._items.get(codebook_id)
+            if compiled is not None:
+                self._items.move_to_end(codebook_id)
+                return compiled
+        db_codebook = get_codebook(db, codebook_id)
+        if db_codebook is None:
+            return None
+        compiled = CompiledCodebook(db_codebook.id, db_codebook.codes)
+        with self._lock:
+            self._items[codebook_id] = compiled
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return compiled
+
+codebook_cache = CodebookCache(CODEBOOK_CACHE_SIZE)
@@ -1,9 +1,21 @@
+import json
 import heapq
 import base64
+import codecs
+import struct
+import tempfile
 from collections import Counter
-from typing import Dict, Tuple
+from itertools import repeat
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 class HuffmanNode:
+    __slots__ = ("char", "freq", "left", "right")
+
     def __init__(self, char=None, freq=0):
         self.char = char
         self.freq = freq
@@ -14,7 +26,9 @@ class HuffmanNode:
         return self.freq < other.freq
 
 def build_huffman_tree(text: str) -> HuffmanNode:
-    freq = Counter(text)
+    return build_huffman_tree_from_freq(Counter(text))
+
+def build_huffman_tree_from_freq(freq: Dict[str, int]) -> HuffmanNode:
     heap = [HuffmanNode(ch, fr) for ch, fr in freq.items()]
     heapq.heapify(heap)
     while len(heap) > 1:
@@ -36,33 +50,560 @@ def get_codes(node: HuffmanNode, prefix="", codebook=None) -> Dict[str, str]:
         get_codes(node.right, prefix + "1", codebook)
     return codebook
 
+# Bits looked up per step by the table-driven decoder; longer codes go through sub-tables
+DECODE_LOOKUP_BITS = 10
+
+def build_encode_table(codes: Dict[str, str]) -> Dict[str, Tuple[int, int]]:
+    return {ch: (int(code, 2), len(code)) for ch, code in codes.items()}
+
+def build_decode_table(codes: Dict[str, str], lookup_bits: int = DECODE_LOOKUP_BITS):
+    entries = [(ch, int(code, 2), len(code)) for ch, code in codes.items() if code]
+    return _build_lookup_table(entries, lookup_bits)
+
+def _build_lookup_table(entries, lookup_bits):
+    # Every index of a 2**bits table whose high bits start with a code maps to
+    # (symbol, code length, None); codes longer than `bits` share a sub-table
+    # (None, bits, sub_table) keyed by their first `bits` bits. Shorter codes are
+    # written last so that, as in the bit-by-bit decoder, the shortest match wins.
+    if not entries:
+        return [None], 0
+    bits = min(lookup_bits, max(length for _, _, length in entries))
+    table = [None] * (1 << bits)
+    long_codes = {}
+    for symbol, code, length in sorted(entries, key=lambda entry: -entry[2]):
+        if length > bits:
+            rest = length - bits
+            long_codes.setdefault(code >> rest, []).append((symbol, code & ((1 << rest) - 1), rest))
+            continue
+        shift = bits - length
+        start = code << shift
+        table[start:start + (1 << shift)] = [(symbol, length, None)] * (1 << shift)
+    for prefix, sub_entries in long_codes.items():
+        if table[prefix] is None:
+            table[prefix] = (None, bits, _build_lookup_table(sub_entries, lookup_bits))
+    return table, bits
+
+def encode_symbols(symbols, table: Dict[str, Tuple[int, int]]) -> Tuple[bytearray, int]:
+    out = bytearray()
+    acc, nbits = _encode_into(out, symbols, table, 0, 0)
+    padding = (8 - nbits % 8) % 8
+    if nbits:
+        out += (acc << padding).to_bytes((nbits + padding) >> 3, "big")
+    return out, padding
+
+def _encode_into(out: bytearray, symbols, table, acc: int, nbits: int) -> Tuple[int, int]:
+    # Appends whole bytes to `out`; returns the bits (< 64) still waiting in the accumulator
+    for symbol in symbols:
+        code, length = table[symbol]
+        acc = (acc << length) | code
+        nbits += length
+        if nbits >= 64:
+            rest = nbits & 7
+            out += (acc >> rest).to_bytes((nbits - rest) >> 3, "big")
+            acc &= (1 << rest) - 1
+            nbits = rest
+    return acc, nbits
+
+def decode_symbols(data: bytes, padding: int, decode_table) -> list:
+    decoded = []
+    _decode_range(data, 0, len(data) * 8 - padding, decode_table, decoded.append)
+    return decoded
+
+def _decode_range(data, start_bit: int, total_bits: int, decode_table, append) -> int:
+    # Decodes symbols from bit `start_bit` until no further code fits before `total_bits`;
+    # returns the bit position where decoding stopped
+    root_table, root_bits = decode_table
+    root_mask = (1 << root_bits) - 1
+    size = len(data)
+    pos = start_bit >> 3
+    acc = 0
+    nbits = 0
+    consumed = start_bit
+    if start_bit & 7:
+        nbits = 8 - (start_bit & 7)
+        acc = data[pos] & ((1 << nbits) - 1)
+        pos += 1
+    while consumed < total_bits:
+        if nbits < 64 and pos < size:
+            chunk = data[pos:pos + 8]
+            pos += len(chunk)
+            acc = (acc << (len(chunk) << 3)) | int.from_bytes(chunk, "big")
+            nbits += len(chunk) << 3
+        if nbits >= root_bits:
+            entry = root_table[(acc >> (nbits - root_bits)) & root_mask]
+        else:
+            entry = root_table[(acc << (root_bits - nbits)) & root_mask]
+        if entry is None:
+            break
+        symbol, length, sub_table = entry
+        if sub_table is not None:
+            # Codes longer than the root table: walk sub-tables, refilling as needed
+            avail = nbits - root_bits
+            while sub_table is not None:
+                table, bits = sub_table
+                while avail < bits and pos < size:
+                    chunk = data[pos:pos + 8]
+                    pos += len(chunk)
+                    acc = (acc << (len(chunk) << 3)) | int.from_bytes(chunk, "big")
+                    nbits += len(chunk) << 3
+                    avail += len(chunk) << 3
+                if avail >= bits:
+                    entry = table[(acc >> (avail - bits)) & ((1 << bits) - 1)]
+                else:
+                    entry = table[(acc << (bits - avail)) & ((1 << bits) - 1)]
+                if entry is None:
+                    return consumed
+                symbol, length, sub_table = entry
+                if sub_table is not None:
+                    avail -= bits
+            length += nbits - avail
+        if length > nbits or consumed + length > total_bits:
+            break
+        append(symbol)
+        consumed += length
+        nbits -= length
+        acc &= (1 << nbits) - 1
+    return consumed
+
 def huffman_encode(text: str, codes: Dict[str, str]) -> Tuple[str, int]:
-    bit_string = ''.join(codes[ch] for ch in text)
-    padding = (8 - len(bit_string) % 8) % 8
-    bit_string += "0" * padding
-    b = bytearray()
-    for i in range(0, len(bit_string), 8):
-        b.append(int(bit_string[i:i+8], 2))
-    return base64.b64encode(bytes(b)).decode(), padding
+    data, padding = encode_symbols(text, build_encode_table(codes))
+    return base64.b64encode(data).decode(), padding
 
 def huffman_decode(encoded_data: str, codes: Dict[str, str], padding: int) -> str:
-    rev_codes = {v: k for k, v in codes.items()}
     data = base64.b64decode(encoded_data)
-    bit_string = ''.join(f"{byte:08b}" for byte in data)
-    if padding:
-        bit_string = bit_string[:-padding]
-    decoded = []
-    code = ""
-    for bit in bit_string:
-        code += bit
-        if code in rev_codes:
-            decoded.append(rev_codes[code])
-            code = ""
-    return "".join(decoded)
+    return "".join(decode_symbols(data, padding, build_decode_table(codes)))
+
+class HuffmanStreamEncoder:
+    # Huffman-encodes text fed in pieces; feed() returns the bytes completed so far
+    def __init__(self, codes: Dict[str, str]):
+        self.table = build_encode_table(codes)
+        self.acc = 0
+        self.nbits = 0
+
+    def feed(self, text: str) -> bytearray:
+        out = bytearray()
+        self.acc, self.nbits = _encode_into(out, text, self.table, self.acc, self.nbits)
+        rest = self.nbits & 7
+        out += (self.acc >> rest).to_bytes(self.nbits >> 3, "big")
+        self.acc &= (1 << rest) - 1
+        self.nbits = rest
+        return out
+
+    def finish(self) -> Tuple[bytearray, int]:
+        padding = (8 - self.nbits) % 8
+        out = bytearray((self.acc << padding).to_bytes((self.nbits + padding) >> 3, "big"))
+        self.acc = self.nbits = 0
+        return out, padding
+
+class HuffmanStreamDecoder:
+    # Decodes Huffman data fed in pieces. The last byte seen is held back until
+    # finish(), since only the final byte of the stream carries padding bits.
+    def __init__(self, codes: Dict[str, str], padding: int):
+        self.decode_table = build_decode_table(codes)
+        self.max_length = max((len(code) for code in codes.values()), default=0)
+        self.padding = padding
+        self.buffer = bytearray()
+        self.bit_offset = 0
+        self.failed = False
+
+    def feed(self, data) -> str:
+        if self.failed:
+            return ""
+        self.buffer += data
+        return self._decode(len(self.buffer) * 8 - 8, final=False)
+
+    def finish(self) -> str:
+        if self.failed:
+            return ""
+        return self._decode(len(self.buffer) * 8 - self.padding, final=True)
+
+    def _decode(self, total_bits: int, final: bool) -> str:
+        if total_bits <= self.bit_offset:
+            return ""
+        decoded = []
+        stop = _decode_range(self.buffer, self.bit_offset, total_bits, self.decode_table, decoded.append)
+        if final or total_bits - stop >= self.max_length:
+            # Either the end of the data, or no code matches even with enough bits:
+            # like decode_symbols, stop at the first invalid code and ignore the rest
+            self.failed = stop < total_bits
+            self.buffer = bytearray()
+            self.bit_offset = 0
+        else:
+            del self.buffer[:stop >> 3]
+            self.bit_offset = stop & 7
+        return "".join(decoded)
+
+# XOR works on blocks of about this size so the tiled key stays small for huge payloads
+XOR_BLOCK_SIZE = 1 << 20
+
+def xor_into(buffer, key_bytes: bytes, offset: int = 0) -> None:
+    # XORs a writable buffer (bytearray / memoryview) in place with the repeating key;
+    # `offset` is the key position of buffer[0], so a stream can be processed in chunks
+    size = len(buffer)
+    if not size:
+        return
+    if not key_bytes:
+        raise ValueError("XOR key must not be empty")
+    key_len = len(key_bytes)
+    start = offset % key_len
+    key_bytes = key_bytes[start:] + key_bytes[:start]
+    block_size = max(1, XOR_BLOCK_SIZE // key_len) * key_len
+    tiled = key_bytes * (min(block_size, size) // key_len + 1)
+    view = memoryview(buffer).cast("B")
+    if np is not None:
+        data = np.frombuffer(view, dtype=np.uint8)
+        pad = np.frombuffer(tiled, dtype=np.uint8)
+        for pos in range(0, size, block_size):
+            block = data[pos:pos + block_size]
+            np.bitwise_xor(block, pad[:len(block)], out=block)
+        return
+    for pos in range(0, size, block_size):
+        block = view[pos:pos + block_size]
+        length = len(block)
+        mixed = int.from_bytes(block, "little") ^ int.from_bytes(tiled[:length], "little")
+        block[:] = mixed.to_bytes(length, "little")
 
 def xor_encrypt(data: bytes, key: str) -> bytes:
-    key_bytes = key.encode()
-    return bytes([b ^ key_bytes[i % len(key_bytes)] for i, b in enumerate(data)])
+    buffer = bytearray(data)
+    xor_into(buffer, key.encode())
+    return bytes(buffer)
 
 def xor_decrypt(data: bytes, key: str) -> bytes:
     return xor_encrypt(data, key)  # XOR is symmetric
+
+# Byte-level pipeline: Huffman and XOR pass raw buffers to each other,
+# base64 is only applied by the JSON endpoints
+
+def encode_payload(text: str, key: str) -> Tuple[bytearray, Dict[str, str], int]:
+    codes = get_codes(build_huffman_tree(text))
+    data, padding = encode_with_table(text, key, build_encode_table(codes))
+    return data, codes, padding
+
+def decode_payload(data, key: str, codes: Dict[str, str], padding: int) -> str:
+    return decode_with_table(data, key, build_decode_table(codes), padding)
+
+def encode_with_table(text: str, key: str, encode_table) -> Tuple[bytearray, int]:
+    # For precompiled codebooks: raises ValueError on a character the codebook lacks
+    try:
+        data, padding = encode_symbols(text, encode_table)
+    except KeyError as e:
+        raise ValueError(f"Character {e.args[0]!r} is not in the codebook")
+    xor_into(data, key.encode())
+    return data, padding
+
+def decode_with_table(data, key: str, decode_table, padding: int) -> str:
+    buffer = bytearray(data)
+    xor_into(buffer, key.encode())
+    return "".join(decode_symbols(buffer, padding, decode_table))
+
+# Byte mode: Huffman codes over UTF-8 bytes instead of characters. The alphabet is at
+# most 256 symbols, so the tree is built over plain arrays, and the codes are canonical:
+# they follow from the code lengths alone, and the codebook is shipped as one length
+# byte per byte value (trailing zeros dropped), i.e. at most 256 bytes.
+
+def byte_frequencies(data: bytes) -> List[int]:
+    if np is not None:
+        return np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256).tolist()
+    counts = Counter(data)
+    return [counts.get(symbol, 0) for symbol in range(256)]
+
+def byte_code_lengths(freq: List[int]) -> bytearray:
+    # Nodes 0-255 are the byte values, internal nodes get ids from 256 upwards;
+    # a parent is always created after its children, so depths fill in one reverse pass
+    heap = [(count, symbol) for symbol, count in enumerate(freq) if count]
+    lengths = bytearray(256)
+    if len(heap) == 1:
+        lengths[heap[0][1]] = 1
+    if len(heap) < 2:
+        return lengths
+    heapq.heapify(heap)
+    parent = [0] * (256 + len(heap) - 1)
+    node = 256
+    while len(heap) > 1:
+        freq1, node1 = heapq.heappop(heap)
+        freq2, node2 = heapq.heappop(heap)
+        parent[node1] = parent[node2] = node
+        heapq.heappush(heap, (freq1 + freq2, node))
+        node += 1
+    depth = [0] * node
+    for internal in range(node - 2, 255, -1):
+        depth[internal] = depth[parent[internal]] + 1
+    for symbol, count in enumerate(freq):
+        if count:
+            lengths[symbol] = depth[parent[symbol]] + 1
+    return lengths
+
+def canonical_codes(lengths) -> List[Optional[Tuple[int, int]]]:
+    # (code, length) per byte value: codes are assigned in (length, symbol) order
+    table = [None] * 256
+    code = 0
+    prev_length = 0
+    for length, symbol in sorted((length, symbol) for symbol, length in enumerate(lengths) if length):
+        code <<= length - prev_length
+        if code >> length:
+            raise ValueError("Code lengths do not form a prefix code")
+        table[symbol] = (code, length)
+        code += 1
+        prev_length = length
+    return table
+
+def pack_code_lengths(lengths) -> bytes:
+    return bytes(lengths).rstrip(b"\0")
+
+def unpack_code_lengths(packed: bytes) -> bytearray:
+    if len(packed) > 256:
+        raise ValueError("Code lengths must not exceed 256 bytes")
+    return bytearray(packed) + bytearray(256 - len(packed))
+
+def encode_bytes_payload(text: str, key: str) -> Tuple[bytearray, bytes, int]:
+    raw = text.encode("utf-8")
+    lengths = byte_code_lengths(byte_frequencies(raw))
+    data, padding = encode_symbols(raw, canonical_codes(lengths))
+    xor_into(data, key.encode())
+    return data, pack_code_lengths(lengths), padding
+
+def decode_bytes_payload(data, key: str, packed_lengths: bytes, padding: int) -> str:
+    table = canonical_codes(unpack_code_lengths(packed_lengths))
+    entries = [(symbol, entry[0], entry[1]) for symbol, entry in enumerate(table) if entry]
+    buffer = bytearray(data)
+    xor_into(buffer, key.encode())
+    decoded = decode_symbols(buffer, padding, _build_lookup_table(entries, DECODE_LOOKUP_BITS))
+    # A wrong key yields arbitrary bytes; like text mode, return garbage rather than fail
+    return bytes(decoded).decode("utf-8", errors="replace")
+
+# Block-parallel mode: the text is split into blocks of `block_size` characters that
+# share one codebook but are padded independently, so each block can be encoded and
+# decoded on its own (in a process pool, or a single block for random access).
+# The index lists (offset, length, padding) of every block in the ciphertext; the
+# XOR key position of a block equals its offset.
+# Blocks go to the pool in `tasks` contiguous batches rather than one by one: a batch
+# pickles the table once and decodes with one lookup table, so small blocks stay cheap.
+
+MIN_BLOCK_SIZE = 1024
+# Longer texts get larger blocks, so the index in the response stays bounded
+MAX_BLOCKS = 4096
+
+def encode_blocks(text: str, key: str, codes: Optional[Dict[str, str]], block_size: int,
+                  executor=None, tasks: int = 1) -> Tuple[bytearray, Dict[str, str], List[Tuple[int, int, int]]]:
+    # Without `codes` the codebook is built from the whole text
+    if block_size < MIN_BLOCK_SIZE:
+        raise ValueError(f"Block size must be at least {MIN_BLOCK_SIZE}")
+    block_size = max(block_size, -(-len(text) // MAX_BLOCKS))
+    if codes is None:
+        codes = get_codes(build_huffman_tree(text))
+    table = build_encode_table(codes)
+    chunks = [text[pos:pos + block_size] for pos in range(0, len(text), block_size)]
+    mapper = executor.map if executor is not None else map
+    data = bytearray()
+    blocks = []
+    try:
+        for batch in mapper(_encode_block_batch, _split_batches(chunks, tasks), repeat(table)):
+            for encoded, padding in batch:
+                blocks.append((len(data), len(encoded), padding))
+                data += encoded
+    except KeyError as e:
+        raise ValueError(f"Character {e.args[0]!r} is not in the codebook")
+    xor_into(data, key.encode())
+    return data, codes, blocks
+
+def decode_blocks(data, key: str, codes: Dict[str, str], blocks, executor=None, tasks: int = 1) -> str:
+    if len(blocks) > MAX_BLOCKS:
+        raise ValueError(f"At most {MAX_BLOCKS} blocks are supported")
+    _check_blocks(data, blocks)
+    buffer = bytearray(data)
+    xor_into(buffer, key.encode())
+    view = memoryview(buffer)
+    # Each batch travels as one contiguous slice with the block positions relative to it
+    batches = []
+    for batch in _split_batches(blocks, tasks):
+        start = min(offset for offset, _, _ in batch)
+        end = max(offset + length for offset, length, _ in batch)
+        batches.append((bytes(view[start:end]), [(offset - start, length, padding) for offset, length, padding in batch]))
+    mapper = executor.map if executor is not None else map
+    return "".join(mapper(_decode_block_batch, batches, repeat(codes)))
+
+def decode_block(data, key: str, decode_table, blocks, index: int) -> str:
+    # Random access: only the requested block is decrypted and decoded
+    if not 0 <= index < len(blocks):
+        raise ValueError("Block index out of range")
+    offset, length, padding = blocks[index]
+    _check_blocks(data, [blocks[index]])
+    buffer = bytearray(memoryview(data)[offset:offset + length])
+    xor_into(buffer, key.encode(), offset)
+    return "".join(decode_symbols(buffer, padding, decode_table))
+
+def _split_batches(items: list, tasks: int) -> List[list]:
+    size = -(-len(items) // max(1, tasks)) or 1
+    return [items[pos:pos + size] for pos in range(0, len(items), size)]
+
+def _encode_block_batch(chunks: List[str], table) -> List[Tuple[bytearray, int]]:
+    return [encode_symbols(chunk, table) for chunk in chunks]
+
+def _decode_block_batch(batch, codes: Dict[str, str]) -> str:
+    data, blocks = batch
+    decode_table = build_decode_table(codes)
+    view = memoryview(data)
+    return "".join(
+        "".join(decode_symbols(view[offset:offset + length], padding, decode_table))
+        for offset, length, padding in blocks
+    )
+
+def _check_blocks(data, blocks) -> None:
+    for offset, length, padding in blocks:
+        if offset < 0 or length < 0 or offset + length > len(data) or not 0 <= padding < 8:
+            raise ValueError("Block index does not match the data")
+
+# Binary message: header length (4 bytes, big-endian), JSON header {"huffman_codes", "padding"}, ciphertext
+BINARY_HEADER_LENGTH = struct.Struct(">I")
+
+def pack_binary_message(codes: Dict[str, str], padding: int, data) -> bytes:
+    header = json.dumps({"huffman_codes": codes, "padding": padding}, ensure_ascii=False).encode()
+    return b"".join((BINARY_HEADER_LENGTH.pack(len(header)), header, data))
+
+# Larger headers are rejected before they are buffered by the streaming decoder
+MAX_BINARY_HEADER_SIZE = 64 * 1024 * 1024
+
+def unpack_binary_message(message) -> Tuple[Dict[str, str], int, memoryview]:
+    view = memoryview(message)
+    header = parse_binary_header(view)
+    if header is None:
+        raise ValueError("Message header is truncated")
+    codes, padding, body_start = header
+    return codes, padding, view[body_start:]
+
+def parse_binary_header(message) -> Optional[Tuple[Dict[str, str], int, int]]:
+    # Returns (codes, padding, offset of the ciphertext), or None while the header is incomplete
+    view = memoryview(message)
+    if len(view) < BINARY_HEADER_LENGTH.size:
+        return None
+    (header_length,) = BINARY_HEADER_LENGTH.unpack_from(view)
+    if header_length > MAX_BINARY_HEADER_SIZE:
+        raise ValueError("Message header is too large")
+    body_start = BINARY_HEADER_LENGTH.size + header_length
+    if body_start > len(view):
+        return None
+    try:
+        header = json.loads(bytes(view[BINARY_HEADER_LENGTH.size:body_start]))
+        codes, padding = header["huffman_codes"], int(header["padding"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid message header")
+    if not isinstance(codes, dict) or not 0 <= padding < 8:
+        raise ValueError("Invalid message header")
+    for code in codes.values():
+        if not isinstance(code, str) or not code or code.strip("01"):
+            raise ValueError("Invalid message header")
+    return codes, padding, body_start
+
+# Streaming pipeline for texts that do not fit in memory: the encoder spools the
+# input while counting characters, then encodes it in a second pass; both sides
+# keep the XOR key offset across chunks. Memory use is bounded by the chunk size.
+
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_SPOOL_SIZE = 8 * 1024 * 1024
+
+class StreamingEncoder:
+    def __init__(self, key: str, spool_size: int = STREAM_SPOOL_SIZE):
+        self.key = key.encode()
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        self.freq = Counter()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+
+    def write(self, data: bytes) -> None:
+        # First pass: raises UnicodeDecodeError on invalid UTF-8
+        self.freq.update(self._utf8.decode(data))
+        self.file.write(data)
+
+    def finish_input(self) -> None:
+        self.freq.update(self._utf8.decode(b"", final=True))
+
+    def iter_message(self, chunk_size: int = STREAM_CHUNK_SIZE):
+        # Second pass: yields the binary message (see pack_binary_message) piece by piece
+        try:
+            codes = get_codes(build_huffman_tree_from_freq(self.freq))
+            total_bits = sum(count * len(codes[ch]) for ch, count in self.freq.items())
+            padding = (8 - total_bits % 8) % 8
+            yield pack_binary_message(codes, padding, b"")
+            encoder = HuffmanStreamEncoder(codes)
+            utf8 = codecs.getincrementaldecoder("utf-8")()
+            offset = 0
+            self.file.seek(0)
+            while True:
+                chunk = self.file.read(chunk_size)
+                if chunk:
+                    data = encoder.feed(utf8.decode(chunk))
+                else:
+                    data = encoder.feed(utf8.decode(b"", final=True)) + encoder.finish()[0]
+                xor_into(data, self.key, offset)
+                offset += len(data)
+                if data:
+                    yield bytes(data)
+                if not chunk:
+                    break
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self.file.close()
+
+class StreamingDecoder:
+    def __init__(self, key: str, spool_size: int = STREAM_SPOOL_SIZE):
+        self.key = key.encode()
+        self.header = bytearray()
+        self.decoder = None
+        self.offset = 0
+        self.spool_size = spool_size
+        self.file = None
+
+    @property
+    def started(self) -> bool:
+        return self.decoder is not None
+
+    def feed(self, data) -> str:
+        # Raises ValueError on a malformed header
+        if self.decoder is None:
+            self.header += data
+            header = parse_binary_header(self.header)
+            if header is None:
+                return ""
+            codes, padding, body_start = header
+            self.decoder = HuffmanStreamDecoder(codes, padding)
+            data = self.header[body_start:]
+            self.header = None
+        buffer = bytearray(data)
+        xor_into(buffer, self.key, self.offset)
+        self.offset += len(buffer)
+        return self.decoder.feed(buffer)
+
+    def finish(self) -> str:
+        if self.decoder is None:
+            raise ValueError("Message header is truncated")
+        return self.decoder.finish()
+
+    # Spooled variant, same shape as StreamingEncoder: the whole message is decoded
+    # while the request is read, and the text is sent from the spool afterwards
+
+    def write(self, data: bytes) -> None:
+        if self.file is None:
+            self.file = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+        self.file.write(self.feed(data).encode("utf-8"))
+
+    def finish_input(self) -> None:
+        if self.file is None:
+            self.file = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+        self.file.write(self.finish().encode("utf-8"))
+
+    def iter_text(self, chunk_size: int = STREAM_CHUNK_SIZE):
+        # Yields the decoded text as UTF-8 bytes
+        try:
+            self.file.seek(0)
+            while True:
+                chunk = self.file.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
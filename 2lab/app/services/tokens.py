@@ -0,0 +1,235 @@
+import hmac
+import json
+import time
+import base64
+import hashlib
+import binascii
+from typing import Dict, List, Optional
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+    from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature, encode_dss_signature
+except ImportError:  # Only HMAC tokens are available without cryptography
+    ec = ed25519 = None
+
+# Compact JWS (JWT) signing and verification without a JWT library in the hot path.
+# Everything that does not depend on the token is prepared once per key: the HMAC
+# state after absorbing the secret, the loaded key objects and the encoded header
+# of the tokens we issue. Keys are looked up by "kid", so old keys can stay in the
+# table for verification while new tokens are signed with the active one.
+
+HMAC_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+ASYMMETRIC_ALGORITHMS = ("EdDSA", "ES256")
+
+def b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def dumps(value) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+class HmacKey:
+    def __init__(self, secret: bytes, algorithm: str = "HS256"):
+        if algorithm not in HMAC_DIGESTS:
+            raise ValueError(f"Unsupported HMAC algorithm: {algorithm}")
+        if not secret:
+            raise ValueError("HMAC secret must not be empty")
+        self.algorithm = algorithm
+        self.can_sign = True
+        self._mac = hmac.new(secret, digestmod=HMAC_DIGESTS[algorithm])
+
+    def sign(self, message: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(message)
+        return mac.digest()
+
+    def verify(self, message: bytes, signature: bytes) -> bool:
+        return hmac.compare_digest(self.sign(message), signature)
+
+    def jwk(self) -> Optional[dict]:
+        return None  # A shared secret is never published
+
+class Ed25519Key:
+    algorithm = "EdDSA"
+
+    def __init__(self, key):
+        if isinstance(key, ed25519.Ed25519PrivateKey):
+            self._private, self._public = key, key.public_key()
+        elif isinstance(key, ed25519.Ed25519PublicKey):
+            self._private, self._public = None, key
+        else:
+            raise ValueError("EdDSA needs an Ed25519 key")
+        self.can_sign = self._private is not None
+
+    def sign(self, message: bytes) -> bytes:
+        return self._private.sign(message)
+
+    def verify(self, message: bytes, signature: bytes) -> bool:
+        try:
+            self._public.verify(signature, message)
+            return True
+        except InvalidSignature:
+            return False
+
+    def jwk(self) -> dict:
+        raw = self._public.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+        return {"kty": "OKP", "crv": "Ed25519", "x": b64url_encode(raw)}
+
+class Es256Key:
+    # JWS wants the raw r || s signature (32 bytes each), cryptography works with DER
+    algorithm = "ES256"
+
+    def __init__(self, key):
+        if isinstance(key, ec.EllipticCurvePrivateKey):
+            self._private, self._public = key, key.public_key()
+        elif isinstance(key, ec.EllipticCurvePublicKey):
+            self._private, self._public = None, key
+        else:
+            raise ValueError("ES256 needs an EC key")
+        if not isinstance(self._public.curve, ec.SECP256R1):
+            raise ValueError("ES256 needs a P-256 key")
+        self.can_sign = self._private is not None
+        self._ecdsa = ec.ECDSA(hashes.SHA256())
+
+    def sign(self, message: bytes) -> bytes:
+        r, s = decode_dss_signature(self._private.sign(message, self._ecdsa))
+        return r.to_bytes(32, "big") + s.to_bytes(32, "big")
+
+    def verify(self, message: bytes, signature: bytes) -> bool:
+        if len(signature) != 64:
+            return False
+        der = encode_dss_signature(int.from_bytes(signature[:32], "big"), int.from_bytes(signature[32:], "big"))
+        try:
+            self._public.verify(der, message, self._ecdsa)
+            return True
+        except InvalidSignature:
+            return False
+
+    def jwk(self) -> dict:
+        numbers = self._public.public_numbers()
+        return {
+            "kty": "EC",
+            "crv": "P-256",
+            "x": b64url_encode(numbers.x.to_bytes(32, "big")),
+            "y": b64url_encode(numbers.y.to_bytes(32, "big")),
+        }
+
+def load_key(algorithm: str, source):
+    # source: the secret for HS*, PEM data (private or public key) for EdDSA/ES256
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    if algorithm in HMAC_DIGESTS:
+        return HmacKey(source, algorithm)
+    if algorithm not in ASYMMETRIC_ALGORITHMS:
+        raise ValueError(f"Unsupported algorithm: {algorithm}")
+    if ec is None:
+        raise RuntimeError(f"{algorithm} tokens need the cryptography package")
+    try:
+        key = serialization.load_pem_private_key(source, password=None)
+    except (ValueError, TypeError):
+        key = serialization.load_pem_public_key(source)
+    return Ed25519Key(key) if algorithm == "EdDSA" else Es256Key(key)
+
+def load_key_file(algorithm: str, path: str):
+    with open(path, "rb") as f:
+        return load_key(algorithm, f.read())
+
+def parse_key_specs(specs: str) -> Dict[Optional[str], object]:
+    # "kid=ALG:source,..." where source is the secret for HS*, a PEM file path otherwise;
+    # an empty kid gives the key for tokens without a kid (stored under None)
+    keys = {}
+    for spec in filter(None, (item.strip() for item in specs.split(","))):
+        kid, sep, rest = spec.partition("=")
+        algorithm, sep2, source = rest.partition(":")
+        if not (sep and sep2 and source):
+            raise ValueError(f"Invalid key spec, expected kid=ALG:source: {spec}")
+        kid = kid or None
+        if algorithm in HMAC_DIGESTS:
+            keys[kid] = load_key(algorithm, source)
+        else:
+            keys[kid] = load_key_file(algorithm, source)
+    return keys
+
+class TokenSigner:
+    # keys: kid -> key; tokens are signed with keys[active_kid]. A None kid means the
+    # header carries no "kid" (tokens issued before rotation was set up); tokens
+    # without a kid are checked against keys[None], or the active key if there is none.
+    def __init__(self, keys: Dict[Optional[str], object], active_kid: Optional[str], expire_seconds: int):
+        if active_kid not in keys:
+            raise ValueError(f"No key for the active kid {active_kid!r}")
+        if not keys[active_kid].can_sign:
+            raise ValueError("The active key cannot sign (a public key was given)")
+        self.keys = keys
+        self.active_kid = active_kid
+        self.expire_seconds = expire_seconds
+        self._headers = {}
+        for kid, key in keys.items():
+            header = {"alg": key.algorithm, "typ": "JWT"}
+            if kid is not None:
+                header["kid"] = kid
+            self._headers[b64url_encode(dumps(header))] = key
+        self._active_key = keys[active_kid]
+        self._active_header = next(h for h, key in self._headers.items() if key is self._active_key)
+
+    def issue(self, claims: dict, expires_in: Optional[int] = None) -> str:
+        payload = dict(claims)
+        payload["exp"] = int(time.time()) + (self.expire_seconds if expires_in is None else expires_in)
+        signing_input = self._active_header + "." + b64url_encode(dumps(payload))
+        return signing_input + "." + b64url_encode(self._active_key.sign(signing_input.encode("ascii")))
+
+    def verify(self, token: str) -> Optional[dict]:
+        # Claims of a valid, unexpired token, otherwise None
+        try:
+            header_segment, payload_segment, signature_segment = token.split(".")
+            key = self._headers.get(header_segment) or self._key_for_header(header_segment)
+            if key is None:
+                return None
+            signing_input = token[:len(header_segment) + 1 + len(payload_segment)].encode("ascii")
+            if not key.verify(signing_input, b64url_decode(signature_segment)):
+                return None
+            claims = json.loads(b64url_decode(payload_segment))
+        except (ValueError, binascii.Error):  # Also UnicodeError and JSONDecodeError
+            return None
+        if not isinstance(claims, dict):
+            return None
+        now = time.time()
+        exp = claims.get("exp")
+        if exp is not None and (not isinstance(exp, (int, float)) or exp <= now):
+            return None
+        nbf = claims.get("nbf")
+        if nbf is not None and (not isinstance(nbf, (int, float)) or nbf > now):
+            return None
+        return claims
+
+    def _key_for_header(self, header_segment: str):
+        # Slow path for headers we did not produce ourselves (other field order, extra fields)
+        header = json.loads(b64url_decode(header_segment))
+        if not isinstance(header, dict):
+            return None
+        kid = header.get("kid")
+        if kid is None:
+            key = self.keys.get(None, self._active_key)
+        elif isinstance(kid, str):
+            key = self.keys.get(kid)
+        else:
+            return None
+        # The algorithm comes from our key table, never from the token
+        if key is None or header.get("alg") != key.algorithm:
+            return None
+        return key
+
+    def jwks(self) -> dict:
+        # Public keys for other services that verify our tokens
+        keys: List[dict] = []
+        for kid, key in self.keys.items():
+            jwk = key.jwk()
+            if jwk is not None:
+                jwk.update({"alg": key.algorithm, "use": "sig"})
+                if kid is not None:
+                    jwk["kid"] = kid
+                keys.append(jwk)
+        return {"keys": keys}
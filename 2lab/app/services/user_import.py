@@ -0,0 +1,218 @@
+import io
+import csv
+import json
+import asyncio
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import (
+    USER_IMPORT_BATCH_SIZE, USER_IMPORT_HASH_CHUNK, USER_IMPORT_HASH_TIMEOUT,
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_RETRY_AFTER
+)
+from app.cruds.user import get_existing_emails_async, insert_users_async, hash_passwords
+from app.schemas.user import UserCreate
+from app.services.workers import password_pool, PoolSaturated
+
+# Bulk import of users from NDJSON ({"email": ..., "password": ...} per line) or CSV
+# (a header with email and password columns; quoted values may span lines). Rows are
+# processed in batches: one query for the emails that already exist, the passwords hashed
+# over the password pool, and one INSERT ... ON CONFLICT DO NOTHING per batch. Every row
+# gets a result:
+#   created   - inserted, with its id
+#   exists    - the email is already registered
+#   duplicate - the email occurs earlier in the same import
+#   invalid   - the row could not be parsed or validated
+#   busy      - not processed: the password pool stayed full; the row can be sent again
+#   conflict  - not inserted: on databases without ON CONFLICT, another request took one
+#               of the batch's emails meanwhile and the whole batch failed; send it again
+
+IMPORT_FORMATS = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+
+Row = Tuple[int, Optional[UserCreate], Optional[str]]  # (line, user, error)
+
+def iter_lines(data: bytes) -> Iterator[Tuple[int, bytes]]:
+    # (line number, line) pairs; blank lines are skipped
+    for number, line in enumerate(data.split(b"\n"), 1):
+        if line.strip():
+            yield number, line.rstrip(b"\r")
+
+def parse_user(number: int, fields) -> Row:
+    try:
+        return number, UserCreate(**fields), None
+    except ValidationError as e:
+        return number, None, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+def parse_ndjson_line(number: int, line: bytes) -> Row:
+    try:
+        fields = json.loads(line)
+    except ValueError as e:  # Also covers UnicodeDecodeError
+        return number, None, f"Invalid JSON: {e}"
+    if not isinstance(fields, dict):
+        return number, None, "Expected a JSON object"
+    return parse_user(number, fields)
+
+def iter_csv_records(text: str) -> Iterator[Tuple[int, Optional[List[str]], Optional[str]]]:
+    # (line, values, error) per record, where line is the first line of the record:
+    # a quoted value may span several lines. Blank lines are skipped.
+    reader = csv.reader(io.StringIO(text, newline=""))
+    while True:
+        number = reader.line_num + 1
+        try:
+            values = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield number, None, f"Invalid CSV: {e}"
+            continue
+        if any(value.strip() for value in values):
+            yield number, values, None
+
+def parse_csv_header(values: Optional[List[str]]) -> Tuple[int, int]:
+    # Positions of the email and password columns; ValueError if either is missing
+    header = [name.strip().lower() for name in values or ()]
+    if "email" not in header or "password" not in header:
+        raise ValueError("CSV header must contain email and password columns")
+    return header.index("email"), header.index("password")
+
+def parse_csv_record(number: int, values: Optional[List[str]], error: Optional[str],
+                     columns: Tuple[int, int]) -> Row:
+    if values is None:
+        return number, None, error
+    email_index, password_index = columns
+    if len(values) <= max(columns):
+        return number, None, "Missing email or password column"
+    return parse_user(number, {"email": values[email_index], "password": values[password_index]})
+
+def csv_rows(data: bytes) -> Iterator[Row]:
+    # The header is checked right away (ValueError if it is unusable), the rows are parsed
+    # lazily. The body is decoded as a whole, so csv.reader sees records across lines.
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("CSV must be UTF-8")
+    records = iter_csv_records(text)
+    header = next(records, None)
+    columns = parse_csv_header(header[1] if header else None)
+    return (parse_csv_record(number, values, error, columns) for number, values, error in records)
+
+def ndjson_rows(data: bytes) -> Iterator[Row]:
+    return (parse_ndjson_line(number, line) for number, line in iter_lines(data))
+
+async def hash_chunk(passwords: List[str], deadline: float) -> List[str]:
+    # An import is not latency-sensitive, so it waits for the pool instead of failing,
+    # but only until the deadline; then PoolSaturated is raised
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            return await password_pool.run(hash_passwords, passwords)
+        except PoolSaturated:
+            if loop.time() + PASSWORD_HASH_RETRY_AFTER > deadline:
+                raise
+            await asyncio.sleep(PASSWORD_HASH_RETRY_AFTER)
+
+async def hash_batch(passwords: List[str]) -> List[str]:
+    # Small chunks, each admitted on its own, and no more of them at a time than there
+    # are workers: the queue stays free for logins, which wait behind one chunk at most
+    deadline = asyncio.get_running_loop().time() + USER_IMPORT_HASH_TIMEOUT
+    limit = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
+
+    async def run(chunk):
+        async with limit:
+            return await hash_chunk(chunk, deadline)
+
+    tasks = [
+        asyncio.ensure_future(run(passwords[pos:pos + USER_IMPORT_HASH_CHUNK]))
+        for pos in range(0, len(passwords), USER_IMPORT_HASH_CHUNK)
+    ]
+    try:
+        chunks = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return [hashed for chunk in chunks for hashed in chunk]
+
+async def import_batch(db: AsyncSession, batch: List[Row], seen: set) -> List[Dict]:
+    results = {}
+    pending = []
+    for number, user, error in batch:
+        if user is None:
+            results[number] = {"line": number, "status": "invalid", "detail": error}
+        elif user.email in seen:
+            results[number] = {"line": number, "email": user.email, "status": "duplicate"}
+        else:
+            seen.add(user.email)
+            pending.append((number, user))
+
+    existing = await get_existing_emails_async(db, [user.email for _, user in pending])
+    # End the read transaction: it would otherwise hold a connection (and a snapshot)
+    # while the batch is being hashed
+    await db.rollback()
+    new = []
+    for number, user in pending:
+        if user.email in existing:
+            results[number] = {"line": number, "email": user.email, "status": "exists"}
+        else:
+            new.append((number, user))
+
+    hashes = await hash_batch([user.password for _, user in new]) if new else []
+    try:
+        created = await insert_users_async(db, [(user.email, hashed) for (_, user), hashed in zip(new, hashes)])
+    except IntegrityError:
+        # Only without ON CONFLICT support (see insert_users_async): the batch is rolled back
+        await db.rollback()
+        for number, user in new:
+            results[number] = {"line": number, "email": user.email, "status": "conflict",
+                               "detail": "Another request registered one of this batch's emails, send the rows again"}
+        return [results[number] for number, _, _ in batch]
+    for number, user in new:
+        if user.email in created:
+            results[number] = {"line": number, "email": user.email, "status": "created", "id": created[user.email]}
+        else:
+            results[number] = {"line": number, "email": user.email, "status": "exists"}
+    return [results[number] for number, _, _ in batch]
+
+def busy_results(batch: List[Row]) -> List[Dict]:
+    return [
+        {"line": number, "email": user.email if user else None, "status": "busy",
+         "detail": "Server is busy, send this row again later"}
+        for number, user, _ in batch
+    ]
+
+async def import_users(db: AsyncSession, rows: Iterator[Row],
+                       batch_size: int = USER_IMPORT_BATCH_SIZE) -> AsyncIterator[Dict]:
+    # Yields a result per row, in input order, batch by batch. If the first batch cannot
+    # get the password pool, PoolSaturated is raised (nothing has been sent yet); after
+    # that, the batch that could not and all the rows after it are reported as busy.
+    seen = set()
+    busy = False
+    first = True
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            results, busy = await import_or_skip(db, batch, seen, busy, first)
+            for result in results:
+                yield result
+            first = False
+            batch = []
+    if batch:
+        results, busy = await import_or_skip(db, batch, seen, busy, first)
+        for result in results:
+            yield result
+
+async def import_or_skip(db: AsyncSession, batch: List[Row], seen: set,
+                         busy: bool, first: bool) -> Tuple[List[Dict], bool]:
+    if busy:
+        return busy_results(batch), True
+    try:
+        return await import_batch(db, batch, seen), False
+    except PoolSaturated:
+        if first:
+            raise
+        return busy_results(batch), True
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from app.core.config import (
+    ENCRYPTION_WORKERS, ENCRYPTION_QUEUE_LIMIT, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT
+)
+
+class PoolSaturated(Exception):
+    pass
+
+class BoundedExecutor:
+    # Process pool with admission control: at most max_workers jobs run and at most
+    # max_queue more wait; anything beyond that is rejected right away instead of
+    # piling up behind the jobs already queued.
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.inline = 0
+        self._executor = None
+        self._drivers = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        # Created on first use, so worker processes are only started when needed
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    @property
+    def drivers(self) -> ThreadPoolExecutor:
+        # Threads for run_fanout jobs; each holds max_workers slots, so no more than
+        # this many can be admitted at a time
+        with self._lock:
+            if self._drivers is None:
+                self._drivers = ThreadPoolExecutor(
+                    max_workers=max(1, (self.max_workers + self.max_queue) // self.max_workers),
+                    thread_name_prefix="fanout"
+                )
+            return self._drivers
+
+    def acquire(self, slots: int = 1) -> None:
+        # Every acquire() must be paired with a release() of the same slots; run() and
+        # run_fanout() release them when their job ends
+        with self._lock:
+            if self.in_flight + slots > self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise PoolSaturated()
+            self.in_flight += slots
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def release(self, slots: int = 1, failed: bool = False) -> None:
+        with self._lock:
+            self.in_flight -= slots
+            if failed:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def _submit(self, executor, job, slots: int) -> Future:
+        # The slots are released when the job ends, not when the request awaiting it
+        # does: a cancelled request must not free a slot its job still occupies
+        self.acquire(slots)
+        try:
+            future = executor.submit(job)
+        except BaseException:
+            self.release(slots, failed=True)
+            raise
+        future.add_done_callback(
+            lambda f: self.release(slots, failed=f.cancelled() or f.exception() is not None)
+        )
+        return future
+
+    def record_inline(self) -> None:
+        with self._lock:
+            self.inline += 1
+
+    async def run(self, fn, *args):
+        # Cancelling the await cancels a job that has not started yet
+        return await asyncio.wrap_future(self._submit(self.executor, partial(fn, *args), 1))
+
+    async def run_fanout(self, fn, *args):
+        # For jobs that split their work over the pool themselves: fn(*args, executor, tasks)
+        # runs in a thread and submits at most `tasks` parts, one admission slot each
+        job = partial(fn, *args, self.executor, self.max_workers)
+        return await asyncio.wrap_future(self._submit(self.drivers, job, self.max_workers))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queue_limit": self.max_queue,
+                "in_flight": self.in_flight,
+                "queued": max(0, self.in_flight - self.max_workers),
+                "peak_in_flight": self.peak_in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "inline": self.inline,
+            }
+
+    def shutdown(self) -> None:
+        # Waits outside the lock: the jobs' done callbacks take it to release their slots
+        with self._lock:
+            executors = [e for e in (self._drivers, self._executor) if e is not None]
+            self._drivers = self._executor = None
+        for executor in executors:
+            executor.shutdown()
+
+encryption_pool = BoundedExecutor(ENCRYPTION_WORKERS, ENCRYPTION_QUEUE_LIMIT)
+# bcrypt is slow by design, so hashing gets its own pool: a login spike cannot
+# take the workers encryption jobs need, and vice versa
+password_pool = BoundedExecutor(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
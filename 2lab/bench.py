@@ -0,0 +1,210 @@
+"""
+Benchmark of the encryption services.
+
+Runs build_huffman_tree, get_codes, huffman_encode, huffman_decode and xor_encrypt
+over several input sizes and alphabets and reports MB/s and peak traced memory per
+stage, plus end-to-end /encode and /decode requests through a TestClient.
+Prints (and with --output saves) JSON, so runs from different commits can be diffed.
+
+Example:
+    python bench.py --sizes 1KB,1MB,100MB --alphabets ascii,skewed --output bench.json
+"""
+
+import os
+import sys
+import json
+import base64
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from contextlib import ExitStack
+
+from app.services.encryption import (
+    build_huffman_tree, get_codes, huffman_encode, huffman_decode, xor_encrypt
+)
+
+KEY = "benchmark-key"
+# Texts are built from a random block of at most this size, repeated up to the target
+# size: Huffman coding depends only on symbol frequencies, not on their order
+UNIQUE_BLOCK_BYTES = 1024 * 1024
+
+def ascii_alphabet():
+    return [chr(code) for code in range(32, 127)], None
+
+def cyrillic_alphabet():
+    letters = [chr(code) for code in range(0x0430, 0x0450)] + ["ё"]
+    symbols = letters + [ch.upper() for ch in letters] + list(" ,.!?-\n")
+    return symbols, None
+
+def unicode_alphabet():
+    # Random BMP code points outside the surrogate range
+    rng = random.Random(0)
+    symbols = set()
+    while len(symbols) < 5000:
+        code = rng.randint(0x20, 0xFFFD)
+        if not 0xD800 <= code <= 0xDFFF:
+            symbols.add(chr(code))
+    return sorted(symbols), None
+
+def skewed_alphabet():
+    # Zipf-like (1/rank^2): the most frequent symbol makes up about 60% of the text
+    symbols = [chr(code) for code in range(97, 123)] + [chr(code) for code in range(0x0430, 0x0450)]
+    return symbols, [1 / (rank + 1) ** 2 for rank in range(len(symbols))]
+
+ALPHABETS = {
+    "ascii": ascii_alphabet,
+    "cyrillic": cyrillic_alphabet,
+    "unicode": unicode_alphabet,
+    "skewed": skewed_alphabet,
+}
+
+def parse_size(text):
+    units = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "B": 1}
+    text = text.strip().upper()
+    for unit, factor in units.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+def make_text(alphabet, size, seed):
+    # Text of about `size` bytes in UTF-8
+    symbols, weights = ALPHABETS[alphabet]()
+    rng = random.Random(seed)
+    weights_or_ones = weights or [1] * len(symbols)
+    average = sum(w * len(ch.encode()) for ch, w in zip(symbols, weights_or_ones)) / sum(weights_or_ones)
+    block_chars = int(min(size, UNIQUE_BLOCK_BYTES) / average) or 1
+    block = "".join(rng.choices(symbols, weights, k=block_chars))
+    block_bytes = len(block.encode())
+    return block * max(1, round(size / block_bytes))
+
+def measure(fn, args, repeat, trace_memory):
+    # Best-of-`repeat` time; peak memory is measured on a separate run, since
+    # tracemalloc slows the code down by an order of magnitude
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        fn(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, best, peak
+
+def record(results, stage, alphabet, size, seconds, peak):
+    results.append({
+        "stage": stage,
+        "alphabet": alphabet,
+        "size_bytes": size,
+        "seconds": seconds,
+        "mb_per_s": size / seconds / 1e6 if seconds else None,
+        "peak_memory_bytes": peak,
+    })
+    print(f"[INFO] {stage:<20} {alphabet:<9} {size:>11} B  {size / seconds / 1e6 if seconds else 0:9.2f} MB/s",
+          file=sys.stderr)
+
+def bench_services(text, alphabet, args, results):
+    size = len(text.encode())
+    trace = size <= args.memory_max_size
+    tree, seconds, peak = measure(build_huffman_tree, (text,), args.repeat, trace)
+    record(results, "build_huffman_tree", alphabet, size, seconds, peak)
+    codes, seconds, peak = measure(get_codes, (tree,), args.repeat, trace)
+    record(results, "get_codes", alphabet, size, seconds, peak)
+    (encoded, padding), seconds, peak = measure(huffman_encode, (text, codes), args.repeat, trace)
+    record(results, "huffman_encode", alphabet, size, seconds, peak)
+    decoded, seconds, peak = measure(huffman_decode, (encoded, codes, padding), args.repeat, trace)
+    record(results, "huffman_decode", alphabet, size, seconds, peak)
+    if decoded != text:
+        raise SystemExit(f"[ERROR] huffman_decode does not restore the {alphabet} text")
+    data = base64.b64decode(encoded)
+    _, seconds, peak = measure(xor_encrypt, (data, KEY), args.repeat, trace)
+    record(results, "xor_encrypt", alphabet, len(data), seconds, peak)
+
+def bench_http(client, text, alphabet, args, results):
+    size = len(text.encode())
+    trace = size <= args.memory_max_size
+
+    def post(path, payload):
+        response = client.post(path, json=payload)
+        if response.status_code != 200:
+            raise SystemExit(f"[ERROR] {path} answered {response.status_code}: {response.text[:200]}")
+        return response.json()
+
+    encoded, seconds, peak = measure(post, ("/encode", {"text": text, "key": KEY}), args.repeat, trace)
+    record(results, "http_encode", alphabet, size, seconds, peak)
+    decoded, seconds, peak = measure(post, ("/decode", encoded), args.repeat, trace)
+    record(results, "http_decode", alphabet, size, seconds, peak)
+    if decoded["decoded_text"] != text:
+        raise SystemExit(f"[ERROR] /decode does not restore the {alphabet} text")
+
+def make_client(workdir):
+    # The app reads its settings from the environment on import
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    from fastapi.testclient import TestClient
+    from main import app
+    return TestClient(app)
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the encryption services")
+    parser.add_argument("--sizes", default="1KB,64KB,1MB,10MB,100MB", help="Input sizes, e.g. 1KB,1MB,100MB")
+    parser.add_argument("--alphabets", default=",".join(ALPHABETS), help="Alphabets: " + ", ".join(ALPHABETS))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage, the best time is reported")
+    parser.add_argument("--memory-max-size", type=parse_size, default=parse_size("10MB"),
+                        help="Measure peak memory only for inputs up to this size")
+    parser.add_argument("--http-max-size", type=parse_size, default=parse_size("10MB"),
+                        help="Run /encode and /decode only for inputs up to this size")
+    parser.add_argument("--no-http", action="store_true", help="Skip the end-to-end TestClient runs")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the generated texts")
+    parser.add_argument("--output", help="Where to save the results as JSON")
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    alphabets = [name.strip() for name in args.alphabets.split(",")]
+    for name in alphabets:
+        if name not in ALPHABETS:
+            parser.error(f"unknown alphabet: {name}")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="encryption-bench-") as workdir, ExitStack() as stack:
+        client = None if args.no_http else stack.enter_context(make_client(workdir))
+        for alphabet in alphabets:
+            for size in sizes:
+                text = make_text(alphabet, size, args.seed)
+                bench_services(text, alphabet, args, results)
+                if client is not None and size <= args.http_max_size:
+                    bench_http(client, text, alphabet, args, results)
+
+    output = json.dumps({
+        "created": time.time(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Benchmark of the SQLite session setup under concurrent reads and writes.
+
+Seeds a users table in a temporary database, then reader threads look users up by
+email (as /login/ does) while writer threads insert users through SQLAlchemy sessions.
+Configurations:
+    default - one engine with default settings (as before app/db/sqlite.py);
+    tuned   - the app's setup from app/db/session.py: SQLITE_PRAGMAS, a one-connection
+              writer engine, a reader pool and the routing session that picks between them.
+With --async-writers some writers go through the async engines instead, built the same
+way from the aiosqlite URL: the app runs both engine kinds on one file, so there is one
+writer connection per engine kind and they wait for each other on busy_timeout.
+Reports ops/s, latencies and errors per operation, plus the pool sizes and the pragmas
+read from a live reader connection. Prints (and with --output saves) JSON.
+
+Example:
+    python bench_sqlite.py --writers 2 --async-writers 2 --duration 10 --output bench_sqlite.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+
+# app.db.session creates the app's own engine on import; the benchmark makes its own
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import SQLITE_READER_POOL_SIZE
+from app.db.session import Base, make_engines, to_async_url
+from app.db.sqlite import SQLITE_PRAGMAS
+from app.models.user import User
+
+CONFIGS = ("default", "tuned")
+
+def new_email():
+    return f"{uuid.uuid4().hex}@example.com"
+
+def build_engines(url, config, create):
+    # (writer, reader, routing session class or None) for a configuration
+    if config == "default":
+        engine = create(url, connect_args={"check_same_thread": False})
+        return engine, engine, None
+    return make_engines(url, create)
+
+def seed_database(SessionLocal, users):
+    emails = [new_email() for _ in range(users)]
+    with SessionLocal() as db:
+        db.add_all(User(email=email, hashed_password="x") for email in emails)
+        db.commit()
+    return emails
+
+def reader(SessionLocal, emails, deadline, rng, results):
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        with SessionLocal() as db:
+            try:
+                db.query(User).filter(User.email == rng.choice(emails)).first()
+                ok = True
+            except OperationalError:
+                ok = False
+        results.append(("read", time.perf_counter() - started, ok))
+
+def writer(SessionLocal, deadline, results):
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        with SessionLocal() as db:
+            try:
+                db.add(User(email=new_email(), hashed_password="x"))
+                db.commit()
+                ok = True
+            except OperationalError:
+                db.rollback()
+                ok = False
+        results.append(("write", time.perf_counter() - started, ok))
+
+def async_writers(url, config, count, deadline, results):
+    # Runs in its own thread: the async engines live and are disposed in this event loop
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+    async def write(factory):
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            async with factory() as db:
+                try:
+                    db.add(User(email=new_email(), hashed_password="x"))
+                    await db.commit()
+                    ok = True
+                except OperationalError:
+                    await db.rollback()
+                    ok = False
+            results.append(("async_write", time.perf_counter() - started, ok))
+
+    async def run():
+        engine, read_engine, routing_session = build_engines(to_async_url(url), config, create_async_engine)
+        if routing_session is None:
+            factory = sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+        else:
+            factory = sessionmaker(class_=AsyncSession, sync_session_class=routing_session,
+                                   autoflush=False, expire_on_commit=False)
+        try:
+            await asyncio.gather(*(write(factory) for _ in range(count)))
+        finally:
+            await engine.dispose()
+            if read_engine is not engine:
+                await read_engine.dispose()
+
+    asyncio.run(run())
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(results, elapsed):
+    summary = {}
+    for op in ("read", "write", "async_write"):
+        items = [r for r in results if r[0] == op]
+        if not items:
+            continue
+        latencies = sorted(latency for _, latency, ok in items if ok)
+        summary[op] = {
+            "operations": len(items),
+            "errors": sum(1 for *_, ok in items if not ok),
+            "ops_per_s": len(latencies) / elapsed if elapsed else 0.0,
+            "latency_ms": {
+                name: (value * 1000 if value is not None else None)
+                for name, value in (
+                    ("p50", percentile(latencies, 0.50)),
+                    ("p95", percentile(latencies, 0.95)),
+                    ("p99", percentile(latencies, 0.99)),
+                    ("max", latencies[-1] if latencies else None),
+                )
+            },
+        }
+    return summary
+
+def engine_settings(engine, read_engine):
+    # What the configuration actually got: pool sizes and the reader connection's pragmas
+    with read_engine.connect() as connection:
+        pragmas = {name: connection.execute(text(f"PRAGMA {name}")).scalar() for name, _ in SQLITE_PRAGMAS}
+    return {
+        "writer_pool_size": engine.pool.size(),
+        "reader_pool_size": read_engine.pool.size(),
+        "shared_engine": engine is read_engine,
+        "pragmas": pragmas,
+    }
+
+def run_config(config, args, workdir):
+    url = f"sqlite:///{os.path.join(workdir, config + '.db')}"
+    engine, read_engine, routing_session = build_engines(url, config, create_engine)
+    if routing_session is None:
+        SessionLocal = sessionmaker(engine, autoflush=False)
+    else:
+        SessionLocal = sessionmaker(class_=routing_session, autoflush=False)
+    try:
+        Base.metadata.create_all(bind=engine)
+        emails = seed_database(SessionLocal, args.users)
+        settings = engine_settings(engine, read_engine)
+
+        results = []
+        deadline = time.monotonic() + args.duration
+        threads = [
+            threading.Thread(target=reader, args=(SessionLocal, emails, deadline, random.Random(args.seed + index), results))
+            for index in range(args.readers)
+        ] + [
+            threading.Thread(target=writer, args=(SessionLocal, deadline, results))
+            for _ in range(args.writers)
+        ]
+        if args.async_writers:
+            threads.append(threading.Thread(
+                target=async_writers, args=(url, config, args.async_writers, deadline, results)
+            ))
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+    finally:
+        engine.dispose()
+        if read_engine is not engine:
+            read_engine.dispose()
+
+    summary = summarize(results, elapsed)
+    summary.update({"config": config, "duration_s": elapsed, "settings": settings})
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of SQLite sessions under concurrent reads and writes")
+    parser.add_argument("--configs", default=",".join(CONFIGS), help="Configurations: " + ", ".join(CONFIGS))
+    parser.add_argument("--readers", type=int, default=SQLITE_READER_POOL_SIZE,
+                        help="Reader threads (default: the reader pool size)")
+    parser.add_argument("--writers", type=int, default=2, help="Writer threads on the sync engines")
+    parser.add_argument("--async-writers", type=int, default=0, help="Writers on the async engines (one event loop)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per configuration")
+    parser.add_argument("--users", type=int, default=10000, help="Users in the seed data")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    parser.add_argument("--output", help="Where to save the results as JSON")
+    args = parser.parse_args()
+
+    configs = [name.strip() for name in args.configs.split(",")]
+    for name in configs:
+        if name not in CONFIGS:
+            parser.error(f"unknown configuration: {name}")
+
+    reports = []
+    with tempfile.TemporaryDirectory(prefix="sqlite-bench-") as workdir:
+        for config in configs:
+            print(f"[INFO] Configuration {config}...", file=sys.stderr)
+            reports.append(run_config(config, args, workdir))
+
+    output = json.dumps({
+        "created": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "readers": args.readers,
+        "writers": args.writers,
+        "async_writers": args.async_writers,
+        "results": reports,
+    }, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Microbenchmark of access token issue and verify.
+
+Compares python-jose (the previous implementation, if installed) with the precompiled
+TokenSigner from app/services/tokens.py for HS256 and, with the cryptography package,
+EdDSA and ES256, plus verification through the token cache. Keys are generated for the
+run. Reports tokens/s per stage and prints (and with --output saves) JSON.
+
+Example:
+    python bench_tokens.py --duration 2 --algorithms HS256,EdDSA,ES256 --output tokens.json
+"""
+
+import sys
+import json
+import time
+import argparse
+import platform
+
+from app.services.cache import TTLCache
+from app.services.tokens import TokenSigner, HmacKey, Ed25519Key, Es256Key
+
+SECRET = "benchmark-secret"
+CLAIMS = {"sub": "user@example.com"}
+EXPIRE_SECONDS = 30 * 60
+
+def make_key(algorithm):
+    if algorithm == "HS256":
+        return HmacKey(SECRET.encode(), "HS256"), SECRET
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+    if algorithm == "EdDSA":
+        private = ed25519.Ed25519PrivateKey.generate()
+        return Ed25519Key(private), private
+    private = ec.generate_private_key(ec.SECP256R1())
+    return Es256Key(private), private
+
+def rate(fn, duration):
+    # Calls per second over at least `duration` seconds, timed in batches
+    calls = 0
+    batch = 1
+    started = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < duration:
+        for _ in range(batch):
+            fn()
+        calls += batch
+        batch = min(batch * 2, 4096)
+        elapsed = time.perf_counter() - started
+    return calls / elapsed
+
+def record(results, implementation, algorithm, stage, tokens_per_s):
+    results.append({
+        "implementation": implementation,
+        "algorithm": algorithm,
+        "stage": stage,
+        "tokens_per_s": tokens_per_s,
+        "us_per_token": 1e6 / tokens_per_s,
+    })
+    print(f"[INFO] {implementation:<8} {algorithm:<6} {stage:<13} {tokens_per_s:12.0f} tokens/s", file=sys.stderr)
+
+def bench_signer(algorithm, args, results):
+    key, _ = make_key(algorithm)
+    signer = TokenSigner({"bench": key}, "bench", EXPIRE_SECONDS)
+    token = signer.issue(CLAIMS)
+    if signer.verify(token) is None:
+        raise SystemExit(f"[ERROR] TokenSigner does not verify its own {algorithm} token")
+    record(results, "signer", algorithm, "issue", rate(lambda: signer.issue(CLAIMS), args.duration))
+    record(results, "signer", algorithm, "verify", rate(lambda: signer.verify(token), args.duration))
+
+    cache = TTLCache(1000, 300)
+
+    def verify_cached():
+        claims = cache.get(token)
+        if claims is None:
+            claims = signer.verify(token)
+            cache.set(token, claims)
+        return claims
+
+    record(results, "signer", algorithm, "verify_cached", rate(verify_cached, args.duration))
+
+def bench_jose(algorithm, args, results):
+    try:
+        from jose import jwt
+    except ImportError:
+        print("[WARNING] python-jose is not installed, skipping the baseline", file=sys.stderr)
+        return
+    from datetime import datetime, timedelta
+    _, secret = make_key(algorithm)
+    public = secret
+    if algorithm != "HS256":
+        from cryptography.hazmat.primitives import serialization
+        public = secret.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+        secret = secret.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode()
+
+    def issue():
+        # What create_access_token did before TokenSigner
+        to_encode = dict(CLAIMS)
+        to_encode["exp"] = datetime.utcnow() + timedelta(seconds=EXPIRE_SECONDS)
+        return jwt.encode(to_encode, secret, algorithm=algorithm)
+
+    try:
+        token = issue()
+        jwt.decode(token, public, algorithms=[algorithm])
+    except Exception as e:  # jose backends differ in what they support
+        print(f"[WARNING] python-jose cannot do {algorithm}: {e}", file=sys.stderr)
+        return
+    record(results, "jose", algorithm, "issue", rate(issue, args.duration))
+    record(results, "jose", algorithm, "verify",
+           rate(lambda: jwt.decode(token, public, algorithms=[algorithm]), args.duration))
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark of access token issue and verify")
+    parser.add_argument("--algorithms", default="HS256,EdDSA,ES256", help="Algorithms: HS256, EdDSA, ES256")
+    parser.add_argument("--duration", type=float, default=1.0, help="Seconds per stage")
+    parser.add_argument("--no-jose", action="store_true", help="Skip the python-jose baseline")
+    parser.add_argument("--output", help="Where to save the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for algorithm in (name.strip() for name in args.algorithms.split(",")):
+        if algorithm not in ("HS256", "EdDSA", "ES256"):
+            parser.error(f"unknown algorithm: {algorithm}")
+        try:
+            bench_signer(algorithm, args, results)
+        except ImportError:
+            print(f"[WARNING] {algorithm} needs the cryptography package, skipping", file=sys.stderr)
+            continue
+        if not args.no_jose:
+            bench_jose(algorithm, args, results)
+
+    output = json.dumps({
+        "created": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "duration_s": args.duration,
+        "results": results,
+    }, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,26 @@
 from fastapi import FastAPI
-from app.api import auth, encryption
+from app.api import auth, encryption, codebooks
+from app.services.workers import encryption_pool, password_pool
+from app.db.session import dispose_async_engines
+from app.services.auth import get_token_signer
 
 app = FastAPI()
 
+@app.on_event("startup")
+def startup():
+    # Load the token keys now rather than on the first login
+    get_token_signer()
+
+@app.on_event("shutdown")
+async def shutdown():
+    encryption_pool.shutdown()
+    password_pool.shutdown()
+    await dispose_async_engines()
+
 @app.get("/")
 def root():
     return {"message": "Hello, World!"}
 
 app.include_router(auth.router, prefix="", tags=["auth"])
 app.include_router(encryption.router, prefix="", tags=["encryption"])
+app.include_router(codebooks.router, prefix="", tags=["codebooks"])
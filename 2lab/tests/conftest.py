@@ -0,0 +1,23 @@
+import os
+import tempfile
+
+# The app reads its settings from the environment on import, so these must be set
+# before anything from `app` is imported: a throwaway SQLite file, a test secret and
+# the cheapest bcrypt cost
+TEST_DIR = tempfile.mkdtemp(prefix="2lab-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ["SECRET_KEY"] = "test-secret"
+os.environ["ALGORITHM"] = "HS256"
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+import pytest
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.db.session import Base, engine
+    from app.models import user, codebook  # noqa: F401 (registers the tables)
+    from main import app
+    Base.metadata.create_all(bind=engine)
+    with TestClient(app) as test_client:
+        yield test_client
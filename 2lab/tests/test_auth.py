@@ -0,0 +1,31 @@
+import uuid
+
+from app.cruds.user import user_cache
+from app.services.auth import token_cache
+
+def sign_up_and_login(client):
+    email = f"me-{uuid.uuid4().hex[:8]}@example.com"
+    assert client.post("/sign-up/", json={"email": email, "password": "secret"}).status_code == 200
+    login = client.post("/login/", data={"username": email, "password": "secret"})
+    assert login.status_code == 200
+    return email, {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+def test_me_on_cold_cache(client):
+    email, auth = sign_up_and_login(client)
+    user_cache.clear()
+    token_cache.clear()
+    response = client.get("/users/me/", headers=auth)
+    assert response.status_code == 200
+    assert response.json()["email"] == email
+
+    # The second request is served from both caches
+    hits = user_cache.stats()["hits"], token_cache.stats()["hits"]
+    assert client.get("/users/me/", headers=auth).json() == response.json()
+    assert (user_cache.stats()["hits"], token_cache.stats()["hits"]) == (hits[0] + 1, hits[1] + 1)
+
+def test_me_rejects_bad_token(client):
+    assert client.get("/users/me/", headers={"Authorization": "Bearer nonsense"}).status_code == 401
+
+def test_login_wrong_password(client):
+    email, _ = sign_up_and_login(client)
+    assert client.post("/login/", data={"username": email, "password": "wrong"}).status_code == 400
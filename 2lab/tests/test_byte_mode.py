@@ -0,0 +1,61 @@
+import pytest
+
+from app.services import encryption
+from app.services.encryption import (
+    build_huffman_tree_from_freq, get_codes, byte_frequencies, byte_code_lengths, canonical_codes,
+    encode_bytes_payload, decode_bytes_payload, pack_code_lengths, unpack_code_lengths, xor_into
+)
+from tests.test_huffman import baseline_decode, skewed_text
+
+TEXTS = [
+    "a",
+    "hello world",
+    "Привет, мир! 👋 " * 20,
+    bytes(range(256)).decode("latin-1") * 2,
+    skewed_text(5000),
+]
+IDS = ["single", "ascii", "cyrillic", "all-bytes", "skewed"]
+
+@pytest.mark.parametrize("text", TEXTS, ids=IDS)
+def test_round_trip(text):
+    data, lengths, padding = encode_bytes_payload(text, "key")
+    assert len(lengths) <= 256
+    assert decode_bytes_payload(data, "key", lengths, padding) == text
+
+@pytest.mark.parametrize("text", TEXTS, ids=IDS)
+def test_canonical_codes_match_baseline(text):
+    # The packed stream decodes with the reference bit-string decoder over the same codes
+    raw = text.encode("utf-8")
+    data, packed, padding = encode_bytes_payload(text, "key")
+    xor_into(data, b"key")
+    table = canonical_codes(unpack_code_lengths(packed))
+    codes = {chr(symbol): format(entry[0], f"0{entry[1]}b") for symbol, entry in enumerate(table) if entry}
+    assert baseline_decode(bytes(data), codes, padding) == raw.decode("latin-1")
+
+@pytest.mark.parametrize("text", TEXTS[1:], ids=IDS[1:])
+def test_code_lengths_are_optimal(text):
+    # Same total size as a Huffman tree built the text-mode way over the bytes
+    freq = byte_frequencies(text.encode("utf-8"))
+    lengths = byte_code_lengths(freq)
+    reference = get_codes(build_huffman_tree_from_freq({chr(s): n for s, n in enumerate(freq) if n}))
+    assert sum(n * lengths[s] for s, n in enumerate(freq)) == \
+        sum(n * len(reference[chr(s)]) for s, n in enumerate(freq) if n)
+
+def test_frequencies_without_numpy(monkeypatch):
+    raw = skewed_text(3000).encode("utf-8")
+    expected = byte_frequencies(raw)
+    monkeypatch.setattr(encryption, "np", None)
+    assert byte_frequencies(raw) == expected
+
+def test_invalid_code_lengths():
+    with pytest.raises(ValueError):
+        canonical_codes(unpack_code_lengths(bytes([1, 1, 1])))  # Three 1-bit codes
+    with pytest.raises(ValueError):
+        unpack_code_lengths(bytes(257))
+    assert pack_code_lengths(bytearray([2, 0, 1] + [0] * 253)) == bytes([2, 0, 1])
+
+def test_api_round_trip(client):
+    text = "Привет, мир! 👋 " * 50
+    encoded = client.post("/encode", json={"text": text, "key": "key", "mode": "bytes"}).json()
+    assert encoded["mode"] == "bytes" and encoded["huffman_codes"] is None
+    assert client.post("/decode", json=encoded).json()["decoded_text"] == text
@@ -0,0 +1,39 @@
+from app.services import cache
+from app.services.cache import TTLCache
+
+class Clock:
+    now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_expiry(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    ttl_cache = TTLCache(10, ttl=60)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2, ttl=5)  # shorter than the cache ttl
+    ttl_cache.set("c", 3, ttl=600)  # capped at the cache ttl
+    clock.now += 10
+    assert (ttl_cache.get("a"), ttl_cache.get("b"), ttl_cache.get("c")) == (1, None, 3)
+    clock.now += 60
+    assert ttl_cache.get("a") is None and ttl_cache.get("c") is None
+    assert ttl_cache.stats()["size"] == 0
+
+def test_lru_eviction():
+    ttl_cache = TTLCache(2, ttl=60)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    ttl_cache.get("a")
+    ttl_cache.set("c", 3)
+    assert (ttl_cache.get("a"), ttl_cache.get("b"), ttl_cache.get("c")) == (1, None, 3)
+
+def test_invalidate_and_stats():
+    ttl_cache = TTLCache(10, ttl=60)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("expired", 1, ttl=0)
+    ttl_cache.invalidate("a")
+    assert ttl_cache.get("a") is None and ttl_cache.get("expired") is None
+    ttl_cache.set("b", 2)
+    assert ttl_cache.get("b") == 2
+    assert ttl_cache.stats() == {"size": 1, "max_size": 10, "hits": 1, "misses": 2, "hit_rate": 1 / 3}
@@ -0,0 +1,61 @@
+import asyncio
+import uuid
+
+import httpx
+import pytest
+
+CORPUS = "Съешь же ещё этих мягких французских булок, да выпей чаю. " * 5
+
+def name():
+    return f"book-{uuid.uuid4().hex[:8]}"
+
+def test_train_and_read(client):
+    response = client.post("/codebooks", json={"name": name(), "corpus": CORPUS})
+    assert response.status_code == 200
+    codebook = response.json()
+    assert codebook["version"] == 1 and set(codebook["codes"]) == set(CORPUS)
+    assert client.get(f"/codebooks/{codebook['id']}").json() == codebook
+    assert {"id": codebook["id"], "name": codebook["name"], "version": 1} in client.get("/codebooks").json()
+
+def test_versions(client):
+    book = name()
+    versions = [client.post("/codebooks", json={"name": book, "corpus": CORPUS}).json()["version"] for _ in range(3)]
+    assert versions == [1, 2, 3]
+    assert client.post("/codebooks", json={"name": name(), "corpus": CORPUS}).json()["version"] == 1
+
+def test_empty_corpus(client):
+    assert client.post("/codebooks", json={"name": name(), "corpus": ""}).status_code == 400
+
+def test_encode_decode_with_codebook(client):
+    codebook_id = client.post("/codebooks", json={"name": name(), "corpus": CORPUS}).json()["id"]
+    text = "да выпей же чаю"
+    encoded = client.post("/encode", json={"text": text, "key": "key", "codebook_id": codebook_id}).json()
+    assert encoded["codebook_id"] == codebook_id and encoded["huffman_codes"] is None
+    assert client.post("/decode", json=encoded).json()["decoded_text"] == text
+
+def test_character_missing_from_codebook(client):
+    codebook_id = client.post("/codebooks", json={"name": name(), "corpus": CORPUS}).json()["id"]
+    response = client.post("/encode", json={"text": "чай!", "key": "key", "codebook_id": codebook_id})
+    assert response.status_code == 400
+    assert "'!'" in response.json()["detail"]
+
+def test_unknown_codebook(client):
+    assert client.get("/codebooks/999999").status_code == 404
+    assert client.post("/encode", json={"text": "чай", "key": "key", "codebook_id": 999999}).status_code == 404
+    response = client.post("/decode", json={"encoded_data": "", "key": "key", "padding": 0, "codebook_id": 999999})
+    assert response.status_code == 404
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.mark.anyio
+async def test_concurrent_saves_get_distinct_versions(client):
+    book = name()
+    transport = httpx.ASGITransport(app=client.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        responses = await asyncio.gather(*(
+            async_client.post("/codebooks", json={"name": book, "corpus": CORPUS}) for _ in range(8)
+        ))
+    assert [r.status_code for r in responses] == [200] * 8
+    assert sorted(r.json()["version"] for r in responses) == list(range(1, 9))
@@ -0,0 +1,123 @@
+import base64
+
+import pytest
+
+TEXT = "Съешь же ещё этих мягких французских булок, да выпей чаю. " * 10
+
+def test_encode_decode_round_trip(client):
+    encoded = client.post("/encode", json={"text": TEXT, "key": "key"}).json()
+    response = client.post("/decode", json=encoded)
+    assert response.status_code == 200
+    assert response.json()["decoded_text"] == TEXT
+
+def test_binary_round_trip(client):
+    message = client.post("/encode/binary", content=TEXT.encode(), headers={"X-Key": "key"})
+    assert message.status_code == 200
+    response = client.post("/decode/binary", content=message.content, headers={"X-Key": "key"})
+    assert response.text == TEXT
+
+def test_binary_matches_json(client):
+    # Same ciphertext in both formats, only the framing differs
+    encoded = client.post("/encode", json={"text": TEXT, "key": "key"}).json()
+    message = client.post("/encode/binary", content=TEXT.encode(), headers={"X-Key": "key"}).content
+    assert message.endswith(base64.b64decode(encoded["encoded_data"]))
+
+@pytest.mark.parametrize("mode", ["text", "bytes"])
+@pytest.mark.parametrize("field, value", [
+    ("encoded_data", "not base64!"),
+    ("encoded_data", "abc"),
+    ("encoded_data", "данные"),
+    ("code_lengths", "%%%"),
+])
+def test_decode_rejects_malformed_base64(client, mode, field, value):
+    encoded = client.post("/encode", json={"text": TEXT, "key": "key", "mode": mode}).json()
+    if field == "code_lengths" and mode == "text":
+        pytest.skip("Only byte mode has code_lengths")
+    encoded[field] = value
+    response = client.post("/decode", json=encoded)
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"{field} is not valid base64"
+
+def test_decode_binary_rejects_truncated_message(client):
+    response = client.post("/decode/binary", content=b"\x00\x00", headers={"X-Key": "key"})
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("codes", [{"a": 5}, {"a": "2"}, {"a": ""}, {"a": None}])
+def test_decode_binary_rejects_invalid_codes(client, codes):
+    from app.services.encryption import pack_binary_message
+    message = pack_binary_message(codes, 0, b"\x00\x01")
+    response = client.post("/decode/binary", content=message, headers={"X-Key": "key"})
+    assert response.status_code == 400
+
+def test_block_size_lower_bound(client):
+    response = client.post("/encode", json={"text": TEXT, "key": "key", "block_size": 1})
+    assert response.status_code == 422
+
+def test_block_round_trip(client):
+    text = TEXT * 10
+    encoded = client.post("/encode", json={"text": text, "key": "key", "block_size": 1024}).json()
+    assert len(encoded["blocks"]) > 1
+    assert client.post("/decode", json=encoded).json()["decoded_text"] == text
+    single = client.post("/decode", json={**encoded, "block": 1}).json()["decoded_text"]
+    assert single == text[1024:2048]
+
+def test_decode_sized_by_output(client, monkeypatch):
+    # One byte of 1-bit codes decodes to 8 characters: the job is sized as 8, not 1
+    from app.api import encryption
+    sizes = []
+    run_job = encryption.run_job
+
+    async def recording_run_job(size, fn, *args, **kwargs):
+        sizes.append(size)
+        return await run_job(size, fn, *args, **kwargs)
+
+    monkeypatch.setattr(encryption, "run_job", recording_run_job)
+    encoded = client.post("/encode", json={"text": "ab" * 400, "key": "key"}).json()
+    assert client.post("/decode", json=encoded).json()["decoded_text"] == "ab" * 400
+    assert sizes[-1] == 800
+
+def test_inline_jobs_skip_admission(client):
+    from app.services.workers import encryption_pool
+    before = encryption_pool.stats()
+    encoded = client.post("/encode", json={"text": "short", "key": "key"}).json()
+    client.post("/decode", json=encoded)
+    after = encryption_pool.stats()
+    assert after["inline"] == before["inline"] + 2
+    assert after["completed"] == before["completed"]
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.mark.anyio
+async def test_inline_jobs_run_off_the_event_loop():
+    import threading
+    from app.api.encryption import run_job
+    assert await run_job(1, threading.get_ident) != threading.get_ident()
+
+@pytest.mark.anyio
+async def test_large_payloads_render_off_the_event_loop(client, monkeypatch):
+    import threading
+    import httpx
+    from fastapi.concurrency import run_in_threadpool
+    from app.api import encryption
+    threads = []
+    render = encryption.render
+
+    def recording_render(model, **fields):
+        threads.append(threading.get_ident())
+        return render(model, **fields)
+
+    async def threadpool_job(size, fn, *args, fanout=False):
+        return await run_in_threadpool(fn, *args)
+
+    # Past the inline limit, but the jobs themselves stay out of the process pool
+    monkeypatch.setattr(encryption, "ENCRYPTION_INLINE_LIMIT", 100)
+    monkeypatch.setattr(encryption, "run_job", threadpool_job)
+    monkeypatch.setattr(encryption, "render", recording_render)
+    transport = httpx.ASGITransport(app=client.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        encoded = (await async_client.post("/encode", json={"text": TEXT, "key": "key"})).json()
+        decoded = (await async_client.post("/decode", json=encoded)).json()
+    assert decoded["decoded_text"] == TEXT
+    assert len(threads) == 2 and threading.get_ident() not in threads
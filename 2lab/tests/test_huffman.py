@@ -0,0 +1,119 @@
+import base64
+import random
+
+import pytest
+
+from app.services.encryption import (
+    build_huffman_tree, get_codes, huffman_encode, huffman_decode,
+    build_encode_table, build_decode_table, encode_symbols, decode_symbols,
+    encode_blocks, decode_blocks, decode_block, xor_into, MIN_BLOCK_SIZE, MAX_BLOCKS
+)
+
+# The original bit-string implementation, kept as the reference the fast paths must match
+
+def baseline_encode(text, codes):
+    bit_string = "".join(codes[ch] for ch in text)
+    padding = (8 - len(bit_string) % 8) % 8
+    bit_string += "0" * padding
+    data = bytes(int(bit_string[i:i + 8], 2) for i in range(0, len(bit_string), 8))
+    return data, padding
+
+def baseline_decode(data, codes, padding):
+    rev_codes = {v: k for k, v in codes.items()}
+    bit_string = "".join(f"{byte:08b}" for byte in data)
+    if padding:
+        bit_string = bit_string[:-padding]
+    decoded = []
+    code = ""
+    for bit in bit_string:
+        code += bit
+        if code in rev_codes:
+            decoded.append(rev_codes[code])
+            code = ""
+    return "".join(decoded)
+
+def skewed_text(size, alphabet=40, seed=0):
+    # 1/rank^2 frequencies give codes much longer than DECODE_LOOKUP_BITS
+    rng = random.Random(seed)
+    symbols = [chr(0x0410 + i) for i in range(alphabet)]
+    return "".join(rng.choices(symbols, [1 / (rank + 1) ** 2 for rank in range(alphabet)], k=size))
+
+TEXTS = [
+    "a",
+    "aaaa",
+    "hello world",
+    "Привет, мир! 👋 " * 20,
+    "".join(chr(code) for code in range(32, 127)) * 3,
+    skewed_text(5000),
+]
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_encode_matches_baseline(text):
+    codes = get_codes(build_huffman_tree(text))
+    data, padding = encode_symbols(text, build_encode_table(codes))
+    assert (bytes(data), padding) == baseline_encode(text, codes)
+    assert huffman_encode(text, codes) == (base64.b64encode(bytes(data)).decode(), padding)
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_table_decode_matches_baseline(text):
+    codes = get_codes(build_huffman_tree(text))
+    data, padding = baseline_encode(text, codes)
+    assert "".join(decode_symbols(data, padding, build_decode_table(codes))) == text
+    assert huffman_decode(base64.b64encode(data).decode(), codes, padding) == text
+
+@pytest.mark.parametrize("lookup_bits", [1, 3, 10])
+def test_sub_tables(lookup_bits):
+    text = skewed_text(3000, alphabet=60, seed=1)
+    codes = get_codes(build_huffman_tree(text))
+    assert max(map(len, codes.values())) > lookup_bits
+    data, padding = baseline_encode(text, codes)
+    assert "".join(decode_symbols(data, padding, build_decode_table(codes, lookup_bits))) == text
+
+def test_garbage_decodes_like_baseline():
+    # Bits that match no code: both implementations stop at the same place
+    codes = {"a": "0", "b": "10"}
+    data = bytes([0b01011000])
+    assert "".join(decode_symbols(data, 0, build_decode_table(codes))) == baseline_decode(data, codes, 0)
+
+def test_empty_text():
+    assert huffman_encode("", {}) == ("", 0)
+    assert huffman_decode("", {}, 0) == ""
+
+# Block mode: every block must equal the baseline encoding of its slice of the text
+
+BLOCK_TEXT = skewed_text(10 * MIN_BLOCK_SIZE + 123, seed=2)
+
+@pytest.fixture(scope="module")
+def executor():
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+@pytest.mark.parametrize("tasks", [1, 3, 8, 100])
+def test_blocks_match_baseline(executor, tasks):
+    block_size = 2 * MIN_BLOCK_SIZE
+    data, codes, blocks = encode_blocks(BLOCK_TEXT, "key", None, block_size, executor, tasks)
+    plain = bytearray(data)
+    xor_into(plain, b"key")
+    assert len(blocks) == 6
+    for index, (offset, length, padding) in enumerate(blocks):
+        piece = BLOCK_TEXT[index * block_size:(index + 1) * block_size]
+        assert (bytes(plain[offset:offset + length]), padding) == baseline_encode(piece, codes)
+    assert decode_blocks(data, "key", codes, blocks, executor, tasks) == BLOCK_TEXT
+    assert decode_blocks(data, "key", codes, blocks) == BLOCK_TEXT
+
+def test_single_block_decode():
+    data, codes, blocks = encode_blocks(BLOCK_TEXT, "key", None, MIN_BLOCK_SIZE)
+    table = build_decode_table(codes)
+    assert "".join(decode_block(data, "key", table, blocks, i) for i in range(len(blocks))) == BLOCK_TEXT
+
+def test_block_size_limits():
+    with pytest.raises(ValueError):
+        encode_blocks(BLOCK_TEXT, "key", None, MIN_BLOCK_SIZE - 1)
+    # A text too long for MAX_BLOCKS blocks of the requested size gets larger blocks
+    text = "ab" * (MAX_BLOCKS * MIN_BLOCK_SIZE // 2 + 1)
+    data, codes, blocks = encode_blocks(text, "key", None, MIN_BLOCK_SIZE)
+    assert MAX_BLOCKS / 2 < len(blocks) <= MAX_BLOCKS
+    assert decode_blocks(data, "key", codes, blocks, tasks=4) == text
+    with pytest.raises(ValueError):
+        decode_blocks(data, "key", codes, [(0, 0, 0)] * (MAX_BLOCKS + 1))
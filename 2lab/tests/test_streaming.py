@@ -0,0 +1,106 @@
+import anyio
+import httpx
+import pytest
+
+from app.services.encryption import (
+    StreamingEncoder, StreamingDecoder, encode_payload, pack_binary_message
+)
+
+TEXT = "Streaming — потоковое кодирование 🚀 " * 50
+KEY = "stream-key"
+
+def reference_message(text, key):
+    data, codes, padding = encode_payload(text, key)
+    return pack_binary_message(codes, padding, data)
+
+def encode_in_chunks(text, chunk_size):
+    encoder = StreamingEncoder(KEY)
+    raw = text.encode()
+    for pos in range(0, len(raw), chunk_size):
+        encoder.write(raw[pos:pos + chunk_size])
+    encoder.finish_input()
+    return b"".join(encoder.iter_message(chunk_size=37))
+
+def decode_in_chunks(message, chunk_size, key=KEY):
+    decoder = StreamingDecoder(key)
+    for pos in range(0, len(message), chunk_size):
+        decoder.write(message[pos:pos + chunk_size])
+    decoder.finish_input()
+    return b"".join(decoder.iter_text(chunk_size=41)).decode()
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1 << 20])
+def test_streaming_encoder_matches_binary(chunk_size):
+    # Chunks split multi-byte UTF-8 characters; the output must not depend on that
+    assert encode_in_chunks(TEXT, chunk_size) == reference_message(TEXT, KEY)
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 8, 64, 1 << 20])
+def test_streaming_decoder_chunk_boundaries(chunk_size):
+    assert decode_in_chunks(reference_message(TEXT, KEY), chunk_size) == TEXT
+
+def test_streaming_decoder_every_split_point():
+    # One split anywhere: inside the length prefix, the JSON header and the body
+    text = "abracadabra, абракадабра"
+    message = reference_message(text, KEY)
+    for split in range(len(message) + 1):
+        decoder = StreamingDecoder(KEY)
+        decoder.write(message[:split])
+        decoder.write(message[split:])
+        decoder.finish_input()
+        assert b"".join(decoder.iter_text()).decode() == text, split
+
+def test_streaming_decoder_truncated_header():
+    decoder = StreamingDecoder(KEY)
+    decoder.write(reference_message(TEXT, KEY)[:10])
+    with pytest.raises(ValueError):
+        decoder.finish_input()
+    decoder.close()
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.mark.anyio
+async def test_stream_endpoints_multi_chunk_body(client):
+    # The request body arrives in many pieces while the response is streamed back;
+    # /decode/stream used to hang here once the response had started
+    message = reference_message(TEXT * 20, KEY)
+
+    async def pieces(data, size=4096):
+        for pos in range(0, len(data), size):
+            yield data[pos:pos + size]
+
+    with anyio.fail_after(30):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=client.app), base_url="http://test") as async_client:
+            response = await async_client.post("/decode/stream", content=pieces(message), headers={"X-Key": KEY})
+            assert response.status_code == 200
+            assert response.text == TEXT * 20
+            response = await async_client.post(
+                "/encode/stream", content=pieces((TEXT * 20).encode()), headers={"X-Key": KEY}
+            )
+            assert response.content == message
+
+def test_decode_stream_malformed(client):
+    response = client.post("/decode/stream", content=b"\xff" * 16, headers={"X-Key": KEY})
+    assert response.status_code == 400
+
+def test_stream_slots_are_released(client):
+    from app.services.workers import encryption_pool
+    message = reference_message(TEXT, KEY)
+    client.post("/decode/stream", content=message, headers={"X-Key": KEY})
+    client.post("/encode/stream", content=TEXT.encode(), headers={"X-Key": KEY})
+    client.post("/decode/stream", content=b"\xff" * 16, headers={"X-Key": KEY})
+    assert encryption_pool.stats()["in_flight"] == 0
+
+def test_stream_refused_when_pool_is_full(client, monkeypatch):
+    from app.services.workers import encryption_pool
+    monkeypatch.setattr(encryption_pool, "in_flight", encryption_pool.max_workers + encryption_pool.max_queue)
+    for path, body in [("/encode/stream", TEXT.encode()), ("/decode/stream", reference_message(TEXT, KEY))]:
+        response = client.post(path, content=body, headers={"X-Key": KEY})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"]
+
+@pytest.mark.parametrize("codes", [{"a": 5}, {"a": "2"}])
+def test_decode_stream_invalid_codes(client, codes):
+    message = pack_binary_message(codes, 0, b"\x00\x01")
+    response = client.post("/decode/stream", content=message, headers={"X-Key": KEY})
+    assert response.status_code == 400
@@ -0,0 +1,123 @@
+import json
+import time
+
+import pytest
+
+from app.services.tokens import (
+    TokenSigner, HmacKey, load_key, parse_key_specs, b64url_encode, b64url_decode, dumps
+)
+
+def hs_signer(**keys):
+    keys = keys or {"k1": HmacKey(b"secret")}
+    return TokenSigner(keys, next(iter(keys)), 60)
+
+def resign(signer, header, payload):
+    # A token with an arbitrary header, signed with the active key
+    signing_input = b64url_encode(dumps(header)) + "." + b64url_encode(dumps(payload))
+    return signing_input + "." + b64url_encode(signer._active_key.sign(signing_input.encode()))
+
+def test_issue_and_verify():
+    signer = hs_signer()
+    claims = signer.verify(signer.issue({"sub": "a@example.com"}))
+    assert claims["sub"] == "a@example.com"
+    assert 55 <= claims["exp"] - time.time() <= 60
+
+@pytest.mark.parametrize("mangle", [
+    lambda t: t[:-2] + ("AA" if t[-2:] != "AA" else "BB"),  # signature
+    lambda t: t.replace(".", ".e", 1),  # payload
+    lambda t: t + ".x",
+    lambda t: "garbage",
+    lambda t: "a.b.c",
+])
+def test_tampered_tokens(mangle):
+    signer = hs_signer()
+    assert signer.verify(mangle(signer.issue({"sub": "a"}))) is None
+
+def test_expiry_and_not_before():
+    signer = hs_signer()
+    assert signer.verify(signer.issue({"sub": "a"}, expires_in=-1)) is None
+    header = {"alg": "HS256", "typ": "JWT", "kid": "k1"}
+    assert signer.verify(resign(signer, header, {"sub": "a", "nbf": time.time() + 60})) is None
+    assert signer.verify(resign(signer, header, {"sub": "a", "exp": "never"})) is None
+    assert signer.verify(resign(signer, header, {"sub": "a"})) == {"sub": "a"}
+
+def test_foreign_header_layout():
+    # Same key, but a header we did not produce ourselves goes through the slow path
+    signer = hs_signer()
+    header = {"kid": "k1", "typ": "JWT", "alg": "HS256", "extra": 1}
+    assert signer.verify(resign(signer, header, {"sub": "a"})) == {"sub": "a"}
+    assert signer.verify(resign(signer, {**header, "alg": "HS512"}, {"sub": "a"})) is None
+    assert signer.verify(resign(signer, {**header, "alg": "none"}, {"sub": "a"})) is None
+    assert signer.verify(resign(signer, {**header, "kid": "unknown"}, {"sub": "a"})) is None
+    for kid in (["k1"], {"k": 1}, 1):
+        assert signer.verify(resign(signer, {**header, "kid": kid}, {"sub": "a"})) is None
+
+def test_key_rotation():
+    old = hs_signer(old=HmacKey(b"old secret"))
+    token = old.issue({"sub": "a"})
+    rotated = TokenSigner({"old": HmacKey(b"old secret"), "new": HmacKey(b"new secret")}, "new", 60)
+    assert rotated.verify(token)["sub"] == "a"
+    new_token = rotated.issue({"sub": "b"})
+    assert json.loads(b64url_decode(new_token.split(".")[0]))["kid"] == "new"
+    assert old.verify(new_token) is None
+    # Tokens issued before kids were used are checked against the active key
+    legacy = TokenSigner({None: HmacKey(b"new secret")}, None, 60).issue({"sub": "c"})
+    assert rotated.verify(legacy)["sub"] == "c"
+
+def test_first_rotation_keeps_kidless_tokens():
+    # Before JWT_KEY_ID was set, tokens carried no kid; a kid-less verify key keeps them valid
+    before = TokenSigner({None: HmacKey(b"old secret")}, None, 60)
+    token = before.issue({"sub": "a"})
+    keys = parse_key_specs("=HS256:old secret")
+    keys["k1"] = HmacKey(b"new secret")
+    after = TokenSigner(keys, "k1", 60)
+    assert after.verify(token)["sub"] == "a"
+    assert after.verify(after.issue({"sub": "b"}))["sub"] == "b"
+    # Without it they are checked against the active key, and fail
+    assert TokenSigner({"k1": HmacKey(b"new secret")}, "k1", 60).verify(token) is None
+
+def test_me_rejects_unhashable_kid(client):
+    header = b64url_encode(dumps({"alg": "HS256", "kid": []}))
+    token = header + "." + b64url_encode(dumps({"sub": "a"})) + ".c2ln"
+    response = client.get("/users/me/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+def test_parse_key_specs():
+    keys = parse_key_specs("a=HS256:one, b=HS512:two")
+    assert sorted(keys) == ["a", "b"] and keys["b"].algorithm == "HS512"
+    with pytest.raises(ValueError):
+        parse_key_specs("a:HS256")
+    with pytest.raises(ValueError):
+        TokenSigner({"a": HmacKey(b"x")}, "b", 60)
+
+@pytest.mark.parametrize("algorithm", ["EdDSA", "ES256"])
+def test_asymmetric_keys(algorithm):
+    pytest.importorskip("cryptography")
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+    private = ed25519.Ed25519PrivateKey.generate() if algorithm == "EdDSA" else ec.generate_private_key(ec.SECP256R1())
+    private_pem = private.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = private.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    signer = TokenSigner({"s": load_key(algorithm, private_pem)}, "s", 60)
+    token = signer.issue({"sub": "a"})
+    verifier = TokenSigner({"s": load_key(algorithm, public_pem), "h": HmacKey(b"x")}, "h", 60)
+    assert verifier.verify(token)["sub"] == "a"
+    assert verifier.verify(token[:-4] + "AAAA") is None
+    with pytest.raises(ValueError):
+        TokenSigner({"s": load_key(algorithm, public_pem)}, "s", 60)  # a public key cannot sign
+    (jwk,) = signer.jwks()["keys"]
+    assert jwk["alg"] == algorithm and jwk["kid"] == "s" and "d" not in jwk
+
+def test_interop_with_python_jose():
+    jwt = pytest.importorskip("jose.jwt")
+    signer = TokenSigner({None: HmacKey(b"secret")}, None, 60)
+    assert jwt.decode(signer.issue({"sub": "a"}), "secret", algorithms=["HS256"])["sub"] == "a"
+    token = jwt.encode({"sub": "b", "exp": int(time.time()) + 60}, "secret", algorithm="HS256")
+    assert signer.verify(token)["sub"] == "b"
+
+def test_jwks_endpoint_hides_secrets(client):
+    assert client.get("/.well-known/jwks.json").json() == {"keys": []}
@@ -0,0 +1,134 @@
+import json
+import uuid
+
+import pytest
+
+from app.services import user_import
+from app.services.auth import create_access_token
+from app.services.workers import PoolSaturated
+
+@pytest.fixture
+def auth():
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'importer@example.com'})}"}
+
+def emails(count):
+    tag = uuid.uuid4().hex[:8]
+    return [f"user{i}-{tag}@example.com" for i in range(count)]
+
+def post_import(client, auth, body, content_type="application/x-ndjson"):
+    return client.post("/users/import", content=body, headers={**auth, "Content-Type": content_type})
+
+def results(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def ndjson(rows):
+    return "".join(json.dumps(row) + "\n" for row in rows).encode()
+
+def test_ndjson_statuses(client, auth):
+    first, second = emails(2)
+    body = ndjson([{"email": first, "password": "pw1"}, {"email": first, "password": "pw2"}]) \
+        + b"not json\n" + ndjson([{"email": "not an email", "password": "pw"}])
+    response = post_import(client, auth, body)
+    assert response.status_code == 200
+    assert [r["status"] for r in results(response)] == ["created", "duplicate", "invalid", "invalid"]
+    assert [r["line"] for r in results(response)] == [1, 2, 3, 4]
+
+    again = post_import(client, auth, ndjson([{"email": first, "password": "pw"}, {"email": second, "password": "pw"}]))
+    assert [r["status"] for r in results(again)] == ["exists", "created"]
+
+def test_csv_and_login(client, auth):
+    email, = emails(1)
+    response = post_import(client, auth, f"Password,Email\nsecret,{email}\n".encode(), "text/csv")
+    assert [r["status"] for r in results(response)] == ["created"]
+    login = client.post("/login/", data={"username": email, "password": "secret"})
+    assert login.status_code == 200
+
+def test_csv_without_columns(client, auth):
+    assert post_import(client, auth, b"name,email\n", "text/csv").status_code == 400
+
+def test_batches_hash_in_chunks(client, auth, monkeypatch):
+    monkeypatch.setattr(user_import, "USER_IMPORT_HASH_CHUNK", 3)
+    rows = [{"email": email, "password": f"pw{i}"} for i, email in enumerate(emails(10))]
+    response = post_import(client, auth, ndjson(rows))
+    assert [r["status"] for r in results(response)] == ["created"] * 10
+
+    # Hashes line up with their rows across the chunks
+    login = client.post("/login/", data={"username": rows[7]["email"], "password": "pw7"})
+    assert login.status_code == 200
+
+def saturated_after(calls):
+    count = 0
+    async def run(fn, *args):
+        nonlocal count
+        count += 1
+        if count > calls:
+            raise PoolSaturated()
+        return fn(*args)
+    return run
+
+def test_saturated_pool_gives_503(client, auth, monkeypatch):
+    monkeypatch.setattr(user_import, "USER_IMPORT_HASH_TIMEOUT", 0)
+    monkeypatch.setattr(user_import.password_pool, "run", saturated_after(0))
+    response = post_import(client, auth, ndjson([{"email": email, "password": "pw"} for email in emails(3)]))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.mark.anyio
+async def test_saturated_pool_mid_import_marks_rows_busy(client, monkeypatch):
+    from app.db.session import open_async_session
+    monkeypatch.setattr(user_import, "USER_IMPORT_HASH_CHUNK", 2)
+    monkeypatch.setattr(user_import, "USER_IMPORT_HASH_TIMEOUT", 0)
+    monkeypatch.setattr(user_import.password_pool, "run", saturated_after(1))
+    rows = [(number, user_import.UserCreate(email=email, password="pw"), None)
+            for number, email in enumerate(emails(5), 1)]
+    async with open_async_session() as db:
+        statuses = [r["status"] async for r in user_import.import_users(db, iter(rows), batch_size=2)]
+    assert statuses == ["created", "created", "busy", "busy", "busy"]
+
+def test_csv_quoted_newlines(client, auth):
+    first, second = emails(2)
+    body = f'email,password\n{first},"multi\nline"\n\n{second},plain\n'.encode()
+    response = post_import(client, auth, body, "text/csv")
+    assert [(r["line"], r["status"]) for r in results(response)] == [(2, "created"), (5, "created")]
+    login = client.post("/login/", data={"username": first, "password": "multi\nline"})
+    assert login.status_code == 200
+
+def test_body_size_limit(client, auth, monkeypatch):
+    from app.api import auth as auth_api
+    monkeypatch.setattr(auth_api, "USER_IMPORT_MAX_BYTES", 64)
+    rows = ndjson([{"email": email, "password": "pw"} for email in emails(3)])
+    assert post_import(client, auth, rows).status_code == 413
+
+    # Without Content-Length the limit is checked while reading
+    def chunks():
+        yield rows[:40]
+        yield rows[40:]
+    assert post_import(client, auth, chunks()).status_code == 413
+
+@pytest.mark.anyio
+async def test_read_transaction_ends_before_hashing(client, monkeypatch):
+    from app.db.session import open_async_session
+    from app.cruds import user as user_crud
+    taken, other = emails(2)
+    in_transaction = []
+
+    async def racing_hash_batch(passwords):
+        # Another request registers one of the emails while the batch is hashed
+        in_transaction.append(db.in_transaction())
+        async with open_async_session() as racing:
+            await user_crud.insert_users_async(racing, [(taken, "hash")])
+        return ["hash"] * len(passwords)
+
+    # The plain INSERT fallback, used where ON CONFLICT is not supported
+    monkeypatch.setattr(user_crud, "UPSERT_INSERTS", {})
+    monkeypatch.setattr(user_import, "hash_batch", racing_hash_batch)
+    rows = [(number, user_import.UserCreate(email=email, password="pw"), None)
+            for number, email in enumerate([taken, other], 1)]
+    async with open_async_session() as db:
+        statuses = [r["status"] async for r in user_import.import_users(db, iter(rows))]
+    assert in_transaction == [False]
+    assert statuses == ["conflict", "conflict"]
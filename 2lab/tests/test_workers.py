@@ -0,0 +1,66 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.workers import BoundedExecutor, PoolSaturated
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+def pool():
+    # Threads instead of worker processes: the jobs below share events with the test
+    pool = BoundedExecutor(1, 0)
+    pool._executor = ThreadPoolExecutor(max_workers=1)
+    yield pool
+    pool.shutdown()
+
+async def settled(pool):
+    # Done callbacks run in the executor's thread, shortly after the job returns
+    for _ in range(200):
+        if pool.stats()["in_flight"] == 0:
+            return pool.stats()
+        await asyncio.sleep(0.01)
+    raise AssertionError("slot was not released")
+
+@pytest.mark.anyio
+async def test_cancelled_request_keeps_slot_until_job_ends(pool):
+    started, finish = threading.Event(), threading.Event()
+
+    def job():
+        started.set()
+        finish.wait(5)
+
+    task = asyncio.ensure_future(pool.run(job))
+    await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    # The job still runs, so its slot is still taken
+    assert pool.stats()["in_flight"] == 1
+    with pytest.raises(PoolSaturated):
+        await pool.run(job)
+
+    finish.set()
+    stats = await settled(pool)
+    assert (stats["completed"], stats["failed"], stats["rejected"]) == (1, 0, 1)
+
+@pytest.mark.anyio
+async def test_failed_jobs_counted_separately(pool):
+    assert await pool.run(sum, [1, 2]) == 3
+    with pytest.raises(TypeError):
+        await pool.run(sum, None)
+    stats = await settled(pool)
+    assert (stats["completed"], stats["failed"]) == (1, 1)
+
+@pytest.mark.anyio
+async def test_fanout_holds_all_workers(pool):
+    def job(value, executor, tasks):
+        assert pool.stats()["in_flight"] == pool.max_workers
+        return executor.submit(lambda: value * tasks).result()
+
+    assert await pool.run_fanout(job, 21) == 21
+    assert (await settled(pool))["completed"] == 1
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+import app.services.encryption as encryption
+from app.services.encryption import xor_into, xor_encrypt, xor_decrypt
+
+def baseline_xor(data, key):
+    key_bytes = key.encode()
+    return bytes([b ^ key_bytes[i % len(key_bytes)] for i, b in enumerate(data)])
+
+@pytest.fixture(params=["numpy", "int"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        if encryption.np is None:
+            pytest.skip("NumPy is not installed")
+    else:
+        monkeypatch.setattr(encryption, "np", None)
+    # A tiny block size, so the block loop and the key phase between blocks are exercised
+    monkeypatch.setattr(encryption, "XOR_BLOCK_SIZE", 64)
+    return request.param
+
+@pytest.mark.parametrize("size", [0, 1, 7, 64, 65, 1000])
+@pytest.mark.parametrize("key", ["k", "ключ", "a-longer-key-than-the-block-" * 3])
+def test_xor_matches_baseline(backend, size, key):
+    data = random.Random(size).randbytes(size)
+    assert xor_encrypt(data, key) == baseline_xor(data, key)
+    assert xor_decrypt(xor_encrypt(data, key), key) == data
+
+def test_xor_offset_chunks(backend):
+    # Chunks XORed with their offset give the same result as the whole buffer at once
+    data = random.Random(1).randbytes(500)
+    key = b"secret"
+    expected = bytearray(data)
+    xor_into(expected, key)
+    chunked = bytearray()
+    for pos in range(0, len(data), 37):
+        chunk = bytearray(data[pos:pos + 37])
+        xor_into(chunk, key, pos)
+        chunked += chunk
+    assert chunked == expected
+
+def test_xor_memoryview(backend):
+    buffer = bytearray(b"abcdefgh")
+    xor_into(memoryview(buffer)[2:6], b"k", 2)
+    assert bytes(buffer) == b"ab" + baseline_xor(b"cdef", "k") + b"gh"
+
+def test_xor_empty_key():
+    with pytest.raises(ValueError):
+        xor_into(bytearray(b"data"), b"")
+    xor_into(bytearray(), b"")  # Nothing to XOR, nothing to complain about
@@ -1,20 +1,19 @@
 # app/database.py
 
-from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from app.sqlite import make_engines
+
 # В этом примере используем SQLite-файл university.db.
 # При желании, строку подключения можно заменить на другую СУБД (PostgreSQL, MySQL и т.д.).
 SQLALCHEMY_DATABASE_URL = "sqlite:///./university.db"
 
-# create_engine с условием check_same_thread=False для SQLite в многопоточном режиме
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-
-# Создаём сессию (sessionlocal)
+# Два движка (см. app/sqlite.py): engine — для записи, одно подключение,
+# read_engine — пул подключений для эндпоинтов, которые только читают
+engine, read_engine = make_engines(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 # Базовый класс для всех моделей
 Base = declarative_base()
@@ -30,3 +29,14 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    """
+    То же, что get_db, но сессия из пула чтения: для эндпоинтов, которые ничего не пишут.
+    """
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
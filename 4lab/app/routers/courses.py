@@ -7,7 +7,7 @@ from sqlalchemy.orm import Session
 
 import app.crud as crud
 import app.schemas as schemas
-from app.database import get_db
+from app.database import get_db, get_read_db
 
 router = APIRouter()
 
@@ -18,7 +18,7 @@ router = APIRouter()
     status_code=status.HTTP_200_OK,
     summary="Получить список всех курсов"
 )
-def read_courses(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_courses(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     """
     Возвращает список всех курсов (с опциональной пагинацией: skip, limit).
     Если курсов нет — возвращается пустой список.
@@ -7,7 +7,7 @@ from sqlalchemy.orm import Session
 
 import app.crud as crud
 import app.schemas as schemas
-from app.database import get_db
+from app.database import get_db, get_read_db
 
 router = APIRouter()
 
@@ -18,7 +18,7 @@ router = APIRouter()
     status_code=status.HTTP_200_OK,
     summary="Получить список всех преподавателей"
 )
-def read_teachers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_teachers(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     """
     Возвращает список всех преподавателей (с опциональной пагинацией: skip, limit).
     Если преподавателей нет — возвращается пустой список.
@@ -48,7 +48,7 @@ def create_new_teacher(teacher_in: schemas.TeacherCreate, db: Session = Depends(
     status_code=status.HTTP_200_OK,
     summary="Получить все курсы преподавателя"
 )
-def read_courses_by_teacher(teacher_id: int, db: Session = Depends(get_db)):
+def read_courses_by_teacher(teacher_id: int, db: Session = Depends(get_read_db)):
     """
     Возвращает список курсов, привязанных к преподавателю с заданным teacher_id.
     Если преподавателя с таким ID нет — возвращает 404.
@@ -0,0 +1,43 @@
+# app/sqlite.py
+
+from sqlalchemy import create_engine, event
+
+# Настройки SQLite для university.db. WAL даёт читать, пока идёт запись, поэтому
+# у приложения два движка: запись через одно подключение (писатель в SQLite всё равно
+# один, так запросы ждут в пуле, а не на блокировке файла) и пул подключений для чтения.
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_CACHE_SIZE = -64 * 1024  # Отрицательное значение — размер в КиБ
+SQLITE_READER_POOL_SIZE = 8
+
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),  # С WAL безопасно и не делает fsync на каждый коммит
+    ("busy_timeout", SQLITE_BUSY_TIMEOUT_MS),
+    ("mmap_size", SQLITE_MMAP_SIZE),
+    ("cache_size", SQLITE_CACHE_SIZE),
+)
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def make_engines(url: str, tuned: bool = True):
+    """
+    Возвращает (движок записи, движок чтения) для файла SQLite.
+    При tuned=False это один и тот же движок с настройками по умолчанию —
+    так было до app/sqlite.py, с ним сравнивает бенчмарк.
+    """
+    connect_args = {"check_same_thread": False}
+    if not tuned:
+        engine = create_engine(url, connect_args=connect_args)
+        return engine, engine
+    writer = create_engine(url, connect_args=connect_args, pool_size=1, max_overflow=0)
+    reader = create_engine(url, connect_args=connect_args, pool_size=SQLITE_READER_POOL_SIZE, max_overflow=0)
+    for engine in (writer, reader):
+        event.listen(engine, "connect", set_sqlite_pragmas)
+    return writer, reader
@@ -0,0 +1,215 @@
+# bench_sqlite.py
+
+"""
+Бенчмарк SQLite под параллельной нагрузкой чтения и записи.
+
+Во временном каталоге создаётся база с преподавателями и курсами, затем для каждой
+конфигурации потоки-читатели запрашивают списки курсов преподавателей, а потоки-писатели
+добавляют курсы через сессии SQLAlchemy — так же, как это делают роутеры приложения.
+Конфигурации:
+    default — один движок с настройками по умолчанию (как было до app/sqlite.py);
+    tuned   — настройки приложения из app/sqlite.py: SQLITE_PRAGMAS, одно подключение
+              на запись и пул на чтение (app.sqlite.make_engines).
+Читатели, как эндпоинты GET, берут сессии из движка чтения, писатели — из движка записи.
+По умолчанию читателей столько же, сколько подключений в пуле чтения (SQLITE_READER_POOL_SIZE).
+Печатает (и при --output сохраняет) JSON с операциями в секунду, задержками и числом ошибок,
+а для каждой конфигурации — размеры пулов и PRAGMA, прочитанные из настоящего подключения.
+
+Пример:
+    python bench_sqlite.py --writers 2 --duration 10 --output bench_sqlite.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import tempfile
+import platform
+import threading
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Teacher, Course
+from app.sqlite import make_engines, SQLITE_PRAGMAS, SQLITE_READER_POOL_SIZE
+
+CONFIGS = ("default", "tuned")
+
+
+def seed_database(SessionLocal, teachers, courses_per_teacher):
+    db = SessionLocal()
+    try:
+        for index in range(teachers):
+            teacher = Teacher(name=f"Преподаватель {index}")
+            teacher.courses = [
+                Course(name=f"Курс {index}-{number}", student_count=number)
+                for number in range(courses_per_teacher)
+            ]
+            db.add(teacher)
+        db.commit()
+    finally:
+        db.close()
+
+
+def reader(SessionLocal, teachers, deadline, rng, results):
+    while time.monotonic() < deadline:
+        teacher_id = rng.randint(1, teachers)
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            db.query(Course).filter(Course.teacher_id == teacher_id).limit(100).all()
+            ok = True
+        except OperationalError:
+            ok = False
+        finally:
+            db.close()
+        results.append(("read", time.perf_counter() - started, ok))
+
+
+def writer(SessionLocal, teachers, deadline, rng, results):
+    while time.monotonic() < deadline:
+        teacher_id = rng.randint(1, teachers)
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            db.add(Course(name="Новый курс", student_count=rng.randint(0, 300), teacher_id=teacher_id))
+            db.commit()
+            ok = True
+        except OperationalError:
+            db.rollback()
+            ok = False
+        finally:
+            db.close()
+        results.append(("write", time.perf_counter() - started, ok))
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(results, elapsed):
+    summary = {}
+    for op in ("read", "write"):
+        items = [r for r in results if r[0] == op]
+        latencies = sorted(latency for _, latency, ok in items if ok)
+        summary[op] = {
+            "operations": len(items),
+            "errors": sum(1 for *_, ok in items if not ok),
+            "ops_per_s": len(latencies) / elapsed if elapsed else 0.0,
+            "latency_ms": {
+                name: (value * 1000 if value is not None else None)
+                for name, value in (
+                    ("p50", percentile(latencies, 0.50)),
+                    ("p95", percentile(latencies, 0.95)),
+                    ("p99", percentile(latencies, 0.99)),
+                    ("max", latencies[-1] if latencies else None),
+                )
+            },
+        }
+    return summary
+
+
+def run_config(config, args, workdir):
+    """
+    Прогоняет нагрузку на отдельном файле базы с выбранной конфигурацией.
+    """
+    url = f"sqlite:///{os.path.join(workdir, config + '.db')}"
+    engine, read_engine = make_engines(url, tuned=config == "tuned")
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+    try:
+        Base.metadata.create_all(bind=engine)
+        seed_database(SessionLocal, args.teachers, args.courses)
+        settings = engine_settings(engine, read_engine)
+
+        results = []
+        deadline = time.monotonic() + args.duration
+        threads = [
+            threading.Thread(target=reader, args=(ReadSessionLocal, args.teachers, deadline,
+                                                  random.Random(args.seed + index), results))
+            for index in range(args.readers)
+        ] + [
+            threading.Thread(target=writer, args=(SessionLocal, args.teachers, deadline,
+                                                  random.Random(args.seed + 1000 + index), results))
+            for index in range(args.writers)
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+    finally:
+        engine.dispose()
+        read_engine.dispose()
+
+    summary = summarize(results, elapsed)
+    summary.update({"config": config, "duration_s": elapsed, "settings": settings})
+    return summary
+
+
+def engine_settings(engine, read_engine):
+    """
+    Что на самом деле получила конфигурация: размеры пулов и значения PRAGMA
+    из подключения движка чтения (с ними и работают читатели).
+    """
+    with read_engine.connect() as connection:
+        pragmas = {
+            name: connection.execute(text(f"PRAGMA {name}")).scalar()
+            for name, _ in SQLITE_PRAGMAS
+        }
+    return {
+        "writer_pool_size": engine.pool.size(),
+        "reader_pool_size": read_engine.pool.size(),
+        "shared_engine": engine is read_engine,
+        "pragmas": pragmas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк SQLite под параллельным чтением и записью")
+    parser.add_argument("--configs", default=",".join(CONFIGS), help="Конфигурации: " + ", ".join(CONFIGS))
+    parser.add_argument("--readers", type=int, default=SQLITE_READER_POOL_SIZE,
+                        help="Число потоков-читателей (по умолчанию — размер пула чтения)")
+    parser.add_argument("--writers", type=int, default=2, help="Число потоков-писателей")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность прогона каждой конфигурации, с")
+    parser.add_argument("--teachers", type=int, default=100, help="Преподавателей в начальных данных")
+    parser.add_argument("--courses", type=int, default=20, help="Курсов у каждого преподавателя")
+    parser.add_argument("--seed", type=int, default=1, help="Зерно генератора случайных чисел")
+    parser.add_argument("--output", help="Куда сохранить результаты в формате JSON")
+    args = parser.parse_args()
+
+    configs = [name.strip() for name in args.configs.split(",")]
+    for name in configs:
+        if name not in CONFIGS:
+            parser.error(f"неизвестная конфигурация: {name}")
+
+    reports = []
+    with tempfile.TemporaryDirectory(prefix="sqlite-bench-") as workdir:
+        for config in configs:
+            print(f"[INFO] Конфигурация {config}...", file=sys.stderr)
+            reports.append(run_config(config, args, workdir))
+
+    output = json.dumps({
+        "created": time.time(),
+        "python": platform.python_version(),
+        "readers": args.readers,
+        "writers": args.writers,
+        "results": reports,
+    }, indent=4, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()